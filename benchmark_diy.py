@@ -0,0 +1,320 @@
+import sys, time, random, json
+import numpy as np
+from engine_diy.wad import WAD, MappedWAD
+from engine_diy.map import Map
+from engine_diy.segment_range import SolidSegmentRange, SolidSegmentList
+from engine_diy.fps_renderer import FpsRenderer
+from engine_diy.camera_path import CameraPath
+from engine_diy.render_stats import RenderStats
+from engine_diy.textures import Textures
+from engine_diy.sprites import Sprites
+
+# usage:
+#   python benchmark_diy.py wad [path to wad] [repeat]
+#   python benchmark_diy.py cliplist [frames] [walls per frame]
+#   python benchmark_diy.py frames [path to wad] [map] [options]
+#     --path file       replay a recorded camera path
+#     --frames n        length of the scripted path (360)
+#     --modes a,b       renderer modes to run (all)
+#     --json file       write the results as JSON
+#     --baseline file   compare against stored JSON results,
+#                       timings and render work counts
+
+
+#############
+## HELPERS ##
+#############
+#############
+
+# a map is a marker lump directly followed
+# by its THINGS lump
+def findMapNames(wad):
+    names = []
+    for i, d in enumerate(wad.dirs):
+        thingsIndex = i + Map.Indices.THINGS
+        if thingsIndex < len(wad.dirs) and wad.dirs[thingsIndex].lumpName == "THINGS":
+            names.append(d.lumpName)
+    return names
+
+# best of N full loads, open wad + decode every map
+def timeWadLoad(wadClass, path, mapNames, repeat):
+    best = None
+    for r in range(repeat):
+        start = time.perf_counter()
+        wad = wadClass(path)
+        for name in mapNames:
+            wad.loadMap(name)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+# the linear scan clip list FpsRenderer used before
+# SolidSegmentList, kept to benchmark against
+def clipSolidWallList(segList, x1, x2, visible):
+    del visible[:]
+    if len(segList) < 2:
+        return visible
+    i = 0
+    while (i < len(segList) and segList[i].xEnd < x1 - 1):
+        i += 1
+    segIndex = i
+    segRange = segList[segIndex]
+    if x1 < segRange.xStart:
+        if x2 < segRange.xStart - 1:
+            visible += (x1, x2)
+            segList.insert(segIndex, SolidSegmentRange(x1, x2))
+            return visible
+        visible += (x1, segRange.xStart - 1)
+        segRange.xStart = x1
+    if x2 <= segRange.xEnd:
+        return visible
+    nextSegIndex = segIndex
+    nextSegRange = segRange
+    while x2 >= segList[nextSegIndex + 1].xStart - 1:
+        visible += (nextSegRange.xEnd + 1, segList[nextSegIndex + 1].xStart - 1)
+        nextSegIndex += 1
+        nextSegRange = segList[nextSegIndex]
+        if x2 <= nextSegRange.xEnd:
+            segRange.xEnd = nextSegRange.xEnd
+            del segList[segIndex + 1:nextSegIndex + 1]
+            return visible
+    visible += (nextSegRange.xEnd + 1, x2)
+    segRange.xEnd = x2
+    del segList[segIndex + 1:nextSegIndex + 1]
+    return visible
+
+# same walls every run, mostly narrow walls like
+# a BSP walk of a detailed room sends
+def makeClipFrames(frameCount, wallCount, width):
+    rnd = random.Random(1)
+    frames = []
+    for f in range(frameCount):
+        walls = []
+        for w in range(wallCount):
+            x1 = rnd.randrange(0, width)
+            x2 = min(width - 1, x1 + int(rnd.expovariate(1 / 12)))
+            walls.append((x1, x2))
+        frames.append(walls)
+    return frames
+
+
+# split --name value options from positional args
+def parseOptions(args):
+    positional = []
+    options = {}
+    i = 0
+    while i < len(args):
+        if args[i].startswith("--") and i + 1 < len(args):
+            options[args[i][2:]] = args[i + 1]
+            i += 2
+        else:
+            positional.append(args[i])
+            i += 1
+    return positional, options
+
+# renderer modes by name, each sets up the renderer
+# and returns the render method to time, indexed
+# modes draw palette indices in flat colors or textured
+# and are rgb frames when the WAD has no textures,
+# sprite modes also draw the things in view
+def renderModes(renderer, textures = None, sprites = None):
+    def mode(render, viewSpaceClip = False, indexed = False, textured = False, things = False):
+        def setup():
+            renderer.b_viewSpaceClip = viewSpaceClip
+            renderer.textures = textures if indexed else None
+            renderer.b_textured = textured
+            renderer.sprites = sprites if things else None
+            return render
+        return setup
+    return {
+        "edges": mode(renderer.edges_render),
+        "wallcull": mode(renderer.wallcull_render),
+        "wolfenstein": mode(renderer.wolfenstein_render),
+        "doomsolids": mode(renderer.doomsolids_render),
+        "doomportals": mode(renderer.doomportals_render),
+        "doomhistory": mode(renderer.doomhistory_render),
+        "doomhistory-viewspace": mode(renderer.doomhistory_render, True),
+        "doomhistory-indexed": mode(renderer.doomhistory_render, False, True),
+        "doomhistory-textured": mode(renderer.doomhistory_render, False, True, True),
+        "doomhistory-sprites": mode(renderer.doomhistory_render, False, True, True, True),
+    }
+
+# time every view of the path, the first view
+# is rendered once untimed to warm up caches
+def timeCameraPath(renderer, render, path):
+    x, y, angle = path.views[0]
+    renderer.renderFrame(x, y, angle, render)
+    times = []
+    counts = {name: [] for name in RenderStats.COUNTERS}
+    for x, y, angle in path:
+        start = time.perf_counter()
+        renderer.renderFrame(x, y, angle, render)
+        times.append((time.perf_counter() - start) * 1000)
+        for name, value in renderer.stats.toDict().items():
+            if name in counts:
+                counts[name].append(value)
+    return {
+        "mean": float(np.mean(times)),
+        "p50": float(np.percentile(times, 50)),
+        "p99": float(np.percentile(times, 99)),
+        "segs": float(np.mean(counts["segsVisible"])),
+        "columns": float(np.mean(counts["columnsVisible"])),
+        "counts": {name: float(np.mean(values)) for name, values in counts.items()},
+    }
+
+# slower than the baseline by more than this is flagged
+REGRESSION = 0.10
+
+# print the change against the baseline, returns
+# False when a mode got slower or its counts changed
+def compareResults(results, baseline):
+    ok = True
+    for name, result in results["modes"].items():
+        base = baseline["modes"].get(name)
+        if base is None:
+            print(" {:<22} not in baseline".format(name))
+            continue
+        notes = []
+        for key in ("mean", "p50", "p99"):
+            change = (result[key] - base[key]) / base[key] if base[key] > 0 else 0
+            notes.append("{} {:+.1f}%".format(key, change * 100))
+            if key == "p50" and change > REGRESSION:
+                notes.append("SLOWER")
+                ok = False
+        if result["segs"] != base["segs"] or result["columns"] != base["columns"]:
+            notes.append("COUNTS CHANGED segs {:.1f} -> {:.1f} columns {:.1f} -> {:.1f}".format(
+                base["segs"], result["segs"], base["columns"], result["columns"]))
+            ok = False
+        # exact work counts, older baselines do not have them
+        for key, value in base.get("counts", {}).items():
+            if key in result["counts"] and result["counts"][key] != value:
+                notes.append("{} {:.1f} -> {:.1f}".format(key, value, result["counts"][key]))
+                ok = False
+        print(" {:<22} {}".format(name, " ".join(notes)))
+    return ok
+
+
+################
+## BENCHMARKS ##
+################
+################
+
+def benchmarkWad(args):
+    path = args[0] if len(args) > 0 else "wads/DOOM.WAD"
+    repeat = int(args[1]) if len(args) > 1 else 3
+
+    mapNames = findMapNames(MappedWAD(path))
+    print("WAD {} maps {}".format(path, len(mapNames)))
+
+    seekTime = timeWadLoad(WAD, path, mapNames, repeat)
+    mappedTime = timeWadLoad(MappedWAD, path, mapNames, repeat)
+    print(" WAD ......... {:.1f}ms".format(seekTime * 1000))
+    print(" MappedWAD ... {:.1f}ms".format(mappedTime * 1000))
+    print(" speedup ..... {:.1f}x".format(seekTime / mappedTime))
+
+def benchmarkClipList(args):
+    frameCount = int(args[0]) if len(args) > 0 else 2000
+    wallCount = int(args[1]) if len(args) > 1 else 200
+    width = 320
+    frames = makeClipFrames(frameCount, wallCount, width)
+    print("clip list frames {} walls {}".format(frameCount, wallCount))
+
+    # both must store the same wall parts
+    visible = []
+    for walls in frames[:50]:
+        segList = [SolidSegmentRange(-100000, -1), SolidSegmentRange(width, 100000)]
+        solidSegs = SolidSegmentList(width)
+        for x1, x2 in walls:
+            if clipSolidWallList(segList, x1, x2, visible) != solidSegs.clipSolidWall(x1, x2):
+                print("ERROR: clip lists disagree")
+                return
+
+    start = time.perf_counter()
+    for walls in frames:
+        segList = [SolidSegmentRange(-100000, -1), SolidSegmentRange(width, 100000)]
+        for x1, x2 in walls:
+            clipSolidWallList(segList, x1, x2, visible)
+    listTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    solidSegs = SolidSegmentList(width)
+    for walls in frames:
+        solidSegs.reset()
+        for x1, x2 in walls:
+            solidSegs.clipSolidWall(x1, x2)
+    arrayTime = time.perf_counter() - start
+
+    calls = frameCount * wallCount
+    print(" list ............... {:.1f}ms {:.2f}us/wall".format(listTime * 1000, listTime / calls * 1e6))
+    print(" SolidSegmentList ... {:.1f}ms {:.2f}us/wall".format(arrayTime * 1000, arrayTime / calls * 1e6))
+    print(" speedup ............ {:.1f}x".format(listTime / arrayTime))
+
+def benchmarkFrames(args):
+    positional, options = parseOptions(args)
+    path = positional[0] if len(positional) > 0 else "wads/DOOM.WAD"
+    mapName = positional[1] if len(positional) > 1 else "E1M1"
+
+    wad = MappedWAD(path)
+    map = wad.loadMap(mapName)
+    if map is None:
+        print("ERROR: invalid map {}".format(mapName))
+        return False
+
+    if "path" in options:
+        cameraPath = CameraPath.load(options["path"])
+        if cameraPath is None or len(cameraPath) == 0:
+            print("ERROR: empty camera path {}".format(options["path"]))
+            return False
+    else:
+        cameraPath = CameraPath.scripted(map, int(options.get("frames", 360)))
+
+    # wall colors are random, keep them the same every run
+    random.seed(1)
+    renderer = FpsRenderer.headless(map)
+    modes = renderModes(renderer, Textures.fromWad(wad), Sprites.fromWad(wad))
+    names = options["modes"].split(",") if "modes" in options else list(modes.keys())
+    for name in names:
+        if name not in modes:
+            print("ERROR: unknown mode {}, expected one of {}".format(name, ",".join(modes.keys())))
+            return False
+
+    print("frames {} {} views {}".format(path, mapName, len(cameraPath)))
+    results = {"wad": path, "map": mapName, "frames": len(cameraPath), "modes": {}}
+    for name in names:
+        result = timeCameraPath(renderer, modes[name](), cameraPath)
+        results["modes"][name] = result
+        print(" {:<22} mean {:7.2f}ms p50 {:7.2f}ms p99 {:7.2f}ms segs {:6.1f} columns {:6.1f}".format(
+            name, result["mean"], result["p50"], result["p99"], result["segs"], result["columns"]))
+        counts = result["counts"]
+        print(" {:<22} subsectors {:6.1f} tested {:6.1f} rejected {:6.1f} clipped {:6.1f} overdraw {:.2f}".format(
+            "", counts["subsectors"], counts["segsTested"], counts["segsRejected"], counts["segsClipped"],
+            counts["pixelsWritten"] / renderer.stats.i_screenArea))
+
+    if "json" in options:
+        with open(options["json"], 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if "baseline" in options:
+        with open(options["baseline"], 'r') as f:
+            baseline = json.load(f)
+        if baseline.get("frames") != results["frames"] or baseline.get("map") != mapName:
+            print("ERROR: baseline was run on a different path")
+            return False
+        print("against {}".format(options["baseline"]))
+        return compareResults(results, baseline)
+    return True
+
+benchmarks = {
+    "wad": benchmarkWad,
+    "cliplist": benchmarkClipList,
+    "frames": benchmarkFrames,
+}
+
+if len(sys.argv) < 2 or sys.argv[1] not in benchmarks:
+    print("usage: benchmark_diy.py [{}] ...".format("|".join(benchmarks.keys())))
+    quit()
+
+# a benchmark returning False fails the run
+if benchmarks[sys.argv[1]](sys.argv[2:]) is False:
+    sys.exit(1)
@@ -0,0 +1,147 @@
+import math
+
+# BAM Binary Angular Measurement
+# DOOM stores angles as unsigned 32 bit integers
+# where the full circle is 2^32, so adding and
+# subtracting angles wraps around for free and
+# the top bits index into trig lookup tables
+#
+#   0x00000000    0 degrees (east)
+#   0x40000000   90 degrees (north)
+#   0x80000000  180 degrees (west)
+#   0xC0000000  270 degrees (south)
+#
+# Trig values are 16.16 fixed point integers,
+# FRACUNIT is 1.0
+#
+# The Bam class mirrors Angle, the static helpers
+# take and return plain ints so hot paths can do
+# projection math without allocating
+
+FRACBITS = 16
+FRACUNIT = 1 << FRACBITS
+
+ANG45 = 0x20000000
+ANG90 = 0x40000000
+ANG180 = 0x80000000
+ANG270 = 0xC0000000
+ANGMASK = 0xFFFFFFFF
+
+# fine angles are the top 13 bits of a BAM
+FINEANGLES = 8192
+FINEMASK = FINEANGLES - 1
+ANGLETOFINESHIFT = 19
+
+# tantoangle covers slopes 0 - 1
+SLOPERANGE = 2048
+SLOPEBITS = 11
+DBITS = FRACBITS - SLOPEBITS
+
+# sine of every fine angle plus a quarter turn
+# more so cosine is the same table shifted by 90
+finesine = [int(math.sin((i + 0.5) * 2 * math.pi / FINEANGLES) * FRACUNIT) for i in range(FINEANGLES * 5 // 4)]
+finecosine = finesine[FINEANGLES // 4:]
+# tangent of -90 to 90 degrees, index is
+# (angle + ANG90) >> ANGLETOFINESHIFT
+finetangent = [int(math.tan((i - FINEANGLES // 4 + 0.5) * math.pi / (FINEANGLES // 2)) * FRACUNIT) for i in range(FINEANGLES // 2)]
+# BAM of atan(i / SLOPERANGE), 0 - 45 degrees
+tantoangle = [int(math.atan(i / SLOPERANGE) * ANG180 / math.pi) for i in range(SLOPERANGE + 1)]
+
+class Bam(object):
+
+    def __init__(self, bam):
+        self.bam = bam & ANGMASK
+
+    # arithmetic wraps around the circle
+    def addA(self, a):
+        return Bam(self.bam + a.bam)
+    def iaddA(self, a):
+        self.bam = (self.bam + a.bam) & ANGMASK
+        return self
+    def subA(self, a):
+        return Bam(self.bam - a.bam)
+    def isubA(self, a):
+        self.bam = (self.bam - a.bam) & ANGMASK
+        return self
+    def neg(self):
+        return Bam(-self.bam)
+
+    # comparison
+    def ltA(self, a):
+        return self.bam < a.bam
+    def gtA(self, a):
+        return self.bam > a.bam
+
+    def __str__(self):
+        return "B:{:08X}".format(self.bam)
+
+    # 16.16 fixed point trig
+    def getCos(self):
+        return finecosine[self.bam >> ANGLETOFINESHIFT]
+    def getSin(self):
+        return finesine[self.bam >> ANGLETOFINESHIFT]
+    def getSigned(self):
+        return Bam.signed(self.bam)
+
+    def new(self):
+        return Bam(self.bam)
+
+    def toDegrees(self):
+        return Bam.toDeg(self.bam)
+
+    def fromDegrees(deg):
+        return Bam(Bam.fromDeg(deg))
+
+    # PLAIN INT API
+    def fromDeg(deg):
+        return int(deg * 4294967296.0 / 360) & ANGMASK
+    def toDeg(bam):
+        return bam * 360 / 4294967296.0
+    def signed(bam):
+        if bam >= ANG180:
+            return bam - 0x100000000
+        return bam
+    def add(a, b):
+        return (a + b) & ANGMASK
+    def sub(a, b):
+        return (a - b) & ANGMASK
+    def cos(bam):
+        return finecosine[bam >> ANGLETOFINESHIFT]
+    def sin(bam):
+        return finesine[bam >> ANGLETOFINESHIFT]
+    # only valid for -90 to 90 degrees
+    def tan(bam):
+        return finetangent[((bam + ANG90) & ANGMASK) >> ANGLETOFINESHIFT]
+
+    # slope num / den (0 - 1) to a tantoangle index
+    def slopeDiv(num, den):
+        if den < 512:
+            return SLOPERANGE
+        ans = (num << 3) // (den >> 8)
+        return ans if ans <= SLOPERANGE else SLOPERANGE
+
+    # R_PointToAngle, BAM of the vector (x, y)
+    # found by octant and tantoangle lookup
+    def pointToAngle(x, y):
+        x = int(x * FRACUNIT)
+        y = int(y * FRACUNIT)
+        if x == 0 and y == 0:
+            return 0
+        if x >= 0:
+            if y >= 0:
+                if x > y:
+                    return tantoangle[Bam.slopeDiv(y, x)] # octant 0
+                return (ANG90 - 1 - tantoangle[Bam.slopeDiv(x, y)]) & ANGMASK # octant 1
+            y = -y
+            if x > y:
+                return (-tantoangle[Bam.slopeDiv(y, x)]) & ANGMASK # octant 8
+            return (ANG270 + tantoangle[Bam.slopeDiv(x, y)]) & ANGMASK # octant 7
+        x = -x
+        if y >= 0:
+            if x > y:
+                return (ANG180 - 1 - tantoangle[Bam.slopeDiv(y, x)]) & ANGMASK # octant 3
+            return (ANG90 + tantoangle[Bam.slopeDiv(x, y)]) & ANGMASK # octant 2
+        y = -y
+        if x > y:
+            return (ANG180 + tantoangle[Bam.slopeDiv(y, x)]) & ANGMASK # octant 4
+        return (ANG270 - 1 - tantoangle[Bam.slopeDiv(x, y)]) & ANGMASK # octant 5
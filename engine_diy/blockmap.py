@@ -0,0 +1,227 @@
+import math
+import numpy as np
+
+# BLOCKMAP
+# The map is cut into a grid of 128x128 blocks and
+# each block lists the linedefs that touch it
+#
+#   Header
+#     int16     x origin of the grid
+#     int16     y origin of the grid
+#     uint16    number of columns
+#     uint16    number of rows
+#   Offsets (columns * rows of)
+#     uint16    offset in shorts from the lump start
+#               to the block list of each block
+#   Block lists
+#     uint16    0 (leading marker)
+#     uint16    linedef ids ...
+#     uint16    0xFFFF (end of list)
+#
+# Decoded into a compact grid: an offset array with
+# one entry per block (+1) into one flat array of the
+# linedef ids of every block, things are bucketed the
+# same way so both can be queried per block
+class Blockmap(object):
+    BLOCKSHIFT = 7 # 128 map units per block
+    BLOCKSIZE = 1 << BLOCKSHIFT
+    ENDOFLIST = 0xFFFF
+
+    def __init__(self):
+        self.originX = 0
+        self.originY = 0
+        self.columns = 0
+        self.rows = 0
+        # block i owns lines[lineOffsets[i]:lineOffsets[i+1]]
+        self.lineOffsets = None # int32[columns * rows + 1]
+        self.lines = None # int32 linedef ids
+        # same layout for things
+        self.thingOffsets = None
+        self.things = None
+        # linedef end points and thing positions for exact tests
+        self.lineX1 = None
+        self.lineY1 = None
+        self.lineX2 = None
+        self.lineY2 = None
+        self.thingX = None
+        self.thingY = None
+
+    # decode the raw lump into the compact grid
+    def fromLump(data):
+        raw = np.frombuffer(data, dtype=np.uint8)
+        words = raw[:len(raw) // 2 * 2].view('<u2')
+        if len(words) < 4:
+            return None
+        blockmap = Blockmap()
+        blockmap.originX = int(words[0:2].view('<i2')[0])
+        blockmap.originY = int(words[0:2].view('<i2')[1])
+        blockmap.columns = int(words[2])
+        blockmap.rows = int(words[3])
+        blockCount = blockmap.columns * blockmap.rows
+
+        # each list runs from its offset to the next end marker
+        starts = words[4:4 + blockCount].astype(np.int64)
+        ends = np.flatnonzero(words == Blockmap.ENDOFLIST)
+        ends = ends[np.minimum(np.searchsorted(ends, starts), len(ends) - 1)]
+        # skip the leading 0 marker of each list
+        hasMarker = words[np.minimum(starts, len(words) - 1)] == 0
+        starts = starts + hasMarker
+        counts = np.maximum(ends - starts, 0)
+
+        blockmap.lineOffsets = np.zeros(blockCount + 1, dtype=np.int32)
+        np.cumsum(counts, out=blockmap.lineOffsets[1:])
+        # gather every list into one flat array
+        total = int(blockmap.lineOffsets[-1])
+        gather = np.arange(total) - np.repeat(blockmap.lineOffsets[:-1] - starts, counts)
+        blockmap.lines = words[gather].astype(np.int32)
+        return blockmap
+
+    # rebuild from arrays stored by Blockmap.toArrays
+    def fromArrays(header, lineOffsets, lines, thingOffsets, things):
+        blockmap = Blockmap()
+        blockmap.originX, blockmap.originY, blockmap.columns, blockmap.rows = header.tolist()
+        blockmap.lineOffsets = lineOffsets
+        blockmap.lines = lines
+        blockmap.thingOffsets = thingOffsets
+        blockmap.things = things
+        return blockmap
+
+    def toArrays(self):
+        header = np.array([self.originX, self.originY, self.columns, self.rows], dtype=np.int32)
+        return header, self.lineOffsets, self.lines, self.thingOffsets, self.things
+
+    # linedef end points, index is linedef id
+    def setLines(self, x1, y1, x2, y2):
+        self.lineX1 = np.asarray(x1, dtype=np.float64)
+        self.lineY1 = np.asarray(y1, dtype=np.float64)
+        self.lineX2 = np.asarray(x2, dtype=np.float64)
+        self.lineY2 = np.asarray(y2, dtype=np.float64)
+
+    # thing positions, index is thing id, bucketed into
+    # blocks unless already restored from arrays
+    def setThings(self, xs, ys):
+        self.thingX = np.asarray(xs, dtype=np.float64)
+        self.thingY = np.asarray(ys, dtype=np.float64)
+        if self.thingOffsets is not None:
+            return
+        blockCount = self.columns * self.rows
+        bx = np.floor((self.thingX - self.originX) / Blockmap.BLOCKSIZE).astype(np.int64)
+        by = np.floor((self.thingY - self.originY) / Blockmap.BLOCKSIZE).astype(np.int64)
+        inside = (bx >= 0) & (bx < self.columns) & (by >= 0) & (by < self.rows)
+        ids = np.flatnonzero(inside)
+        blocks = (by * self.columns + bx)[inside]
+        order = np.argsort(blocks, kind='stable')
+        self.things = ids[order].astype(np.int32)
+        self.thingOffsets = np.zeros(blockCount + 1, dtype=np.int32)
+        np.cumsum(np.bincount(blocks, minlength=blockCount), out=self.thingOffsets[1:])
+
+    # BLOCK LOOKUPS
+    def getBlock(self, x, y):
+        bx = math.floor((x - self.originX) / Blockmap.BLOCKSIZE)
+        by = math.floor((y - self.originY) / Blockmap.BLOCKSIZE)
+        return bx, by
+
+    def isBlockInside(self, bx, by):
+        return bx >= 0 and bx < self.columns and by >= 0 and by < self.rows
+
+    def getBlockLinedefs(self, bx, by):
+        i = by * self.columns + bx
+        return self.lines[self.lineOffsets[i]:self.lineOffsets[i + 1]]
+
+    def getBlockThings(self, bx, by):
+        i = by * self.columns + bx
+        return self.things[self.thingOffsets[i]:self.thingOffsets[i + 1]]
+
+    # blocks overlapping a box clamped to the grid
+    def getBlockRange(self, left, bottom, right, top):
+        bx1, by1 = self.getBlock(left, bottom)
+        bx2, by2 = self.getBlock(right, top)
+        return max(bx1, 0), max(by1, 0), min(bx2, self.columns - 1), min(by2, self.rows - 1)
+
+    def gatherBox(self, left, bottom, right, top, offsets, items):
+        bx1, by1, bx2, by2 = self.getBlockRange(left, bottom, right, top)
+        if bx1 > bx2 or by1 > by2:
+            return np.zeros(0, dtype=np.int32)
+        lists = []
+        for by in range(by1, by2 + 1):
+            row = by * self.columns
+            lists.append(items[offsets[row + bx1]:offsets[row + bx2 + 1]])
+        return np.unique(np.concatenate(lists))
+
+    # QUERIES
+    # linedefs whose blocks are within radius of a point,
+    # with radius 0 just the block the point is in
+    def linedefsNearPoint(self, x, y, radius = 0):
+        candidates = self.gatherBox(x - radius, y - radius, x + radius, y + radius, self.lineOffsets, self.lines)
+        if radius <= 0 or self.lineX1 is None or len(candidates) == 0:
+            return candidates.tolist()
+        # exact distance from point to each line segment
+        x1 = self.lineX1[candidates]
+        y1 = self.lineY1[candidates]
+        dx = self.lineX2[candidates] - x1
+        dy = self.lineY2[candidates] - y1
+        lengthSq = dx * dx + dy * dy
+        t = np.clip(((x - x1) * dx + (y - y1) * dy) / np.where(lengthSq == 0, 1, lengthSq), 0, 1)
+        distSq = (x1 + t * dx - x) ** 2 + (y1 + t * dy - y) ** 2
+        return candidates[distSq <= radius * radius].tolist()
+
+    # walk the blocks under a segment, like P_PathTraverse
+    def blocksAlongSegment(self, x1, y1, x2, y2):
+        fx1 = (x1 - self.originX) / Blockmap.BLOCKSIZE
+        fy1 = (y1 - self.originY) / Blockmap.BLOCKSIZE
+        fx2 = (x2 - self.originX) / Blockmap.BLOCKSIZE
+        fy2 = (y2 - self.originY) / Blockmap.BLOCKSIZE
+        bx, by = math.floor(fx1), math.floor(fy1)
+        ex, ey = math.floor(fx2), math.floor(fy2)
+        dx = fx2 - fx1
+        dy = fy2 - fy1
+        stepX = 1 if dx > 0 else -1
+        stepY = 1 if dy > 0 else -1
+        # distance along the segment (0-1) to the next block edge
+        tDeltaX = abs(1 / dx) if dx != 0 else math.inf
+        tDeltaY = abs(1 / dy) if dy != 0 else math.inf
+        tMaxX = ((bx + 1 - fx1) if dx > 0 else (fx1 - bx)) * tDeltaX if dx != 0 else math.inf
+        tMaxY = ((by + 1 - fy1) if dy > 0 else (fy1 - by)) * tDeltaY if dy != 0 else math.inf
+        blocks = []
+        for i in range(abs(ex - bx) + abs(ey - by) + 1):
+            if self.isBlockInside(bx, by):
+                blocks.append((bx, by))
+            if tMaxX < tMaxY:
+                bx += stepX
+                tMaxX += tDeltaX
+            else:
+                by += stepY
+                tMaxY += tDeltaY
+        return blocks
+
+    # linedefs a segment crosses, nearest first, hitscans
+    # and movement only look at the blocks under the segment
+    def linedefsCrossedBySegment(self, x1, y1, x2, y2):
+        lists = [self.getBlockLinedefs(bx, by) for bx, by in self.blocksAlongSegment(x1, y1, x2, y2)]
+        if len(lists) == 0:
+            return []
+        candidates = np.unique(np.concatenate(lists))
+        if len(candidates) == 0:
+            return []
+        # segment p + t*r against line q + u*s
+        rx = x2 - x1
+        ry = y2 - y1
+        qx = self.lineX1[candidates] - x1
+        qy = self.lineY1[candidates] - y1
+        sx = self.lineX2[candidates] - self.lineX1[candidates]
+        sy = self.lineY2[candidates] - self.lineY1[candidates]
+        denom = rx * sy - ry * sx
+        safeDenom = np.where(denom == 0, 1, denom)
+        t = (qx * sy - qy * sx) / safeDenom
+        u = (qx * ry - qy * rx) / safeDenom
+        hit = (denom != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        order = np.argsort(t[hit], kind='stable')
+        return candidates[hit][order].tolist()
+
+    # things within radius of a point
+    def thingsInRadius(self, x, y, radius):
+        candidates = self.gatherBox(x - radius, y - radius, x + radius, y + radius, self.thingOffsets, self.things)
+        if len(candidates) == 0:
+            return []
+        distSq = (self.thingX[candidates] - x) ** 2 + (self.thingY[candidates] - y) ** 2
+        return candidates[distSq <= radius * radius].tolist()
@@ -0,0 +1,70 @@
+import random
+
+# CAMERA PATH FILE
+# one view per line, # starts a comment
+#
+#   x y angle
+#
+# x and y in map units, angle in degrees
+#
+# Paths are recorded in main_diy.py (R key) or
+# scripted from the map so benchmarks replay the
+# exact same views every run
+class CameraPath(object):
+    def __init__(self):
+        self.views = [] # (x, y, angle)
+
+    def add(self, x, y, angle):
+        self.views.append((x, y, angle))
+
+    def __len__(self):
+        return len(self.views)
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def load(filename):
+        path = CameraPath()
+        with open(filename, 'r') as f:
+            for lineNumber, line in enumerate(f):
+                line = line.split('#')[0].strip()
+                if line == "":
+                    continue
+                values = line.split()
+                if len(values) != 3:
+                    print("ERROR: bad camera path line {} in {}".format(lineNumber + 1, filename))
+                    return None
+                path.add(float(values[0]), float(values[1]), float(values[2]))
+        return path
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            f.write("# x y angle\n")
+            for x, y, angle in self.views:
+                f.write("{} {} {}\n".format(x, y, angle))
+
+    # deterministic path for a map: a full turn at the
+    # player start, then a few turns from the middle of
+    # subsectors picked with a fixed seed, the middle of
+    # a subsector is always inside the map
+    def scripted(map, frameCount = 360):
+        path = CameraPath()
+        rnd = random.Random(1)
+        turnFrames = 36
+        start = map.playerThing
+        for i in range(min(turnFrames, frameCount)):
+            path.add(start.x, start.y, (start.angle + i * 360 / turnFrames) % 360)
+        while len(path) < frameCount:
+            subsector = map.subsectors[rnd.randrange(len(map.subsectors))]
+            xs = []
+            ys = []
+            for i in range(subsector.segCount):
+                seg = map.segs[subsector.firstSegID + i]
+                xs.append(seg.startVertex.x)
+                ys.append(seg.startVertex.y)
+            x = sum(xs) / len(xs)
+            y = sum(ys) / len(ys)
+            angle = rnd.uniform(0, 360)
+            for i in range(min(turnFrames // 4, frameCount - len(path))):
+                path.add(x, y, (angle + i * 360 / (turnFrames // 4)) % 360)
+        return path
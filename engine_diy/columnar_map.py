@@ -0,0 +1,486 @@
+import numpy as np
+from engine_diy.map import *
+
+# Columnar version of Map
+# every lump is kept as a NumPy structured array
+# that is a zero copy view of the lump bytes and
+# the object pointers Map.assignPointerData creates
+# are instead index columns, -1 where Map has None
+# Records are only built as thin accessors when the
+# renderer asks for one so FpsRenderer keeps working
+
+# record layouts, same as the on disk WAD records
+LUMP_DTYPES = {
+    "VERTEXES": np.dtype([
+        ('x', '<i2'), ('y', '<i2'),
+    ]),
+    "LINEDEFS": np.dtype([
+        ('startVertexID', '<u2'), ('endVertexID', '<u2'), ('flags', '<u2'), ('lineType', '<u2'),
+        ('sectorTag', '<u2'), ('frontSidedefID', '<u2'), ('backSidedefID', '<u2'),
+    ]),
+    "THINGS": np.dtype([
+        ('x', '<i2'), ('y', '<i2'), ('angle', '<u2'), ('type', '<u2'), ('flags', '<u2'),
+    ]),
+    "NODES": np.dtype([
+        ('xPartition', '<i2'), ('yPartition', '<i2'), ('xChangePartition', '<i2'), ('yChangePartition', '<i2'),
+        ('frontBoxTop', '<i2'), ('frontBoxBottom', '<i2'), ('frontBoxLeft', '<i2'), ('frontBoxRight', '<i2'),
+        ('backBoxTop', '<i2'), ('backBoxBottom', '<i2'), ('backBoxLeft', '<i2'), ('backBoxRight', '<i2'),
+        ('frontChildID', '<u2'), ('backChildID', '<u2'),
+    ]),
+    "SSECTORS": np.dtype([
+        ('segCount', '<u2'), ('firstSegID', '<u2'),
+    ]),
+    "SEGS": np.dtype([
+        ('startVertexID', '<u2'), ('endVertexID', '<u2'), ('angle', '<u2'),
+        ('linedefID', '<u2'), ('direction', '<u2'), ('offset', '<u2'),
+    ]),
+    "SECTORS": np.dtype([
+        ('floorHeight', '<i2'), ('ceilingHeight', '<i2'), ('floorTexture', 'S8'), ('ceilingTexture', 'S8'),
+        ('lightLevel', '<u2'), ('type', '<u2'), ('tag', '<u2'),
+    ]),
+    "SIDEDEFS": np.dtype([
+        ('xOffset', '<i2'), ('yOffset', '<i2'), ('upperTexture', 'S8'), ('lowerTexture', 'S8'),
+        ('middleTexture', 'S8'), ('sectorID', '<u2'),
+    ]),
+    # packed bits, see Map.canSectorsSee
+    "REJECT": np.dtype('u1'),
+    # header, offsets and block lists, see Blockmap
+    "BLOCKMAP": np.dtype('<u2'),
+}
+
+class ColumnarMap(Map):
+
+    def __init__(self, lumpSource = None):
+        # Map attributes, the record lists are
+        # built by setupColumns
+        self.name = ""
+        self.minx = None
+        self.maxx = None
+        self.miny = None
+        self.maxy = None
+        self.width = None
+        self.height = None
+        # optional function of lump name to lump bytes
+        # when set lumps are only decoded on first use
+        self.lumpSource = lumpSource
+        # lump name to structured array of its records
+        self.lumps = LazyDict(self.loadLump)
+        # lump name to dict of resolved index columns
+        self.indexColumns = LazyDict(self.createIndexColumns)
+        # map wide derived arrays and scalars
+        self.derived = {}
+        self.meta = {}
+        # (lump name, field) to a 1d column
+        self.fields = LazyDict(self.createField)
+        self.blockmapIndex = None
+        self.vertexArrays = None
+        self.subsectorThings = None
+        self.nodesVisited = 0
+        self.subsectorsVisited = 0
+
+    # wrap raw lump bytes without copying them
+    def setLumpData(self, lumpName, data):
+        self.lumps[lumpName] = ColumnarMap.wrapLump(lumpName, data)
+
+    def wrapLump(lumpName, data):
+        dtype = LUMP_DTYPES[lumpName]
+        count = len(data) // dtype.itemsize
+        return np.frombuffer(data, dtype=dtype, count=count)
+
+    def loadLump(self, lumpName):
+        if self.lumpSource is None:
+            raise KeyError(lumpName)
+        return ColumnarMap.wrapLump(lumpName, self.lumpSource(lumpName))
+
+    def createData(self):
+        self.assignIndexData()
+        self.setupColumns()
+        self.createMetaData()
+
+    # only set up what map sizing needs, everything
+    # else is decoded when it is first read
+    def createLazyData(self):
+        self.setupColumns()
+        self.createBoundsMetaData()
+        self.applyMetaData()
+
+    # decode every lump and derived column, used
+    # before handing a lazy map to the map cache
+    def decodeAll(self):
+        for lumpName in LUMP_DTYPES:
+            self.lumps[lumpName]
+        self.assignIndexData()
+        self.createMetaData()
+        self.createBlockmapMetaData()
+
+    # resolve the pointers Map keeps as objects
+    # into index columns
+    def assignIndexData(self):
+        for lumpName in ("LINEDEFS", "SEGS", "NODES", "SSECTORS"):
+            self.indexColumns[lumpName]
+
+    def createIndexColumns(self, lumpName):
+        if lumpName == "LINEDEFS":
+            sidedefSector = self.lumps["SIDEDEFS"]['sectorID'].astype(np.int32)
+            linedefs = self.lumps["LINEDEFS"]
+            return {
+                'frontSectorID': ColumnarMap.lookup(sidedefSector, linedefs['frontSidedefID'], Linedef.nullSideDefID),
+                'backSectorID': ColumnarMap.lookup(sidedefSector, linedefs['backSidedefID'], Linedef.nullSideDefID),
+            }
+
+        if lumpName == "SEGS":
+            # direction: 0 same as linedef, 1 opposite
+            segs = self.lumps["SEGS"]
+            segLinedef = segs['linedefID']
+            isSame = segs['direction'] == 0
+            segFront = self.indexColumns["LINEDEFS"]['frontSectorID'][segLinedef]
+            segBack = self.indexColumns["LINEDEFS"]['backSectorID'][segLinedef]
+            return {
+                'frontSectorID': np.where(isSame, segFront, segBack),
+                'backSectorID': np.where(isSame, segBack, segFront),
+            }
+
+        if lumpName == "NODES":
+            nodes = self.lumps["NODES"]
+            columns = {}
+            for side in ('front', 'back'):
+                childIDs = nodes[side + 'ChildID'].astype(np.int32)
+                isSubsector = (childIDs & Map.SUBSECTORIDENTIFIER) > 0
+                columns[side + 'ChildNodeID'] = np.where(isSubsector, -1, childIDs)
+                columns[side + 'SubsectorID'] = np.where(isSubsector, childIDs & ~Map.SUBSECTORIDENTIFIER, -1)
+            return columns
+
+        if lumpName == "SSECTORS":
+            # sector of a subsector is the front sector of its first seg
+            subsectors = self.lumps["SSECTORS"]
+            return {
+                'sectorID': self.indexColumns["SEGS"]['frontSectorID'][subsectors['firstSegID']],
+            }
+
+        return {}
+
+    # ids that equal the null id resolve to -1
+    def lookup(table, ids, nullID):
+        isNull = ids == nullID
+        safeIDs = np.where(isNull, 0, ids)
+        if len(table) == 0:
+            return np.full(len(ids), -1, dtype=np.int32)
+        return np.where(isNull, -1, table[safeIDs]).astype(np.int32)
+
+    # one plain column per field so accessors
+    # do not rebuild field views per read
+    def createField(self, key):
+        lumpName, field = key
+        if field in LUMP_DTYPES[lumpName].names:
+            return self.lumps[lumpName][field]
+        return self.indexColumns[lumpName][field]
+
+    def setupColumns(self):
+        self.vertices = RecordList(self, "VERTEXES", ColumnarVertex)
+        self.linedefs = RecordList(self, "LINEDEFS", ColumnarLinedef)
+        self.things = RecordList(self, "THINGS", ColumnarThing)
+        self.nodes = RecordList(self, "NODES", ColumnarNode)
+        self.subsectors = RecordList(self, "SSECTORS", ColumnarSubsector)
+        self.segs = RecordList(self, "SEGS", ColumnarSeg)
+        self.sectors = RecordList(self, "SECTORS", ColumnarSector)
+        self.sidedefs = RecordList(self, "SIDEDEFS", ColumnarSidedef)
+
+    def createMetaData(self):
+        self.createBoundsMetaData()
+        self.createPlayerMetaData()
+        self.createSolidMetaData()
+        self.applyMetaData()
+
+    # map sizing from the vertices used by linedefs
+    def createBoundsMetaData(self):
+        vertices = self.lumps["VERTEXES"]
+        linedefs = self.lumps["LINEDEFS"]
+        used = np.concatenate((linedefs['startVertexID'], linedefs['endVertexID']))
+        xs = vertices['x'][used]
+        ys = vertices['y'][used]
+        self.meta['minx'] = int(xs.min())
+        self.meta['maxx'] = int(xs.max())
+        self.meta['miny'] = int(ys.min())
+        self.meta['maxy'] = int(ys.max())
+
+    # player 1 start thing, last one wins like Map
+    def createPlayerMetaData(self):
+        playerIDs = np.nonzero(self.lumps["THINGS"]['type'] == Thing.Types.O_PLAYER1)[0]
+        self.meta['playerThingID'] = int(playerIDs[-1]) if len(playerIDs) > 0 else -1
+
+    # list of only lines that are solid (have 1 side)
+    def createSolidMetaData(self):
+        linedefs = self.lumps["LINEDEFS"]
+        self.derived['solidLinedefIDs'] = np.nonzero(linedefs['backSidedefID'] == Linedef.nullSideDefID)[0].astype(np.int32)
+
+    # set the Map attributes from meta and derived
+    # data, also used when restoring a cached map
+    def applyMetaData(self):
+        self.minx = self.meta['minx']
+        self.maxx = self.meta['maxx']
+        self.miny = self.meta['miny']
+        self.maxy = self.meta['maxy']
+        self.width = self.maxx - self.minx
+        self.height = self.maxy - self.miny
+
+    # zero copy bytes view of the REJECT lump
+    @property
+    def reject(self):
+        return self.lumps["REJECT"].data
+
+    # decoded blockmap grid kept as derived arrays
+    # so a cached map skips decoding the lump
+    def createBlockmapMetaData(self):
+        blockmap = Blockmap.fromLump(self.lumps["BLOCKMAP"])
+        if blockmap is None:
+            return
+        things = self.lumps["THINGS"]
+        blockmap.setThings(things['x'], things['y'])
+        header, lineOffsets, lines, thingOffsets, thingIDs = blockmap.toArrays()
+        self.derived['blockmapHeader'] = header
+        self.derived['blockmapLineOffsets'] = lineOffsets
+        self.derived['blockmapLines'] = lines
+        self.derived['blockmapThingOffsets'] = thingOffsets
+        self.derived['blockmapThings'] = thingIDs
+
+    @property
+    def blockmap(self):
+        if self.blockmapIndex is None:
+            if 'blockmapHeader' not in self.derived:
+                self.createBlockmapMetaData()
+            if 'blockmapHeader' not in self.derived:
+                return None
+            blockmap = Blockmap.fromArrays(
+                self.derived['blockmapHeader'], self.derived['blockmapLineOffsets'], self.derived['blockmapLines'],
+                self.derived['blockmapThingOffsets'], self.derived['blockmapThings'])
+            vertices = self.lumps["VERTEXES"]
+            linedefs = self.lumps["LINEDEFS"]
+            start = vertices[linedefs['startVertexID']]
+            end = vertices[linedefs['endVertexID']]
+            blockmap.setLines(start['x'], start['y'], end['x'], end['y'])
+            things = self.lumps["THINGS"]
+            blockmap.setThings(things['x'], things['y'])
+            self.blockmapIndex = blockmap
+        return self.blockmapIndex
+
+    # THINGS and LINEDEFS based meta data is only
+    # worked out when first asked for
+    def getVertexArrays(self):
+        if self.vertexArrays is None:
+            vertices = self.lumps["VERTEXES"]
+            self.vertexArrays = (vertices['x'].astype(np.float64), vertices['y'].astype(np.float64))
+        return self.vertexArrays
+
+    @property
+    def playerThing(self):
+        if 'playerThingID' not in self.meta:
+            self.createPlayerMetaData()
+        if self.meta['playerThingID'] < 0:
+            return None
+        return self.things[self.meta['playerThingID']]
+
+    @property
+    def solidLinedefs(self):
+        if 'solidLinedefIDs' not in self.derived:
+            self.createSolidMetaData()
+        return [self.linedefs[i] for i in self.derived['solidLinedefIDs'].tolist()]
+
+    # bytes held by the decoded columns
+    def nbytes(self):
+        total = sum(array.nbytes for array in self.lumps.values())
+        for columns in self.indexColumns.values():
+            total += sum(column.nbytes for column in columns.values())
+        total += sum(array.nbytes for array in self.derived.values())
+        return total
+
+# dict that fills in a missing key from a loader
+class LazyDict(dict):
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+    def __missing__(self, key):
+        value = self.loader(key)
+        self[key] = value
+        return value
+
+# list like access to the records of a lump
+# accessors are built on demand and kept so the
+# same record is not rebuilt every frame
+# the lump itself is not touched until the list is used
+class RecordList(object):
+    def __init__(self, map, lumpName, recordClass):
+        self.map = map
+        self.lumpName = lumpName
+        self.recordClass = recordClass
+        self.count = None
+        self.records = None
+
+    def setup(self):
+        self.count = len(self.map.lumps[self.lumpName])
+        self.records = [None] * self.count
+
+    def __len__(self):
+        if self.records is None:
+            self.setup()
+        return self.count
+
+    def __getitem__(self, i):
+        if self.records is None:
+            self.setup()
+        record = self.records[i]
+        if record is None:
+            if i < 0:
+                i += self.count
+            record = self.recordClass(self.map, i)
+            self.records[i] = record
+        return record
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+# reads one field of one record from its column
+class Column(object):
+    def __init__(self, lumpName, field):
+        self.key = (lumpName, field)
+    def __get__(self, record, owner):
+        if record is None:
+            return self
+        return record.map.fields[self.key].item(record.ID)
+
+# char[8] column, null padding stripped like WAD.load_string
+class NameColumn(Column):
+    def __get__(self, record, owner):
+        if record is None:
+            return self
+        return record.map.fields[self.key][record.ID].replace(b'\x00', b'').decode('ascii')
+
+# resolves an index column into another lumps record, -1 is None
+class Pointer(object):
+    def __init__(self, lumpName, field, listName):
+        self.key = (lumpName, field)
+        self.listName = listName
+    def __get__(self, record, owner):
+        if record is None:
+            return self
+        i = record.map.fields[self.key].item(record.ID)
+        if i < 0:
+            return None
+        return getattr(record.map, self.listName)[i]
+
+class ColumnarRecord(object):
+    __slots__ = ('map', 'ID')
+    def __init__(self, map, ID):
+        self.map = map
+        self.ID = ID
+
+class ColumnarVertex(ColumnarRecord):
+    __slots__ = ()
+    x = Column("VERTEXES", 'x')
+    y = Column("VERTEXES", 'y')
+    def __str__(self):
+        return Vertex.__str__(self)
+
+class ColumnarLinedef(ColumnarRecord):
+    __slots__ = ()
+    startVertexID = Column("LINEDEFS", 'startVertexID')
+    endVertexID = Column("LINEDEFS", 'endVertexID')
+    flags = Column("LINEDEFS", 'flags')
+    lineType = Column("LINEDEFS", 'lineType')
+    sectorTag = Column("LINEDEFS", 'sectorTag')
+    frontSidedefID = Column("LINEDEFS", 'frontSidedefID')
+    backSidedefID = Column("LINEDEFS", 'backSidedefID')
+    startVertex = Pointer("LINEDEFS", 'startVertexID', 'vertices')
+    endVertex = Pointer("LINEDEFS", 'endVertexID', 'vertices')
+    @property
+    def frontSidedef(self):
+        i = self.frontSidedefID
+        return None if i == Linedef.nullSideDefID else self.map.sidedefs[i]
+    @property
+    def backSidedef(self):
+        i = self.backSidedefID
+        return None if i == Linedef.nullSideDefID else self.map.sidedefs[i]
+    def isSolid(self):
+        return self.backSidedefID == Linedef.nullSideDefID
+    def __str__(self):
+        return Linedef.__str__(self)
+
+class ColumnarThing(ColumnarRecord):
+    __slots__ = ()
+    x = Column("THINGS", 'x')
+    y = Column("THINGS", 'y')
+    angle = Column("THINGS", 'angle')
+    type = Column("THINGS", 'type')
+    flags = Column("THINGS", 'flags')
+    def __str__(self):
+        return Thing.__str__(self)
+
+class ColumnarNode(ColumnarRecord):
+    __slots__ = ()
+    xPartition = Column("NODES", 'xPartition')
+    yPartition = Column("NODES", 'yPartition')
+    xChangePartition = Column("NODES", 'xChangePartition')
+    yChangePartition = Column("NODES", 'yChangePartition')
+    frontBoxTop = Column("NODES", 'frontBoxTop')
+    frontBoxBottom = Column("NODES", 'frontBoxBottom')
+    frontBoxLeft = Column("NODES", 'frontBoxLeft')
+    frontBoxRight = Column("NODES", 'frontBoxRight')
+    backBoxTop = Column("NODES", 'backBoxTop')
+    backBoxBottom = Column("NODES", 'backBoxBottom')
+    backBoxLeft = Column("NODES", 'backBoxLeft')
+    backBoxRight = Column("NODES", 'backBoxRight')
+    frontChildID = Column("NODES", 'frontChildID')
+    backChildID = Column("NODES", 'backChildID')
+    frontChildNode = Pointer("NODES", 'frontChildNodeID', 'nodes')
+    backChildNode = Pointer("NODES", 'backChildNodeID', 'nodes')
+    frontSubsector = Pointer("NODES", 'frontSubsectorID', 'subsectors')
+    backSubsector = Pointer("NODES", 'backSubsectorID', 'subsectors')
+    def __str__(self):
+        return Node.__str__(self)
+
+class ColumnarSubsector(ColumnarRecord):
+    __slots__ = ()
+    segCount = Column("SSECTORS", 'segCount')
+    firstSegID = Column("SSECTORS", 'firstSegID')
+    firstSeg = Pointer("SSECTORS", 'firstSegID', 'segs')
+    sectorID = Column("SSECTORS", 'sectorID')
+    def __str__(self):
+        return Subsector.__str__(self)
+
+class ColumnarSeg(ColumnarRecord):
+    __slots__ = ()
+    startVertexID = Column("SEGS", 'startVertexID')
+    endVertexID = Column("SEGS", 'endVertexID')
+    angle = Column("SEGS", 'angle')
+    linedefID = Column("SEGS", 'linedefID')
+    direction = Column("SEGS", 'direction')
+    offset = Column("SEGS", 'offset')
+    startVertex = Pointer("SEGS", 'startVertexID', 'vertices')
+    endVertex = Pointer("SEGS", 'endVertexID', 'vertices')
+    linedef = Pointer("SEGS", 'linedefID', 'linedefs')
+    frontSector = Pointer("SEGS", 'frontSectorID', 'sectors')
+    backSector = Pointer("SEGS", 'backSectorID', 'sectors')
+    def getAngle(self):
+        return Seg.getAngle(self)
+    def getSidedef(self):
+        return Seg.getSidedef(self)
+
+class ColumnarSector(ColumnarRecord):
+    __slots__ = ()
+    floorHeight = Column("SECTORS", 'floorHeight')
+    ceilingHeight = Column("SECTORS", 'ceilingHeight')
+    floorTexture = NameColumn("SECTORS", 'floorTexture')
+    ceilingTexture = NameColumn("SECTORS", 'ceilingTexture')
+    lightLevel = Column("SECTORS", 'lightLevel')
+    type = Column("SECTORS", 'type')
+    tag = Column("SECTORS", 'tag')
+
+class ColumnarSidedef(ColumnarRecord):
+    __slots__ = ()
+    xOffset = Column("SIDEDEFS", 'xOffset')
+    yOffset = Column("SIDEDEFS", 'yOffset')
+    upperTexture = NameColumn("SIDEDEFS", 'upperTexture')
+    lowerTexture = NameColumn("SIDEDEFS", 'lowerTexture')
+    middleTexture = NameColumn("SIDEDEFS", 'middleTexture')
+    sectorID = Column("SIDEDEFS", 'sectorID')
+    sector = Pointer("SIDEDEFS", 'sectorID', 'sectors')
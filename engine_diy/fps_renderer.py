@@ -1,8 +1,17 @@
 import random, math
+import numpy as np
 from engine_diy.player import Player
 from engine_diy.angle import Angle
-from engine_diy.segment_range import SolidSegmentRange
+from engine_diy.bam import Bam, ANG90, FRACUNIT
+from engine_diy.segment_range import SolidSegmentRange, SolidSegmentList
 from engine_diy.map import *
+from engine_diy.frame_buffer import FrameBuffer
+from engine_diy.vertex_projection import VertexProjection
+from engine_diy.frame_profiler import FrameProfiler
+from engine_diy.render_stats import RenderStats
+from engine_diy.textures import Textures
+from engine_diy.sprites import Sprites
+from engine_diy.light_tables import LightTables
 
 class FpsRenderer(object):
     def __init__(self, map, player, game, fov, width, height, xOffset, yOffset):
@@ -17,6 +26,7 @@ class FpsRenderer(object):
         self.f_yOffset = yOffset
 
         self.wallColors = {} # helper to map a texture to a single color (until textures are added)
+        self.colorIndices = {} # the same colors as palette indices
         self.onSegInspect = None # function pointer for helping to visualize segs in fps viewport
 
         self.f_halfWidth = width / 2
@@ -24,6 +34,21 @@ class FpsRenderer(object):
         self.a_halfFov = Angle(fov / 2)
         self.f_distancePlayerToScreen = self.f_halfWidth / self.a_halfFov.getTan() # 160 at 320 width and 90 fov
 
+        # walls are drawn into a pixel buffer shown with one
+        # blit per frame, False draws a GL line per column
+        self.b_frameBuffer = True
+        self.frameBuffer = FrameBuffer(width, height, xOffset, yOffset)
+        self.canvas = game
+
+        # screen columns covered by solid walls, reset each frame
+        self.segList = SolidSegmentList(self.f_width)
+
+        # per stage frame timings, off until enabled
+        self.profiler = FrameProfiler()
+
+        # angle, distance and screen x of every vertex, projected once per frame
+        self.vertexProjection = VertexProjection(map)
+
         # build lookup table of all x screen coords and
         # their projection angles
         # this was part of the wolfenstein height projection
@@ -53,12 +78,50 @@ class FpsRenderer(object):
         for i in range(0, width + 1):
             f_angle = math.atan((self.f_halfWidth - i) / float(self.f_distancePlayerToScreen)) * 180 / math.pi
             self.doomhistory_screenXToAngleLookup.append(Angle(f_angle))
-        self.doomhistory_ceilingClipHeight = []
-        self.doomhistory_floorClipHeight = []
-        for i in range(0, self.f_width):
-            self.doomhistory_ceilingClipHeight.append(-1)
-            self.doomhistory_floorClipHeight.append(int(self.f_height))
+        # same angles as BAM ints for the fixed point projection
+        self.doomhistory_screenXToBamLookup = [Bam.fromDeg(a.deg) for a in self.doomhistory_screenXToAngleLookup]
+        # float as clipped section heights are not whole pixels
+        self.doomhistory_ceilingClipHeight = np.full(self.f_width, -1, dtype=np.float64)
+        self.doomhistory_floorClipHeight = np.full(self.f_width, int(self.f_height), dtype=np.float64)
         self.doomhistory_frameSegsDrawData = []
+        # wall textures of the WAD, walls are flat colors
+        # until set and when drawn with GL lines
+        self.textures = None
+        self.b_textured = True
+        # COLORMAP light maps by wall scale and plane depth
+        self.lightTables = LightTables(width)
+        # with a palette frames draw palette indices and light
+        # maps which are turned into rgb once at the end, so
+        # palette effects only swap the table used for that
+        self.b_indexed = True
+        self.b_indexedFrame = False
+        self.i_palette = 0 # PLAYPAL palette, see Textures.getShades
+        self.i_fixedColormap = None # 32 for invulnerability
+        # floor and ceiling visplanes of the frame by
+        # (height, flat, light), each a list of planes
+        self.doomhistory_visplanes = {}
+        self.b_drawPlanes = True
+        # thing sprites of the WAD, things are only drawn
+        # into indexed frames and not until set
+        self.sprites = None
+        self.b_drawSprites = True
+        # sprites of the things in walked subsectors,
+        # sorted and drawn after walls and planes
+        self.doomhistory_vissprites = []
+
+        # skip subsectors REJECT says the player can not see
+        self.b_rejectCulling = True
+        # skip BSP subtrees whose box is outside the fov
+        self.b_bspCulling = True
+        # doomhistory clips and projects segs in view space
+        # instead of with angles from the player
+        self.b_viewSpaceClip = False
+        self.f_tanHalfFov = self.a_halfFov.getTan()
+
+        # work counters of the last frame, a new one each frame
+        self.stats = RenderStats(self.f_width, self.f_height)
+        # also count per column and time per seg for the heatmap
+        self.b_statsDetail = False
 
         self.debug = False
 
@@ -70,6 +133,109 @@ class FpsRenderer(object):
                 print(r, end='')
         print('')
 
+    # choose what this frame is drawn into
+    def startFrame(self):
+        self.profiler.beginFrame()
+        # every vertex seen from the player, read by
+        # the seg clipping of each variant
+        self.profiler.start("fovclip")
+        self.vertexProjection.project(self.player.x, self.player.y, self.player.angle.deg,
+            self.f_fov, self.f_halfWidth, self.f_distancePlayerToScreen)
+        self.profiler.stop()
+        self.stats = RenderStats(self.f_width, self.f_height, self.b_statsDetail)
+        self.b_indexedFrame = False
+        # without a game there is only the pixel buffer
+        if self.b_frameBuffer or self.game is None:
+            self.frameBuffer.clear()
+            self.canvas = self.frameBuffer
+        else:
+            self.canvas = self.game
+
+    # a wall that reached the clip list and the
+    # screen columns the clip list left open for it
+    def countVisible(self, visible):
+        self.stats.i_segsClipped += 1
+        if visible:
+            self.stats.i_segsVisible += 1
+            for i in range(0, len(visible), 2):
+                self.stats.i_columnsVisible += visible[i + 1] - visible[i] + 1
+                self.stats.touchColumns(visible[i], visible[i + 1])
+
+    # a seg tested against the fov, angles is None
+    # when it is outside or facing away
+    def countTested(self, angles):
+        self.stats.i_segsTested += 1
+        if angles is None:
+            self.stats.i_segsRejected += 1
+
+    # show the pixel buffer in the fps window
+    def endFrame(self):
+        if self.b_indexedFrame:
+            self.profiler.start("draw")
+            self.frameBuffer.present(self.textures.getShades(self.i_palette, self.i_fixedColormap))
+            self.profiler.stop()
+        if self.canvas is self.frameBuffer and self.game is not None:
+            self.profiler.start("draw")
+            self.game.drawPixels(self.frameBuffer.pixels, [self.f_xOffset, self.f_yOffset])
+            self.profiler.stop()
+        self.profiler.endFrame()
+
+    # walk the BSP front to back from the player
+    def walkBsp(self, renderSubsector):
+        self.profiler.start("bsp")
+        if self.b_statsDetail:
+            renderSubsector = self.endSegAfter(renderSubsector)
+        self.map.renderBspNodes(self.player.x, self.player.y, renderSubsector, self.getViewSector(), self.getViewCone())
+        self.profiler.stop()
+        self.stats.i_nodes = self.map.nodesVisited
+        self.stats.i_subsectors = self.map.subsectorsVisited
+
+    # the last seg of a subsector is timed up to
+    # the end of the subsector, not the BSP walk after
+    def endSegAfter(self, renderSubsector):
+        def renderTimedSubsector(subsector):
+            result = renderSubsector(subsector)
+            self.stats.endSeg()
+            return result
+        return renderTimedSubsector
+
+    # renderer with no window, GL context or pygame
+    # for batch rendering, golden frames and benchmarks
+    def headless(map, width = 320, height = 200, fov = 90):
+        return FpsRenderer(map, Player(), None, fov, width, height, 0, 0)
+
+    # render one view from x, y looking at angle (degrees)
+    # and return a copy of the (height, width, 3) uint8 frame,
+    # render defaults to doomhistory_render
+    def renderFrame(self, x, y, angle, render = None):
+        self.player.setPosition(x, y)
+        self.player.setAngle(angle)
+        self.player.setSector(self.map.getSectorAtPosition(x, y))
+        b_frameBuffer = self.b_frameBuffer
+        self.b_frameBuffer = True
+        if render is None:
+            render = self.doomhistory_render
+        render()
+        self.b_frameBuffer = b_frameBuffer
+        return self.frameBuffer.pixels.copy()
+
+    # sector the player is looking from, used to
+    # cull subsectors with the REJECT table
+    def getViewSector(self):
+        if self.b_rejectCulling is False:
+            return None
+        return self.map.getSectorAtPosition(self.player.x, self.player.y)
+
+    # solid walls cover every column of the screen
+    def isScreenFull(self):
+        return self.segList.isFull()
+
+    # view angle and fov used to cull BSP subtrees
+    def getViewCone(self):
+        if self.b_bspCulling is False:
+            return None
+        return (self.player.angle.deg, self.f_fov)
+
     def getWallColor(self, textureId, lightLevel = None):
         if textureId in self.wallColors:
             rgba = self.wallColors[textureId]
@@ -82,6 +248,17 @@ class FpsRenderer(object):
             rgba = (rgba[0] * fl, rgba[1] * fl, rgba[2] * fl, rgba[3])
         return rgba
 
+    # palette index closest to the flat color of a name,
+    # for indexed frames without textures and names the
+    # WAD has no picture for
+    def getColorIndex(self, name):
+        index = self.colorIndices.get(name)
+        if index is None:
+            rgb = np.array(self.getWallColor(name)[:3]) * 255
+            index = int(np.argmin(((self.textures.palette - rgb) ** 2).sum(axis=1)))
+            self.colorIndices[name] = index
+        return index
+
 
 
     ###############################
@@ -89,8 +266,11 @@ class FpsRenderer(object):
     ###############################
 
     def edges_render(self, solidOnly = False, onSegInspect = None):
+        self.startFrame()
+
         # loop over all segs
         for i, seg in enumerate(self.map.segs):
+            self.stats.startSeg(seg)
             linedef = seg.linedef
             # if in mode 8 only render solid walls
             if solidOnly and linedef.isSolid() is False:
@@ -98,7 +278,10 @@ class FpsRenderer(object):
 
             v1 = seg.startVertex
             v2 = seg.endVertex
+            self.profiler.start("fovclip")
             angles = self.edges_clipVerticesToFov(v1, v2)
+            self.profiler.stop()
+            self.countTested(angles)
 
             if angles is not None:
                 if onSegInspect is not None:
@@ -111,17 +294,21 @@ class FpsRenderer(object):
                 # wall edge1
                 fpsStart = [v1xScreen + self.f_xOffset, self.f_yOffset]
                 fpsEnd = [v1xScreen + self.f_xOffset, self.f_height + self.f_yOffset]
-                self.game.drawLine(fpsStart, fpsEnd, (1,1,0,1), 1)
+                self.canvas.drawLine(fpsStart, fpsEnd, (1,1,0,1), 1)
 
                 # wall edge 2
                 fpsStart = [v2xScreen + self.f_xOffset, self.f_yOffset]
                 fpsEnd = [v2xScreen + self.f_xOffset, self.f_height + self.f_yOffset]
-                self.game.drawLine(fpsStart, fpsEnd, (1,0,1,1), 1)
+                self.canvas.drawLine(fpsStart, fpsEnd, (1,0,1,1), 1)
+        self.stats.endSeg()
+
+        self.endFrame()
+        return self.stats
 
     def edges_clipVerticesToFov(self, v1, v2):
         fov = Angle(self.f_fov)
-        v1Angle = self.player.angleToVertex(v1)
-        v2Angle = self.player.angleToVertex(v2)
+        v1Angle = self.vertexProjection.getAngle(v1)
+        v2Angle = self.vertexProjection.getAngle(v2)
         spanAngle = v1Angle.subA(v2Angle)
         if spanAngle.gteF(self.f_fov * 2):
             return None
@@ -193,18 +380,21 @@ class FpsRenderer(object):
     ##############################
 
     def wallcull_render(self, onSegInspect = None):
+        self.startFrame()
 
         # optional function pointer when we inspect a visible seg
         self.onSegInspect = onSegInspect
         self.wallRenderer = self.wallcull_renderRange
 
         # clear our clipping list of walls
-        self.segList = [SolidSegmentRange(-100000, -1)]
-        self.segList.append(SolidSegmentRange(self.f_width, 100000))
+        self.segList.reset()
         self.clippings = {} # dict of segIds to screenXs
 
         # render 3d viewport
-        self.map.renderBspNodes(self.player.x, self.player.y, self.wallcull_renderSubsector)
+        self.walkBsp(self.wallcull_renderSubsector)
+
+        self.endFrame()
+        return self.stats
 
     def wallcull_renderRange(self, seg, segPair, angles):
         # get unique color for this line
@@ -217,20 +407,27 @@ class FpsRenderer(object):
         # ranges are exclusive of eachothers start and end
         # so add +1 to width (not for now because I like the line)
         width = segPair[1] - segPair[0] # + 1
-        self.game.drawRectangle(fpsStart, width, self.f_height, rgba)
+        self.canvas.drawRectangle(fpsStart, width, self.f_height, rgba)
+        self.stats.i_middleColumns += width
+        self.stats.i_pixelsWritten += width * self.f_height
+        self.stats.writeColumns(segPair[0], segPair[1] - 1)
 
     def wallcull_renderSubsector(self, subsector):
         # iterate segs in subsector
         for i in range(subsector.segCount):
             segId = subsector.firstSegID + i
             seg = self.map.segs[segId]
+            self.stats.startSeg(seg)
             linedef = seg.linedef
             if linedef.isSolid() is False: # skip non-solid walls for now
                 continue
 
             v1 = seg.startVertex
             v2 = seg.endVertex
+            self.profiler.start("fovclip")
             angles = self.wallcull_clipVerticesToFov(v1, v2)
+            self.profiler.stop()
+            self.countTested(angles)
 
             if angles is not None:
                 if self.onSegInspect is not None:
@@ -259,8 +456,8 @@ class FpsRenderer(object):
 
     def wallcull_clipVerticesToFov(self, v1, v2):
         fov = Angle(self.f_fov)
-        v1Angle = self.player.angleToVertex(v1)
-        v2Angle = self.player.angleToVertex(v2)
+        v1Angle = self.vertexProjection.getAngle(v1)
+        v2Angle = self.vertexProjection.getAngle(v2)
         spanAngle = v1Angle.subA(v2Angle)
         if spanAngle.gteF(self.f_fov * 2):
             return None
@@ -309,87 +506,18 @@ class FpsRenderer(object):
 
         return v1Angle, v2Angle
 
-    # python DIY linked lists are a nightmare
-    # because of the pass-object-by-reference
-    # nature of variables
-    # when I change next and prev values on a
-    # node it changes it for that copy of the
-    # variable, and not for the underlying reference
-    # TODO take a seg and implement StoreWallRange
-    # so that we can update the segs display range
+    # StoreWallRange for each part of the wall the
+    # solid seg list still has uncovered, then covers it
     def wallcull_clipWall(self, seg, segList, wallStart, wallEnd, clippings, angles, rangeRenderer):
-        if len(segList) < 2:
-            return
-        segId = seg.ID
-        segRange = None
-        segIndex = None
-        # skip all segments that end before this wall starts
-        i=0
-        while (i < len(segList) and segList[i].xEnd < wallStart - 1):
-            i += 1
-        segIndex = i
-        segRange = segList[segIndex]
-        # should always have a node since we cap our ends with
-        # "infinity"
-        # START to OVERLAP
-        if wallStart < segRange.xStart:
-            # found a position in the node list
-            # are they overlapping?
-            if wallEnd < segRange.xStart - 1:
-                # all of the wall is visible to insert it
-                # STOREWALL
-                # StoreWallRange(seg, CurrentWall.XStart, CurrentWall.XEnd);
-                clippings[segId] = (wallStart, wallEnd)
-                rangeRenderer(seg, clippings[segId], angles)
-                segList.insert(segIndex, SolidSegmentRange(wallStart, wallEnd))
-                # go to next wall
-                return
-            # if not overlapping, end is already included
-            # so just update the start
-            # STOREWALL
-            # StoreWallRange(seg, CurrentWall.XStart, FoundClipWall->XStart - 1);
-            clippings[segId] = (wallStart,  segRange.xStart - 1)
-            rangeRenderer(seg, clippings[segId], angles)
-            segRange.xStart = wallStart
-        # FULL OVERLAPPED
-        # this part is already occupied
-        if wallEnd <= segRange.xEnd:
-            return # go to next wall
-
-        # CHOP AND MERGE
-        # start by looking at the next entry in the list
-        # is the next entry within the current wall range?
-        nextSegIndex = segIndex
-        nextSegRange = segRange
-        while wallEnd >= segList[nextSegIndex + 1].xStart - 1:
-            # STOREWALL
-            # StoreWallRange(seg, NextWall->XEnd + 1, next(NextWall, 1)->XStart - 1);
-            clippings[segId] = (nextSegRange.xEnd + 1,  segList[nextSegIndex + 1].xStart - 1)
-            rangeRenderer(seg, clippings[segId], angles)
-
-            nextSegIndex += 1
-            nextSegRange = segList[nextSegIndex]
-            # partially clipped by other walls, store each fragment
-            if wallEnd <= nextSegRange.xEnd:
-                segRange.xEnd = nextSegRange.xEnd
-                if nextSegIndex != segIndex:
-                    segIndex += 1
-                    nextSegIndex += 1
-                    del segList[segIndex:nextSegIndex]
-                return
-
-        # wall precedes all known segments
-        # STOREWALL
-        # StoreWallRange(seg, NextWall->XEnd + 1, CurrentWall.XEnd);
-        clippings[segId] = (nextSegRange.xEnd + 1,  wallEnd)
-        rangeRenderer(seg, clippings[segId], angles)
-        segRange.xEnd = wallEnd
-
-        if (nextSegIndex != segIndex):
-            segIndex += 1
-            nextSegIndex += 1
-            del segList[segIndex:nextSegIndex]
-        return
+        self.profiler.start("cliplist")
+        visible = segList.clipSolidWall(wallStart, wallEnd)
+        self.profiler.stop()
+        self.countVisible(visible)
+        self.profiler.start("height")
+        for i in range(0, len(visible), 2):
+            clippings[seg.ID] = (visible[i], visible[i + 1])
+            rangeRenderer(seg, clippings[seg.ID], angles)
+        self.profiler.stop()
 
 
 
@@ -402,31 +530,38 @@ class FpsRenderer(object):
     ################################
 
     def wolfenstein_render(self, onSegInspect = None):
+        self.startFrame()
 
         # optional function pointer when we inspect a visible seg
         self.onSegInspect = onSegInspect
         self.wallRenderer = self.wolfenstein_renderWall
 
         # clear our clipping list of walls
-        self.segList = [SolidSegmentRange(-100000, -1)]
-        self.segList.append(SolidSegmentRange(self.f_width, 100000))
+        self.segList.reset()
         self.clippings = {} # dict of segIds to screenXs
 
         # render 3d viewport
-        self.map.renderBspNodes(self.player.x, self.player.y, self.wolfenstein_renderSubsector)
+        self.walkBsp(self.wolfenstein_renderSubsector)
+
+        self.endFrame()
+        return self.stats
 
     def wolfenstein_renderSubsector(self, subsector):
         # iterate segs in subsector
         for i in range(subsector.segCount):
             segId = subsector.firstSegID + i
             seg = self.map.segs[segId]
+            self.stats.startSeg(seg)
             linedef = seg.linedef
             if linedef.isSolid() is False: # skip non-solid walls for now
                 continue
 
             v1 = seg.startVertex
             v2 = seg.endVertex
+            self.profiler.start("fovclip")
             angles = self.wolfenstein_clipVerticesToFov(v1, v2)
+            self.profiler.stop()
+            self.countTested(angles)
 
             if angles is not None:
                 if self.onSegInspect is not None:
@@ -455,8 +590,8 @@ class FpsRenderer(object):
 
     def wolfenstein_clipVerticesToFov(self, v1, v2):
         fov = Angle(self.f_fov)
-        v1Angle = self.player.angleToVertex(v1)
-        v2Angle = self.player.angleToVertex(v2)
+        v1Angle = self.vertexProjection.getAngle(v1)
+        v2Angle = self.vertexProjection.getAngle(v2)
         spanAngle = v1Angle.subA(v2Angle)
         if spanAngle.gteF(self.f_fov * 2):
             return None
@@ -514,8 +649,8 @@ class FpsRenderer(object):
 
         # we have v1 and v2, do calculations for v1 and v2
         # separately then interpolate values in between
-        distanceToV1 = self.player.distanceToVertex(v1)
-        distanceToV2 = self.player.distanceToVertex(v2)
+        distanceToV1 = self.vertexProjection.getDistance(v1)
+        distanceToV2 = self.vertexProjection.getDistance(v2)
 
         # fix that clipped seg angles are weird
         # cant get this to not divide by zero so commenting out
@@ -541,13 +676,13 @@ class FpsRenderer(object):
         rcy = ceilingV2onScreen + self.f_yOffset
         lfy = floorV1onScreen + self.f_yOffset
         rfy = floorV2onScreen + self.f_yOffset
-        self.game.drawLine([lx, lcy], [lx, lfy], rgba, 1)
+        self.canvas.drawLine([lx, lcy], [lx, lfy], rgba, 1)
         # right side
-        self.game.drawLine([rx, rcy], [rx, rfy], rgba, 1)
+        self.canvas.drawLine([rx, rcy], [rx, rfy], rgba, 1)
         # top
-        self.game.drawLine([lx, lcy], [rx, rcy], rgba, 1)
+        self.canvas.drawLine([lx, lcy], [rx, rcy], rgba, 1)
         # bottom
-        self.game.drawLine([lx, lfy], [rx, rfy], rgba, 1)
+        self.canvas.drawLine([lx, lfy], [rx, rfy], rgba, 1)
 
     def wolfenstein_calculateCeilingFloorHeight(self, seg, vxScreen, distanceToV):
         # return ceilingVOnScreen, floorVOnScreen
@@ -597,87 +732,18 @@ class FpsRenderer(object):
 
         return distanceToV
 
-    # python DIY linked lists are a nightmare
-    # because of the pass-object-by-reference
-    # nature of variables
-    # when I change next and prev values on a
-    # node it changes it for that copy of the
-    # variable, and not for the underlying reference
-    # TODO take a seg and implement StoreWallRange
-    # so that we can update the segs display range
+    # StoreWallRange for each part of the wall the
+    # solid seg list still has uncovered, then covers it
     def wolfenstein_clipWall(self, seg, segList, wallStart, wallEnd, clippings, angles, rangeRenderer):
-        if len(segList) < 2:
-            return
-        segId = seg.ID
-        segRange = None
-        segIndex = None
-        # skip all segments that end before this wall starts
-        i=0
-        while (i < len(segList) and segList[i].xEnd < wallStart - 1):
-            i += 1
-        segIndex = i
-        segRange = segList[segIndex]
-        # should always have a node since we cap our ends with
-        # "infinity"
-        # START to OVERLAP
-        if wallStart < segRange.xStart:
-            # found a position in the node list
-            # are they overlapping?
-            if wallEnd < segRange.xStart - 1:
-                # all of the wall is visible to insert it
-                # STOREWALL
-                # StoreWallRange(seg, CurrentWall.XStart, CurrentWall.XEnd);
-                clippings[segId] = (wallStart, wallEnd)
-                rangeRenderer(seg, clippings[segId], angles)
-                segList.insert(segIndex, SolidSegmentRange(wallStart, wallEnd))
-                # go to next wall
-                return
-            # if not overlapping, end is already included
-            # so just update the start
-            # STOREWALL
-            # StoreWallRange(seg, CurrentWall.XStart, FoundClipWall->XStart - 1);
-            clippings[segId] = (wallStart,  segRange.xStart - 1)
-            rangeRenderer(seg, clippings[segId], angles)
-            segRange.xStart = wallStart
-        # FULL OVERLAPPED
-        # this part is already occupied
-        if wallEnd <= segRange.xEnd:
-            return # go to next wall
-
-        # CHOP AND MERGE
-        # start by looking at the next entry in the list
-        # is the next entry within the current wall range?
-        nextSegIndex = segIndex
-        nextSegRange = segRange
-        while wallEnd >= segList[nextSegIndex + 1].xStart - 1:
-            # STOREWALL
-            # StoreWallRange(seg, NextWall->XEnd + 1, next(NextWall, 1)->XStart - 1);
-            clippings[segId] = (nextSegRange.xEnd + 1,  segList[nextSegIndex + 1].xStart - 1)
-            rangeRenderer(seg, clippings[segId], angles)
-
-            nextSegIndex += 1
-            nextSegRange = segList[nextSegIndex]
-            # partially clipped by other walls, store each fragment
-            if wallEnd <= nextSegRange.xEnd:
-                segRange.xEnd = nextSegRange.xEnd
-                if nextSegIndex != segIndex:
-                    segIndex += 1
-                    nextSegIndex += 1
-                    del segList[segIndex:nextSegIndex]
-                return
-
-        # wall precedes all known segments
-        # STOREWALL
-        # StoreWallRange(seg, NextWall->XEnd + 1, CurrentWall.XEnd);
-        clippings[segId] = (nextSegRange.xEnd + 1,  wallEnd)
-        rangeRenderer(seg, clippings[segId], angles)
-        segRange.xEnd = wallEnd
-
-        if (nextSegIndex != segIndex):
-            segIndex += 1
-            nextSegIndex += 1
-            del segList[segIndex:nextSegIndex]
-        return
+        self.profiler.start("cliplist")
+        visible = segList.clipSolidWall(wallStart, wallEnd)
+        self.profiler.stop()
+        self.countVisible(visible)
+        self.profiler.start("height")
+        for i in range(0, len(visible), 2):
+            clippings[seg.ID] = (visible[i], visible[i + 1])
+            rangeRenderer(seg, clippings[seg.ID], angles)
+        self.profiler.stop()
 
 
 
@@ -690,23 +756,28 @@ class FpsRenderer(object):
     ################################
 
     def doomsolids_render(self, onSegInspect = None):
+        self.startFrame()
+
         # optional function pointer when we inspect a visible seg
         self.onSegInspect = onSegInspect
         self.wallRenderer = self.doomsolids_renderWall
 
         # clear our clipping list of walls
-        self.segList = [SolidSegmentRange(-100000, -1)]
-        self.segList.append(SolidSegmentRange(self.f_width, 100000))
+        self.segList.reset()
         self.clippings = {} # dict of segIds to screenXs
 
         # render 3d viewport
-        self.map.renderBspNodes(self.player.x, self.player.y, self.doomsolids_renderSubsector)
+        self.walkBsp(self.doomsolids_renderSubsector)
+
+        self.endFrame()
+        return self.stats
 
     def doomsolids_renderSubsector(self, subsector):
         # iterate segs in subsector
         for i in range(subsector.segCount):
             segId = subsector.firstSegID + i
             seg = self.map.segs[segId]
+            self.stats.startSeg(seg)
             linedef = seg.linedef
             if linedef.isSolid() is False: # skip non-solid walls for now
                 continue
@@ -714,7 +785,10 @@ class FpsRenderer(object):
             v1 = seg.startVertex
             v2 = seg.endVertex
             # four angles
+            self.profiler.start("fovclip")
             angles = self.doomsolids_clipVerticesToFov(v1, v2)
+            self.profiler.stop()
+            self.countTested(angles)
 
             if angles is not None:
                 if self.onSegInspect is not None:
@@ -727,6 +801,10 @@ class FpsRenderer(object):
 
                 self.doomsolids_addWallInFov(seg, v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer)
 
+                # tell the BSP walk to stop once the screen is full
+                if self.isScreenFull():
+                    return True
+
     def doomsolids_addWallInFov(self, seg, v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer):
         v1 = seg.startVertex
         v2 = seg.endVertex
@@ -767,7 +845,7 @@ class FpsRenderer(object):
         # normal angle is 90deg to wall
         segToPlayerAngle = angle90.subA(normalToV1Angle)
 
-        f_distanceToV1 = self.player.distanceToVertex(v1)
+        f_distanceToV1 = self.vertexProjection.getDistance(v1)
         f_distanceToNormal = segToPlayerAngle.getSin() * f_distanceToV1
 
         v1ScaleFactor = self.doomsolids_getScaleFactor(v1xScreen, segToNormalAngle, f_distanceToNormal)
@@ -797,11 +875,22 @@ class FpsRenderer(object):
         while iXCurrent <= v2xScreen:
             drawStart = [iXCurrent + self.f_xOffset, ceilingEnd + self.f_yOffset]
             drawEnd = [iXCurrent + self.f_xOffset, floorStart + self.f_yOffset]
-            self.game.drawLine(drawStart, drawEnd, rgba, 1)
+            self.canvas.drawLine(drawStart, drawEnd, rgba, 1)
+            self.doomsolids_countColumn(iXCurrent, ceilingEnd, floorStart)
             iXCurrent += 1
             ceilingEnd += ceilingStep
             floorStart += floorStep
 
+    # solid walls are not clipped to the screen
+    # so only count the part of the line on it
+    def doomsolids_countColumn(self, x, ceilingEnd, floorStart):
+        self.stats.i_middleColumns += 1
+        top = max(int(ceilingEnd), 0)
+        bottom = min(int(floorStart), self.f_height - 1)
+        if bottom >= top:
+            self.stats.i_pixelsWritten += bottom - top + 1
+            self.stats.writeColumns(x, x)
+
     # Method in DOOM engine that calculated a wall height
     # scale factor given a distance of the wall from the screen
     # and the distance of that same angle from the player to screen
@@ -840,8 +929,8 @@ class FpsRenderer(object):
     def doomsolids_clipVerticesToFov(self, v1, v2):
         a_fov = Angle(self.f_fov)
 
-        v1Angle = self.player.angleToVertex(v1)
-        v2Angle = self.player.angleToVertex(v2)
+        v1Angle = self.vertexProjection.getAngle(v1)
+        v2Angle = self.vertexProjection.getAngle(v2)
 
         a_spanAngle = v1Angle.subA(v2Angle)
         if a_spanAngle.gteF(self.f_fov * 2):
@@ -893,90 +982,18 @@ class FpsRenderer(object):
 
         return v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer
 
-    # python DIY linked lists are a nightmare
-    # because of the pass-object-by-reference
-    # nature of variables
-    # when I change next and prev values on a
-    # node it changes it for that copy of the
-    # variable, and not for the underlying reference
-    # TODO take a seg and implement StoreWallRange
-    # so that we can update the segs display range
+    # StoreWallRange for each part of the wall the
+    # solid seg list still has uncovered, then covers it
     def doomsolids_clipWall(self, seg, segList, v1xScreen, v2xScreen, v1Angle, v2Angle, clippings, rangeRenderer):
-        if len(segList) < 2:
-            return
-
-        segId = seg.ID
-        segRange = None
-        segIndex = None
-        # skip all segments that end before this wall starts
-        i=0
-        while (i < len(segList) and segList[i].xEnd < v1xScreen - 1):
-            i += 1
-        segIndex = i
-        segRange = segList[segIndex]
-
-        # should always have a node since we cap our ends with
-        # "infinity"
-        # START to OVERLAP
-        if v1xScreen < segRange.xStart:
-            # found a position in the node list
-            # are they overlapping?
-            if v2xScreen < segRange.xStart - 1:
-                # all of the wall is visible to insert it
-                # STOREWALL
-                # StoreWallRange(seg, CurrentWall.XStart, CurrentWall.XEnd);
-                clippings[segId] = (v1xScreen, v2xScreen)
-                rangeRenderer(seg, clippings[segId], v1Angle, v2Angle)
-                segList.insert(segIndex, SolidSegmentRange(v1xScreen, v2xScreen))
-                # go to next wall
-                return
-            # if not overlapping, end is already included
-            # so just update the start
-            # STOREWALL
-            # StoreWallRange(seg, CurrentWall.XStart, FoundClipWall->XStart - 1);
-            clippings[segId] = (v1xScreen,  segRange.xStart - 1)
-            rangeRenderer(seg, clippings[segId], v1Angle, v2Angle)
-            segRange.xStart = v1xScreen
-
-        # FULL OVERLAPPED
-        # this part is already occupied
-        if v2xScreen <= segRange.xEnd:
-            return # go to next wall
-
-        # CHOP AND MERGE
-        # start by looking at the next entry in the list
-        # is the next entry within the current wall range?
-        nextSegIndex = segIndex
-        nextSegRange = segRange
-        while v2xScreen >= segList[nextSegIndex + 1].xStart - 1:
-            # STOREWALL
-            # StoreWallRange(seg, NextWall->XEnd + 1, next(NextWall, 1)->XStart - 1);
-            clippings[segId] = (nextSegRange.xEnd + 1,  segList[nextSegIndex + 1].xStart - 1)
-            rangeRenderer(seg, clippings[segId], v1Angle, v2Angle)
-
-            nextSegIndex += 1
-            nextSegRange = segList[nextSegIndex]
-            # partially clipped by other walls, store each fragment
-            if v2xScreen <= nextSegRange.xEnd:
-                segRange.xEnd = nextSegRange.xEnd
-                if nextSegIndex != segIndex:
-                    segIndex += 1
-                    nextSegIndex += 1
-                    del segList[segIndex:nextSegIndex]
-                return
-
-        # wall precedes all known segments
-        # STOREWALL
-        # StoreWallRange(seg, NextWall->XEnd + 1, CurrentWall.XEnd);
-        clippings[segId] = (nextSegRange.xEnd + 1,  v2xScreen)
-        rangeRenderer(seg, clippings[segId], v1Angle, v2Angle)
-        segRange.xEnd = v2xScreen
-
-        if (nextSegIndex != segIndex):
-            segIndex += 1
-            nextSegIndex += 1
-            del segList[segIndex:nextSegIndex]
-        return
+        self.profiler.start("cliplist")
+        visible = segList.clipSolidWall(v1xScreen, v2xScreen)
+        self.profiler.stop()
+        self.countVisible(visible)
+        self.profiler.start("height")
+        for i in range(0, len(visible), 2):
+            clippings[seg.ID] = (visible[i], visible[i + 1])
+            rangeRenderer(seg, clippings[seg.ID], v1Angle, v2Angle)
+        self.profiler.stop()
 
 
 
@@ -988,13 +1005,14 @@ class FpsRenderer(object):
     #################################
 
     def doomportals_render(self, onSegInspect = None):
+        self.startFrame()
+
         # optional function pointer when we inspect a visible seg
         self.onSegInspect = onSegInspect
         self.wallRenderer = self.doomportals_renderWall
 
         # clear our clipping list of walls
-        self.segList = [SolidSegmentRange(-100000, -1)]
-        self.segList.append(SolidSegmentRange(self.f_width, 100000))
+        self.segList.reset()
         # clear our ceiling and floor clipping lists for portaled walls
         for i,v in enumerate(self.doomportals_ceilingClipHeight):
             self.doomportals_ceilingClipHeight[i] = -1; # reset
@@ -1002,19 +1020,26 @@ class FpsRenderer(object):
             self.doomportals_floorClipHeight[i] = int(self.f_height)
 
         # render 3d viewport
-        self.map.renderBspNodes(self.player.x, self.player.y, self.doomportals_renderSubsector)
+        self.walkBsp(self.doomportals_renderSubsector)
+
+        self.endFrame()
+        return self.stats
 
     def doomportals_renderSubsector(self, subsector):
         # iterate segs in subsector
         for i in range(subsector.segCount):
             segId = subsector.firstSegID + i
             seg = self.map.segs[segId]
+            self.stats.startSeg(seg)
             linedef = seg.linedef
 
             v1 = seg.startVertex
             v2 = seg.endVertex
             # four angles
+            self.profiler.start("fovclip")
             angles = self.doomportals_clipVerticesToFov(v1, v2)
+            self.profiler.stop()
+            self.countTested(angles)
 
             if angles is not None:
                 if self.onSegInspect is not None:
@@ -1027,6 +1052,10 @@ class FpsRenderer(object):
 
                 self.doomportals_addWallInFov(seg, v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer)
 
+                # tell the BSP walk to stop once the screen is full
+                if self.isScreenFull():
+                    return True
+
     def doomportals_addWallInFov(self, seg, v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer):
         v1 = seg.startVertex
         v2 = seg.endVertex
@@ -1113,7 +1142,7 @@ class FpsRenderer(object):
         # normal angle is 90deg to wall
         segToPlayerAngle = angle90.subA(normalToV1Angle)
 
-        RD.f_distanceToV1 = self.player.distanceToVertex(v1)
+        RD.f_distanceToV1 = self.vertexProjection.getDistance(v1)
         RD.f_distanceToNormal = segToPlayerAngle.getSin() * RD.f_distanceToV1
 
         RD.f_v1ScaleFactor = self.doomportals_getScaleFactor(v1xScreen, segToNormalAngle, RD.f_distanceToNormal)
@@ -1264,7 +1293,10 @@ class FpsRenderer(object):
                 # DRAW LINE
                 drawStart = [iXCurrent + self.f_xOffset, i_currentCeilingEnd + self.f_yOffset]
                 drawEnd = [iXCurrent + self.f_xOffset, i_upperHeight + self.f_yOffset]
-                self.game.drawLine(drawStart, drawEnd, RD.rgba, 1)
+                self.canvas.drawLine(drawStart, drawEnd, RD.rgba, 1)
+                self.stats.i_upperColumns += 1
+                self.stats.i_pixelsWritten += int(i_upperHeight) - int(i_currentCeilingEnd) + 1
+                self.stats.writeColumns(iXCurrent, iXCurrent)
                 self.doomportals_ceilingClipHeight[iXCurrent] = i_upperHeight
             else:
                 self.doomportals_ceilingClipHeight[iXCurrent] = i_currentCeilingEnd - 1
@@ -1283,7 +1315,10 @@ class FpsRenderer(object):
                 # DRAW LINE
                 drawStart = [iXCurrent + self.f_xOffset, i_lowerHeight + self.f_yOffset]
                 drawEnd = [iXCurrent + self.f_xOffset, i_currentFloorStart + self.f_yOffset]
-                self.game.drawLine(drawStart, drawEnd, RD.rgba, 1)
+                self.canvas.drawLine(drawStart, drawEnd, RD.rgba, 1)
+                self.stats.i_lowerColumns += 1
+                self.stats.i_pixelsWritten += int(i_currentFloorStart) - int(i_lowerHeight) + 1
+                self.stats.writeColumns(iXCurrent, iXCurrent)
                 self.doomportals_floorClipHeight[iXCurrent] = i_lowerHeight
             else:
                 self.doomportals_floorClipHeight[iXCurrent] = i_currentFloorStart + 1
@@ -1294,7 +1329,10 @@ class FpsRenderer(object):
         # DRAW LINE
         drawStart = [iXCurrent + self.f_xOffset, i_currentCeilingEnd + self.f_yOffset]
         drawEnd = [iXCurrent + self.f_xOffset, i_currentFloorStart + self.f_yOffset]
-        self.game.drawLine(drawStart, drawEnd, RD.rgba, 1)
+        self.canvas.drawLine(drawStart, drawEnd, RD.rgba, 1)
+        self.stats.i_middleColumns += 1
+        self.stats.i_pixelsWritten += int(i_currentFloorStart) - int(i_currentCeilingEnd) + 1
+        self.stats.writeColumns(iXCurrent, iXCurrent)
         self.doomportals_ceilingClipHeight[iXCurrent] = self.f_height # full clip
         self.doomportals_floorClipHeight[iXCurrent] = -1 # full clip
 
@@ -1302,8 +1340,8 @@ class FpsRenderer(object):
     def doomportals_clipVerticesToFov(self, v1, v2):
         a_fov = Angle(self.f_fov)
 
-        v1Angle = self.player.angleToVertex(v1)
-        v2Angle = self.player.angleToVertex(v2)
+        v1Angle = self.vertexProjection.getAngle(v1)
+        v2Angle = self.vertexProjection.getAngle(v2)
 
         a_spanAngle = v1Angle.subA(v2Angle)
         if a_spanAngle.gteF(self.f_fov * 2):
@@ -1355,145 +1393,29 @@ class FpsRenderer(object):
 
         return v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer
 
-    # python DIY linked lists are a nightmare
-    # because of the pass-object-by-reference
-    # nature of variables
-    # when I change next and prev values on a
-    # node it changes it for that copy of the
-    # variable, and not for the underlying reference
-    # TODO take a seg and implement StoreWallRange
-    # so that we can update the segs display range
+    # StoreWallRange for each part of the wall the
+    # solid seg list still has uncovered, then covers it
     def doomportals_clipSolidWall(self, seg, segList, v1xScreen, v2xScreen, v1Angle, v2Angle, rangeRenderer):
-        if len(segList) < 2:
-            return
-
-        segId = seg.ID
-        segRange = None
-        segIndex = None
-        # skip all segments that end before this wall starts
-        i=0
-        while (i < len(segList) and segList[i].xEnd < v1xScreen - 1):
-            i += 1
-        segIndex = i
-        segRange = segList[segIndex]
-
-        # should always have a node since we cap our ends with
-        # "infinity"
-        # START to OVERLAP
-        if v1xScreen < segRange.xStart:
-            # found a position in the node list
-            # are they overlapping?
-            if v2xScreen < segRange.xStart - 1:
-                # all of the wall is visible to insert it
-                # STOREWALL
-                # StoreWallRange(seg, CurrentWall.XStart, CurrentWall.XEnd);
-                rangeRenderer(seg, v1xScreen, v2xScreen, v1Angle, v2Angle)
-                segList.insert(segIndex, SolidSegmentRange(v1xScreen, v2xScreen))
-                # go to next wall
-                return
-            # if not overlapping, end is already included
-            # so just update the start
-            # STOREWALL
-            # StoreWallRange(seg, CurrentWall.XStart, FoundClipWall->XStart - 1);
-            rangeRenderer(seg, v1xScreen,  segRange.xStart - 1, v1Angle, v2Angle)
-            segRange.xStart = v1xScreen
-
-        # FULL OVERLAPPED
-        # this part is already occupied
-        if v2xScreen <= segRange.xEnd:
-            return # go to next wall
-
-        # CHOP AND MERGE
-        # start by looking at the next entry in the list
-        # is the next entry within the current wall range?
-        nextSegIndex = segIndex
-        nextSegRange = segRange
-        while v2xScreen >= segList[nextSegIndex + 1].xStart - 1:
-            # STOREWALL
-            # StoreWallRange(seg, NextWall->XEnd + 1, next(NextWall, 1)->XStart - 1);
-            rangeRenderer(seg, nextSegRange.xEnd + 1,  segList[nextSegIndex + 1].xStart - 1, v1Angle, v2Angle)
-
-            nextSegIndex += 1
-            nextSegRange = segList[nextSegIndex]
-            # partially clipped by other walls, store each fragment
-            if v2xScreen <= nextSegRange.xEnd:
-                segRange.xEnd = nextSegRange.xEnd
-                if nextSegIndex != segIndex:
-                    segIndex += 1
-                    nextSegIndex += 1
-                    del segList[segIndex:nextSegIndex]
-                return
-
-        # wall precedes all known segments
-        # STOREWALL
-        # StoreWallRange(seg, NextWall->XEnd + 1, CurrentWall.XEnd);
-        rangeRenderer(seg, nextSegRange.xEnd + 1,  v2xScreen, v1Angle, v2Angle)
-        segRange.xEnd = v2xScreen
-
-        if (nextSegIndex != segIndex):
-            segIndex += 1
-            nextSegIndex += 1
-            del segList[segIndex:nextSegIndex]
-        return
+        self.profiler.start("cliplist")
+        visible = segList.clipSolidWall(v1xScreen, v2xScreen)
+        self.profiler.stop()
+        self.countVisible(visible)
+        self.profiler.start("height")
+        for i in range(0, len(visible), 2):
+            rangeRenderer(seg, visible[i], visible[i + 1], v1Angle, v2Angle)
+        self.profiler.stop()
 
     # Very similar to clipSolidWall but does not
     # modify the segList
     def doomportals_clipPortalWall(self, seg, segList, v1xScreen, v2xScreen, v1Angle, v2Angle, rangeRenderer):
-        # find clip window
-        segId = seg.ID
-        segRange = None
-        segIndex = None
-        # skip all segments that end before this wall starts
-        i=0
-        while (i < len(segList) and segList[i].xEnd < v1xScreen - 1):
-            i += 1
-        segIndex = i
-        segRange = segList[segIndex]
-
-        # should always have a node since we cap our ends with
-        # "infinity"
-        # START to OVERLAP
-        if v1xScreen < segRange.xStart:
-            # found a position in the node list
-            # are they overlapping?
-            if v2xScreen < segRange.xStart - 1:
-                # all of the wall is visible to insert it
-                # STOREWALL
-                # StoreWallRange(seg, CurrentWall.XStart, CurrentWall.XEnd);
-                rangeRenderer(seg, v1xScreen, v2xScreen, v1Angle, v2Angle)
-                # go to next wall
-                return
-            # if not overlapping, end is already included
-            # so just update the start
-            # STOREWALL
-            # StoreWallRange(seg, CurrentWall.XStart, FoundClipWall->XStart - 1);
-            rangeRenderer(seg, v1xScreen,  segRange.xStart - 1, v1Angle, v2Angle)
-
-        # FULL OVERLAPPED
-        # this part is already occupied
-        if v2xScreen <= segRange.xEnd:
-            return # go to next wall
-
-        # CHOP AND MERGE
-        # start by looking at the next entry in the list
-        # is the next entry within the current wall range?
-        nextSegIndex = segIndex
-        nextSegRange = segRange
-        while v2xScreen >= segList[nextSegIndex + 1].xStart - 1:
-            # STOREWALL
-            # StoreWallRange(seg, NextWall->XEnd + 1, next(NextWall, 1)->XStart - 1);
-            rangeRenderer(seg, nextSegRange.xEnd + 1,  segList[nextSegIndex + 1].xStart - 1, v1Angle, v2Angle)
-
-            nextSegIndex += 1
-            nextSegRange = segList[nextSegIndex]
-            # partially clipped by other walls, store each fragment
-            if v2xScreen <= nextSegRange.xEnd:
-                return
-
-        # wall precedes all known segments
-        # STOREWALL
-        # StoreWallRange(seg, NextWall->XEnd + 1, CurrentWall.XEnd);
-        rangeRenderer(seg, nextSegRange.xEnd + 1,  v2xScreen, v1Angle, v2Angle)
+        self.profiler.start("cliplist")
+        visible = segList.clipPortalWall(v1xScreen, v2xScreen)
+        self.profiler.stop()
+        self.countVisible(visible)
+        self.profiler.start("height")
+        for i in range(0, len(visible), 2):
+            rangeRenderer(seg, visible[i], visible[i + 1], v1Angle, v2Angle)
+        self.profiler.stop()
 
 
 
@@ -1534,6 +1456,11 @@ class FpsRenderer(object):
             self.b_updateFloor = False
             self.b_updateCeiling = False
 
+            # texture column and 1 / scale of each drawn
+            # column, None when not textured or not indexed
+            self.us = None
+            self.iscales = None
+
     class doomhistory_FrameSegDrawData(object):
         def __init__(self):
             self.seg = None
@@ -1541,38 +1468,219 @@ class FpsRenderer(object):
             self.b_drawMiddleSection = False
             self.b_drawLowerSection = False
 
-            self.upperSection = []
-            self.middleSection = []
-            self.lowerSection = []
-
-    class doomhistory_SingleDrawLine(object):
+            # (xs, tops, bottoms, us, iscales) arrays of the
+            # columns to draw, us and iscales can be None
+            self.upperSection = None
+            self.middleSection = None
+            self.lowerSection = None
+
+            # silhouette for sprites, the scale of columns
+            # x1..x2 and the clip heights left once the seg
+            # was drawn, None when sprites are not drawn
+            self.i_x1 = 0
+            self.i_x2 = -1
+            self.scales = None
+            self.spriteTopClips = None
+            self.spriteBottomClips = None
+
+    # Floor or ceiling area of one height, flat and light
+    # rows tops[x]..bottoms[x] of each column x are open
+    # to the plane, a column only ever belongs to one plane
+    # of a key so overlapping ranges start a new plane
+    class doomhistory_Visplane(object):
+        UNUSED = 0x7fff
+
+        def __init__(self, height, flat, lightLevel, width):
+            self.f_height = height
+            self.flat = flat
+            self.i_lightLevel = lightLevel
+            self.i_minX = width
+            self.i_maxX = -1
+            self.tops = np.full(width, FpsRenderer.doomhistory_Visplane.UNUSED, dtype=np.int32)
+            self.bottoms = np.full(width, -1, dtype=np.int32)
+
+    # Thing sprite projected into the view like
+    # R_ProjectSprite, its picture covers the float
+    # columns xLeft..xLeft + width * scale and the
+    # screen columns x1..x2
+    class doomhistory_Vissprite(object):
         def __init__(self):
-            self.x1 = 0
-            self.y1 = 0
-            self.x2 = 0
-            self.x2 = 0
+            self.picture = None
+            self.b_flipped = False
+            self.f_scale = 0
+            self.f_xLeft = 0
+            self.i_x1 = 0
+            self.i_x2 = -1
+            self.f_textureMid = 0 # picture top above the eye
+            self.i_light = 0
 
     def doomhistory_render(self, lineMode = False, onSegInspect = None):
+        self.startFrame()
+
         # optional function pointer when we inspect a visible seg
         self.onSegInspect = onSegInspect
         self.wallRenderer = self.doomhistory_renderWall
         self.doomhistory_frameSegsDrawData.clear()
+        self.doomhistory_visplanes.clear()
+        self.doomhistory_vissprites.clear()
         self.doomhistory_lineMode = lineMode
+        self.b_indexedFrame = self.doomhistory_isIndexed()
 
         # clear our clipping list of walls
-        self.segList = [SolidSegmentRange(-100000, -1)]
-        self.segList.append(SolidSegmentRange(self.f_width, 100000))
+        self.segList.reset()
         # clear our ceiling and floor clipping lists for portaled walls
-        for i,v in enumerate(self.doomhistory_ceilingClipHeight):
-            self.doomhistory_ceilingClipHeight[i] = -1; # reset
-        for i,v in enumerate(self.doomhistory_floorClipHeight):
-            self.doomhistory_floorClipHeight[i] = int(self.f_height)
+        self.doomhistory_ceilingClipHeight.fill(-1)
+        self.doomhistory_floorClipHeight.fill(int(self.f_height))
 
         # render 3d viewport
         # This no longer draws but stores what to draw in the section lists of FrameSegDrawData
-        self.map.renderBspNodes(self.player.x, self.player.y, self.doomhistory_renderSubsector)
+        self.walkBsp(self.doomhistory_renderSubsector)
 
+        self.profiler.start("draw")
         self.doomhistory_drawStoredSegs()
+        self.profiler.stop()
+
+        self.profiler.start("planes")
+        self.doomhistory_drawPlanes()
+        self.profiler.stop()
+
+        self.profiler.start("sprites")
+        self.doomhistory_drawSprites()
+        self.profiler.stop()
+
+        self.endFrame()
+        return self.stats
+
+    # floors and ceilings are drawn unless we only
+    # draw every 4th wall column as lines
+    def doomhistory_isDrawingPlanes(self):
+        return self.b_drawPlanes and not self.doomhistory_lineMode
+
+    # R_FindPlane and R_CheckPlane, a plane of the key
+    # with columns x1..x2 still free or a new one
+    def doomhistory_findPlane(self, height, flat, lightLevel, x1, x2):
+        # all sky is one plane, its height and light are not used
+        if flat == Textures.SKYFLAT:
+            height = 0
+            lightLevel = 0
+        planes = self.doomhistory_visplanes.setdefault((height, flat, lightLevel), [])
+        for plane in planes:
+            if (plane.tops[x1:x2 + 1] == FpsRenderer.doomhistory_Visplane.UNUSED).all():
+                break
+        else:
+            plane = FpsRenderer.doomhistory_Visplane(height, flat, lightLevel, self.f_width)
+            planes.append(plane)
+        plane.i_minX = min(plane.i_minX, x1)
+        plane.i_maxX = max(plane.i_maxX, x2)
+        return plane
+
+    def doomhistory_markPlane(self, height, flat, lightLevel, x1, x2, tops, bottoms):
+        plane = self.doomhistory_findPlane(height, flat, lightLevel, x1, x2)
+        marked = tops <= bottoms
+        plane.tops[x1:x2 + 1] = np.where(marked, tops, FpsRenderer.doomhistory_Visplane.UNUSED)
+        plane.bottoms[x1:x2 + 1] = np.where(marked, bottoms, -1)
+
+    # rows still open above and below the wall in each
+    # column go to the front sector planes, read before
+    # the wall moves the clip heights, clip heights are
+    # truncated like the wall rows drawn up to them
+    def doomhistory_markPlanes(self, seg, x1, x2, RD, ceilingEnds, floorStarts, ceilingClip, floorClip):
+        sector = seg.frontSector
+        ceilingTops = ceilingClip.astype(np.int32) + 1
+        floorBottoms = floorClip.astype(np.int32) - 1
+        if RD.b_updateCeiling:
+            bottoms = np.minimum(ceilingEnds - 1, floorBottoms)
+            self.doomhistory_markPlane(sector.ceilingHeight, sector.ceilingTexture, sector.lightLevel,
+                x1, x2, ceilingTops, bottoms)
+        if RD.b_updateFloor:
+            tops = np.maximum(floorStarts + 1, ceilingTops)
+            self.doomhistory_markPlane(sector.floorHeight, sector.floorTexture, sector.lightLevel,
+                x1, x2, tops, floorBottoms)
+
+    # R_MakeSpans, each row of a plane becomes one span per
+    # run of columns open to it, found for the whole plane
+    # at once from where rows enter and leave it
+    def doomhistory_makeSpans(self, plane):
+        tops = plane.tops[plane.i_minX:plane.i_maxX + 1]
+        bottoms = plane.bottoms[plane.i_minX:plane.i_maxX + 1]
+        used = tops <= bottoms
+        if not used.any():
+            return None
+        y1 = int(tops[used].min())
+        y2 = int(bottoms[used].max())
+        rows = np.arange(y1, y2 + 1, dtype=np.int32)[:, None]
+        inside = ((rows >= tops) & (rows <= bottoms)).view(np.int8)
+        edges = np.diff(inside, axis=1, prepend=0, append=0)
+        # row major order so the nth start and end are one span
+        ys, x1s = np.nonzero(edges == 1)
+        x2s = np.nonzero(edges == -1)[1] - 1
+        return ys + y1, x1s + plane.i_minX, x2s + plane.i_minX
+
+    def doomhistory_drawPlanes(self):
+        if not self.doomhistory_isDrawingPlanes():
+            return
+        for planes in self.doomhistory_visplanes.values():
+            for plane in planes:
+                spans = self.doomhistory_makeSpans(plane)
+                if spans is None:
+                    continue
+                ys, x1s, x2s = spans
+                self.stats.i_visplanes += 1
+                self.stats.i_spans += len(ys)
+                self.stats.i_pixelsWritten += int((x2s - x1s + 1).sum())
+                if self.b_indexedFrame:
+                    self.doomhistory_drawIndexedPlane(plane, ys, x1s, x2s)
+                elif self.canvas is self.frameBuffer:
+                    self.frameBuffer.drawSpans(ys, x1s, x2s, self.getWallColor(plane.flat, plane.i_lightLevel))
+                else:
+                    rgba = self.getWallColor(plane.flat, plane.i_lightLevel)
+                    for y, x1, x2 in zip(ys.tolist(), x1s.tolist(), x2s.tolist()):
+                        self.canvas.drawLine([x1 + self.f_xOffset, y + self.f_yOffset],
+                            [x2 + self.f_xOffset, y + self.f_yOffset], rgba, 1)
+
+    # R_MapPlane for every span at once, a row of a plane is
+    # one distance away so its texels step evenly across the
+    # span and it has one light map, zlight by its depth
+    def doomhistory_drawIndexedPlane(self, plane, ys, x1s, x2s):
+        if plane.flat == Textures.SKYFLAT:
+            self.doomhistory_drawSky(plane)
+            return
+        # view space depth of each row, through the row centre
+        height = abs(plane.f_height - self.player.getEyeZ())
+        depths = height * self.f_distancePlayerToScreen / np.abs(self.f_halfHeight - (ys + 0.5))
+        lights = self.lightTables.getPlaneLights(plane.i_lightLevel, depths)
+        flat = self.textures.getFlat(plane.flat) if self.doomhistory_isTextured() else None
+        if flat is None:
+            self.frameBuffer.drawIndexedSpans(ys, x1s, x2s, self.getColorIndex(plane.flat), lights)
+            return
+        cos = math.cos(math.radians(self.player.angle.deg))
+        sin = math.sin(math.radians(self.player.angle.deg))
+        sides = depths * (self.f_halfWidth - x1s) / self.f_distancePlayerToScreen
+        # flats repeat every 64 units, v runs down the map
+        u0s = self.player.x + depths * cos - sides * sin
+        v0s = -(self.player.y + depths * sin + sides * cos)
+        uSteps = depths * sin / self.f_distancePlayerToScreen
+        vSteps = depths * cos / self.f_distancePlayerToScreen
+        self.frameBuffer.drawTexturedSpans(ys, x1s, x2s, flat, u0s, v0s, uSteps, vSteps, lights)
+
+    # sky planes are drawn as columns of the sky texture,
+    # 4 turns of its 256 columns go round the view and
+    # rows are not scaled with distance or shaded
+    def doomhistory_drawSky(self, plane):
+        skyName = Textures.getSkyName(self.map.name)
+        xs = np.arange(plane.i_minX, plane.i_maxX + 1)
+        used = plane.tops[xs] <= plane.bottoms[xs]
+        xs = xs[used]
+        lights = np.zeros(len(xs), dtype=np.uint8)
+        sky = self.textures.getTexture(skyName) if self.doomhistory_isTextured() else None
+        if sky is None:
+            self.frameBuffer.drawIndexedColumns(xs, plane.tops[xs], plane.bottoms[xs], self.getColorIndex(skyName), lights)
+            return
+        angles = self.player.angle.deg + np.degrees(np.arctan((self.f_halfWidth - xs) / self.f_distancePlayerToScreen))
+        us = angles * 1024 / 360
+        vSteps = np.full(len(xs), 320 / self.f_width)
+        v0s = 100 - self.f_halfHeight * vSteps
+        self.frameBuffer.drawTexturedColumns(xs, plane.tops[xs], plane.bottoms[xs], sky, us, v0s, vSteps, lights)
 
     def doomhistory_drawStoredSegs(self):
         for i,d in enumerate(self.doomhistory_frameSegsDrawData):
@@ -1580,35 +1688,248 @@ class FpsRenderer(object):
             frontSector = frontSidedef.sector
             if d.b_drawUpperSection:
                 rgba = self.getWallColor(frontSidedef.upperTexture, frontSector.lightLevel)
-                self.doomhistory_drawSection(d.upperSection, rgba)
+                self.doomhistory_drawSection(d.upperSection, rgba, d.seg, "upper")
             if d.b_drawMiddleSection:
                 rgba = self.getWallColor(frontSidedef.middleTexture, frontSector.lightLevel)
-                self.doomhistory_drawSection(d.middleSection, rgba)
+                self.doomhistory_drawSection(d.middleSection, rgba, d.seg, "middle")
             if d.b_drawLowerSection:
                 rgba = self.getWallColor(frontSidedef.lowerTexture, frontSector.lightLevel)
-                self.doomhistory_drawSection(d.lowerSection, rgba)
+                self.doomhistory_drawSection(d.lowerSection, rgba, d.seg, "lower")
 
-    def doomhistory_drawSection(self, sectionList, rgba):
-        for i,line in enumerate(sectionList):
-            drawStart = [line.x1 + self.f_xOffset, line.y1 + self.f_yOffset]
-            drawEnd = [line.x2 + self.f_xOffset, line.y2 + self.f_yOffset]
+    def doomhistory_drawSection(self, section, rgba, seg, part):
+        xs, tops, bottoms, us, iscales = section
+        # whole section in one masked write
+        if self.b_indexedFrame:
+            self.doomhistory_drawIndexedSection(section, seg, part)
+            return
+        if self.canvas is self.frameBuffer and not self.doomhistory_lineMode:
+            self.frameBuffer.drawColumns(xs, tops, bottoms, rgba)
+            return
+        for i, (x, top, bottom) in enumerate(zip(xs.tolist(), tops.tolist(), bottoms.tolist())):
+            drawStart = [x + self.f_xOffset, top + self.f_yOffset]
+            drawEnd = [x + self.f_xOffset, bottom + self.f_yOffset]
             if self.doomhistory_lineMode:
                 if i % 4 == 0:
-                    self.game.drawLine(drawStart, drawEnd, rgba, 2)
+                    self.canvas.drawLine(drawStart, drawEnd, rgba, 2)
+            else:
+                self.canvas.drawLine(drawStart, drawEnd, rgba, 1)
+
+    # part is upper, middle or lower, untextured frames and
+    # sidedefs with no texture there draw its flat color
+    def doomhistory_drawIndexedSection(self, section, seg, part):
+        xs, tops, bottoms, us, iscales = section
+        sidedef = seg.getSidedef()
+        textureName = getattr(sidedef, part + "Texture")
+        lights = self.lightTables.getWallLights(seg.frontSector.lightLevel, 1 / iscales, self.doomhistory_fakeContrast(seg))
+        texture = self.textures.getTexture(textureName) if us is not None else None
+        if texture is None:
+            self.frameBuffer.drawIndexedColumns(xs, tops, bottoms, self.getColorIndex(textureName), lights)
+            return
+        # row y reads texel textureMid + (y - halfHeight) / scale
+        textureMid = self.doomhistory_textureMid(seg, sidedef, part, texture.height)
+        v0s = textureMid - self.f_halfHeight * iscales
+        self.frameBuffer.drawTexturedColumns(xs, tops, bottoms, texture, us, v0s, iscales, lights)
+
+    # walls along the map axes are a light level darker
+    # (horizontal) or brighter (vertical) to show corners
+    def doomhistory_fakeContrast(self, seg):
+        if seg.startVertex.y == seg.endVertex.y:
+            return -1
+        if seg.startVertex.x == seg.endVertex.x:
+            return 1
+        return 0
+
+    # height of the texture row at the screen centre
+    # row, DOOM pegs textures to the top of a wall
+    # unless the linedef flags say otherwise
+    def doomhistory_textureMid(self, seg, sidedef, part, textureHeight):
+        eyeZ = self.player.getEyeZ()
+        flags = seg.linedef.flags
+        if part == "middle":
+            if flags & Linedef.ML_DONTPEGBOTTOM:
+                textureMid = seg.frontSector.floorHeight + textureHeight - eyeZ
+            else:
+                textureMid = seg.frontSector.ceilingHeight - eyeZ
+        elif part == "upper":
+            if flags & Linedef.ML_DONTPEGTOP:
+                textureMid = seg.frontSector.ceilingHeight - eyeZ
+            else:
+                textureMid = seg.backSector.ceilingHeight + textureHeight - eyeZ
+        else:
+            if flags & Linedef.ML_DONTPEGBOTTOM:
+                textureMid = seg.frontSector.ceilingHeight - eyeZ
             else:
-                self.game.drawLine(drawStart, drawEnd, rgba, 1)
+                textureMid = seg.backSector.floorHeight - eyeZ
+        return textureMid + sidedef.yOffset
+
+    # frames are indexed when there is a palette and
+    # the frame is drawn into the pixel buffer
+    def doomhistory_isIndexed(self):
+        return self.textures is not None and self.b_indexed \
+            and self.canvas is self.frameBuffer and not self.doomhistory_lineMode
+
+    # indexed frames sample textures and flats unless
+    # textures are off, then walls are flat colors
+    def doomhistory_isTextured(self):
+        return self.b_textured and self.doomhistory_isIndexed()
+
+    # texture column of each screen column, where the ray
+    # through the column meets the seg in view space, plus
+    # the seg and sidedef offsets
+    def doomhistory_textureColumns(self, seg, xs):
+        VP = self.vertexProjection
+        f1 = VP.depths[seg.startVertexID]
+        s1 = VP.sides[seg.startVertexID]
+        df = VP.depths[seg.endVertexID] - f1
+        ds = VP.sides[seg.endVertexID] - s1
+        # column x looks along (distanceToScreen, halfWidth - x)
+        rs = self.f_halfWidth - xs
+        t = (f1 * rs - s1 * self.f_distancePlayerToScreen) / (self.f_distancePlayerToScreen * ds - rs * df)
+        return t * math.hypot(df, ds) + seg.offset + seg.getSidedef().xOffset
+
+    # thing sprites need patches and are drawn as
+    # palette indices so only into indexed frames
+    def doomhistory_isDrawingSprites(self):
+        return self.sprites is not None and self.b_drawSprites and self.b_indexedFrame
+
+    # R_AddSprites for the things standing in one walked
+    # subsector, things elsewhere are never looked at
+    def doomhistory_addSprites(self, subsector):
+        things = self.map.getSubsectorThings().get(subsector.ID)
+        if not things:
+            return
+        self.profiler.start("sprites")
+        sector = self.map.sectors[subsector.sectorID]
+        for thing in things:
+            self.doomhistory_projectSprite(thing, sector)
+        self.profiler.stop()
+
+    def doomhistory_projectSprite(self, thing, sector):
+        MINZ = 4
+        entry = Sprites.getThingSprite(thing.type)
+        if entry is None:
+            return
+        spriteName, frameName, flags = entry
+
+        # into view space, depth forward and side left
+        cos = math.cos(math.radians(self.player.angle.deg))
+        sin = math.sin(math.radians(self.player.angle.deg))
+        dx = thing.x - self.player.x
+        dy = thing.y - self.player.y
+        depth = dx * cos + dy * sin
+        if depth < MINZ:
+            return
+
+        # rotation 1 when the thing faces us, 8 steps of 45
+        angle = math.degrees(math.atan2(dy, dx))
+        rotation = int(((angle - thing.angle + 202.5) % 360) // 45)
+        frame = self.sprites.getFrame(spriteName, frameName, rotation)
+        if frame is None:
+            return
+        picture, flipped = frame
+
+        scale = self.f_distancePlayerToScreen / depth
+        leftOffset = picture.width - picture.leftOffset if flipped else picture.leftOffset
+        xLeft = self.f_halfWidth - (dy * cos - dx * sin) * scale - leftOffset * scale
+        x1 = math.floor(xLeft)
+        x2 = math.floor(xLeft + picture.width * scale) - 1
+        if x1 > self.f_width - 1 or x2 < 0 or x1 > x2:
+            return
+
+        vissprite = FpsRenderer.doomhistory_Vissprite()
+        vissprite.picture = picture
+        vissprite.b_flipped = flipped
+        vissprite.f_scale = scale
+        vissprite.f_xLeft = xLeft
+        vissprite.i_x1 = x1
+        vissprite.i_x2 = x2
+        # hanging things are as tall as their picture
+        if flags & Sprites.SPAWNCEILING:
+            z = sector.ceilingHeight - picture.height
+        else:
+            z = sector.floorHeight
+        vissprite.f_textureMid = z + picture.topOffset - self.player.getEyeZ()
+        if not flags & Sprites.FULLBRIGHT:
+            vissprite.i_light = self.lightTables.getSpriteLight(sector.lightLevel, scale)
+        self.doomhistory_vissprites.append(vissprite)
+        self.stats.i_sprites += 1
+
+    # R_DrawMasked, far to near so nearer sprites
+    # paint over farther ones
+    def doomhistory_drawSprites(self):
+        if not self.doomhistory_vissprites:
+            return
+        self.doomhistory_vissprites.sort(key=lambda vissprite: vissprite.f_scale)
+        silhouettes = [d for d in self.doomhistory_frameSegsDrawData if d.scales is not None]
+        segX1s = np.array([d.i_x1 for d in silhouettes], dtype=np.int64)
+        segX2s = np.array([d.i_x2 for d in silhouettes], dtype=np.int64)
+        segMaxScales = np.array([d.scales.max() for d in silhouettes], dtype=np.float64)
+        for vissprite in self.doomhistory_vissprites:
+            self.doomhistory_drawSprite(vissprite, silhouettes, segX1s, segX2s, segMaxScales)
+
+    # R_DrawSprite, each column of the sprite is clipped to
+    # the rows the segs in front of it left open, segs are
+    # stored front to back and clip heights only close so
+    # the farthest seg in front holds the clip of all the
+    # nearer ones, only segs over the sprite are looked at
+    def doomhistory_drawSprite(self, vissprite, silhouettes, segX1s, segX2s, segMaxScales):
+        x1 = max(vissprite.i_x1, 0)
+        x2 = min(vissprite.i_x2, self.f_width - 1)
+        clipTops = np.full(x2 - x1 + 1, -1, dtype=np.float64)
+        clipBottoms = np.full(x2 - x1 + 1, self.f_height, dtype=np.float64)
+        unset = np.ones(x2 - x1 + 1, dtype=bool)
+        overlapping = np.nonzero((segX1s <= x2) & (segX2s >= x1) & (segMaxScales >= vissprite.f_scale))[0]
+        for i in overlapping[::-1].tolist():
+            d = silhouettes[i]
+            start = max(d.i_x1, x1)
+            end = min(d.i_x2, x2)
+            segColumns = slice(start - d.i_x1, end - d.i_x1 + 1)
+            columns = slice(start - x1, end - x1 + 1)
+            inFront = unset[columns] & (d.scales[segColumns] >= vissprite.f_scale)
+            clipTops[columns] = np.where(inFront, d.spriteTopClips[segColumns], clipTops[columns])
+            clipBottoms[columns] = np.where(inFront, d.spriteBottomClips[segColumns], clipBottoms[columns])
+            unset[columns] &= ~inFront
+            if not unset.any():
+                break
+
+        picture = vissprite.picture
+        scale = vissprite.f_scale
+        xs = np.arange(x1, x2 + 1)
+        us = np.minimum(((xs - vissprite.i_x1) / scale).astype(np.int64), picture.width - 1)
+        if vissprite.b_flipped:
+            us = picture.width - 1 - us
+        # picture rows from the first pixel centre below its
+        # top to the last above its bottom, within the clips
+        spriteTop = self.f_halfHeight - vissprite.f_textureMid * scale
+        tops = np.maximum(math.ceil(spriteTop), np.trunc(clipTops) + 1)
+        bottoms = np.minimum(math.ceil(spriteTop + picture.height * scale) - 1, np.trunc(clipBottoms) - 1)
+        drawn = tops <= bottoms
+        if not drawn.any():
+            return
+        v0 = vissprite.f_textureMid - self.f_halfHeight / scale
+        self.stats.i_pixelsWritten += self.frameBuffer.drawMaskedColumns(xs[drawn], tops[drawn], bottoms[drawn],
+            picture, us[drawn], v0, 1 / scale, vissprite.i_light)
 
     def doomhistory_renderSubsector(self, subsector):
+        if self.doomhistory_isDrawingSprites():
+            self.doomhistory_addSprites(subsector)
         # iterate segs in subsector
         for i in range(subsector.segCount):
             segId = subsector.firstSegID + i
             seg = self.map.segs[segId]
+            self.stats.startSeg(seg)
             linedef = seg.linedef
 
             v1 = seg.startVertex
             v2 = seg.endVertex
-            # four angles
-            angles = self.doomhistory_clipVerticesToFov(v1, v2)
+            # two angles and two screen xs
+            self.profiler.start("fovclip")
+            if self.b_viewSpaceClip:
+                angles = self.doomhistory_clipSegToView(seg)
+            else:
+                angles = self.doomhistory_clipVerticesToFov(v1, v2)
+            self.profiler.stop()
+            self.countTested(angles)
 
             if angles is not None:
                 if self.onSegInspect is not None:
@@ -1616,19 +1937,19 @@ class FpsRenderer(object):
 
                 v1Angle = angles[0]
                 v2Angle = angles[1]
-                v1AngleFromPlayer = angles[2]
-                v2AngleFromPlayer = angles[3]
+                v1xScreen = angles[2]
+                v2xScreen = angles[3]
 
-                self.doomhistory_addWallInFov(seg, v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer)
+                self.doomhistory_addWallInFov(seg, v1Angle, v2Angle, v1xScreen, v2xScreen)
 
-    def doomhistory_addWallInFov(self, seg, v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer):
+                # tell the BSP walk to stop once the screen is full
+                if self.isScreenFull():
+                    return True
+
+    def doomhistory_addWallInFov(self, seg, v1Angle, v2Angle, v1xScreen, v2xScreen):
         v1 = seg.startVertex
         v2 = seg.endVertex
 
-        # get screen projection Xs
-        v1xScreen = self.doomhistory_angleToScreen(v1AngleFromPlayer)
-        v2xScreen = self.doomhistory_angleToScreen(v2AngleFromPlayer)
-
         # skip same pixel wall
         if v1xScreen == v2xScreen:
             return
@@ -1668,19 +1989,22 @@ class FpsRenderer(object):
         frontSector = frontSidedef.sector
         RD.rgba = self.getWallColor(frontSidedef.middleTexture, frontSector.lightLevel)
 
-        # calculate distance to first edge of the wall
-        angle90 = Angle(90)
-        segToNormalAngle = Angle(seg.getAngle() + angle90.deg)
-        normalToV1Angle = segToNormalAngle.subA(v1Angle)
+        RD.f_distanceToV1 = self.vertexProjection.getDistance(v1)
+        if self.b_viewSpaceClip:
+            self.doomhistory_viewSpaceScaleFactors(seg, v1xScreen, v2xScreen, RD)
+        else:
+            # calculate distance to first edge of the wall
+            angle90 = Angle(90)
+            segToNormalAngle = Angle(seg.getAngle() + angle90.deg)
+            normalToV1Angle = segToNormalAngle.subA(v1Angle)
 
-        # normal angle is 90deg to wall
-        segToPlayerAngle = angle90.subA(normalToV1Angle)
+            # normal angle is 90deg to wall
+            segToPlayerAngle = angle90.subA(normalToV1Angle)
 
-        RD.f_distanceToV1 = self.player.distanceToVertex(v1)
-        RD.f_distanceToNormal = segToPlayerAngle.getSin() * RD.f_distanceToV1
+            RD.f_distanceToNormal = segToPlayerAngle.getSin() * RD.f_distanceToV1
 
-        RD.f_v1ScaleFactor = self.doomhistory_getScaleFactor(v1xScreen, segToNormalAngle, RD.f_distanceToNormal)
-        RD.f_v2ScaleFactor = self.doomhistory_getScaleFactor(v2xScreen, segToNormalAngle, RD.f_distanceToNormal)
+            RD.f_v1ScaleFactor = self.doomhistory_getScaleFactor(v1xScreen, segToNormalAngle, RD.f_distanceToNormal)
+            RD.f_v2ScaleFactor = self.doomhistory_getScaleFactor(v2xScreen, segToNormalAngle, RD.f_distanceToNormal)
 
         # screen xs can be the same so avoid div/0
         # if they are the same that means they occupy
@@ -1696,6 +2020,12 @@ class FpsRenderer(object):
         RD.f_frontSectorCeiling = seg.frontSector.ceilingHeight - self.player.getEyeZ()
         RD.f_frontSectorFloor = seg.frontSector.floorHeight - self.player.getEyeZ()
 
+        # sky hack, between two skies there is no upper
+        # wall and the sky runs on over the lower ceiling
+        if seg.backSector and seg.frontSector.ceilingTexture == Textures.SKYFLAT \
+            and seg.backSector.ceilingTexture == Textures.SKYFLAT:
+            RD.f_frontSectorCeiling = seg.backSector.ceilingHeight - self.player.getEyeZ()
+
         # get heights relative to eye position of player (camera)
         RD.f_ceilingStep = -(RD.f_frontSectorCeiling * RD.f_steps)
         RD.f_ceilingEnd = int(self.f_halfHeight - (RD.f_frontSectorCeiling * RD.f_v1ScaleFactor))
@@ -1708,8 +2038,6 @@ class FpsRenderer(object):
             RD.f_backSectorCeiling = seg.backSector.ceilingHeight - self.player.getEyeZ()
             RD.f_backSectorFloor = seg.backSector.floorHeight - self.player.getEyeZ()
 
-            self.doomhistory_ceilingFloorUpdate(seg, RD)
-
             if RD.f_backSectorCeiling < RD.f_frontSectorCeiling:
                 RD.b_drawUpperSection = True
                 RD.f_upperHeightStep = -(RD.f_backSectorCeiling * RD.f_steps)
@@ -1720,6 +2048,9 @@ class FpsRenderer(object):
                 RD.f_lowerHeightStep = -(RD.f_backSectorFloor * RD.f_steps)
                 RD.i_lowerHeight = int(self.f_halfHeight - (RD.f_backSectorFloor * RD.f_v1ScaleFactor))
 
+        # solid walls close both planes
+        self.doomhistory_ceilingFloorUpdate(seg, RD)
+
         self.doomhistory_renderSegment(seg, v1xScreen, v2xScreen, RD)
 
     # Method in DOOM engine that calculated a wall height
@@ -1730,30 +2061,52 @@ class FpsRenderer(object):
         MAX_SCALEFACTOR = 64.0
         MIN_SCALEFACTOR = 0.00390625
 
-        angle90 = Angle(90)
-        screenXAngle = self.doomhistory_screenXToAngleLookup[vxScreen] # Angle object
-        skewAngle = screenXAngle.addA(self.player.angle).subA(segToNormalAngle)
+        # BAM ints and fine cosine lookups, the 16.16
+        # fixed point units cancel out in the ratio
+        screenXAngle = self.doomhistory_screenXToBamLookup[vxScreen]
+        skewAngle = Bam.sub(Bam.add(screenXAngle, Bam.fromDeg(self.player.angle.deg)), Bam.fromDeg(segToNormalAngle.deg))
 
         # get scale factor
-        screenXAngleCos = screenXAngle.getCos()
-        skewAngleCos = skewAngle.getCos()
+        screenXAngleCos = Bam.cos(screenXAngle)
+        skewAngleCos = Bam.cos(skewAngle)
         scaleFactor = (self.f_distancePlayerToScreen * skewAngleCos) / (distanceToNormal * screenXAngleCos)
 
         # clamp
         scaleFactor = min(MAX_SCALEFACTOR, max(MIN_SCALEFACTOR, scaleFactor))
         return scaleFactor
 
+    # Scale factor is 1 / depth which is linear across
+    # the screen, so with the wall line in view space the
+    # scale of any column is one multiply add
+    def doomhistory_viewSpaceScaleFactors(self, seg, v1xScreen, v2xScreen, RD):
+        MAX_SCALEFACTOR = 64.0
+        MIN_SCALEFACTOR = 0.00390625
+
+        VP = self.vertexProjection
+        f1 = VP.depths[seg.startVertexID]
+        s1 = VP.sides[seg.startVertexID]
+        df = VP.depths[seg.endVertexID] - f1
+        ds = VP.sides[seg.endVertexID] - s1
+        # twice the area of player, v1 and v2, > 0 when the seg faces us
+        cross = (f1 + df) * s1 - (s1 + ds) * f1
+        RD.f_distanceToNormal = cross / math.hypot(df, ds)
+
+        # column x looks along (1, (halfWidth - x) / distanceToScreen)
+        v1ScaleFactor = (df * (self.f_halfWidth - v1xScreen) - ds * self.f_distancePlayerToScreen) / cross
+        v2ScaleFactor = (df * (self.f_halfWidth - v2xScreen) - ds * self.f_distancePlayerToScreen) / cross
+        RD.f_v1ScaleFactor = min(MAX_SCALEFACTOR, max(MIN_SCALEFACTOR, v1ScaleFactor))
+        RD.f_v2ScaleFactor = min(MAX_SCALEFACTOR, max(MIN_SCALEFACTOR, v2ScaleFactor))
+
     def doomhistory_angleToScreen(self, angle):
         ix = 0
+        bam = Bam.fromDeg(angle.deg)
         # TODO should these be 90 or fov?
-        if angle.gtF(90):
+        if bam > ANG90:
             # left side
-            a_newAngle = Angle(angle.deg - 90)
-            ix = self.f_distancePlayerToScreen - round(a_newAngle.getTan() * self.f_halfWidth)
+            ix = self.f_distancePlayerToScreen - round(Bam.tan(bam - ANG90) * self.f_halfWidth / FRACUNIT)
         else:
             # right side
-            a_newAngle = Angle(90 - angle.deg)
-            ix = round(a_newAngle.getTan() * self.f_halfWidth) + self.f_distancePlayerToScreen
+            ix = round(Bam.tan(ANG90 - bam) * self.f_halfWidth / FRACUNIT) + self.f_distancePlayerToScreen
         return int(ix)
 
     def doomhistory_ceilingFloorUpdate(self, seg, RD):
@@ -1761,24 +2114,34 @@ class FpsRenderer(object):
         if seg.backSector is None:
             RD.b_updateCeiling = True
             RD.b_updateFloor = True
-            return
-
-        RD.b_updateCeiling = RD.f_backSectorCeiling != RD.f_frontSectorCeiling
-        RD.b_updateFloor = RD.f_backSectorFloor != RD.f_frontSectorFloor
-
-        if seg.backSector.ceilingHeight <= seg.frontSector.floorHeight or seg.backSector.floorHeight >= seg.frontSector.ceilingHeight:
-            # closed door
-            RD.b_updateCeiling = True
-            RD.b_updateFloor = True
-
-        if seg.frontSector.ceilingHeight <= self.player.getEyeZ():
-            # below view plane
+        else:
+            RD.b_updateCeiling = RD.f_backSectorCeiling != RD.f_frontSectorCeiling
+            RD.b_updateFloor = RD.f_backSectorFloor != RD.f_frontSectorFloor
+
+            # a new flat or light level starts a new plane
+            if seg.backSector.ceilingTexture != seg.frontSector.ceilingTexture \
+                or seg.backSector.lightLevel != seg.frontSector.lightLevel:
+                RD.b_updateCeiling = True
+            if seg.backSector.floorTexture != seg.frontSector.floorTexture \
+                or seg.backSector.lightLevel != seg.frontSector.lightLevel:
+                RD.b_updateFloor = True
+
+            if seg.backSector.ceilingHeight <= seg.frontSector.floorHeight or seg.backSector.floorHeight >= seg.frontSector.ceilingHeight:
+                # closed door
+                RD.b_updateCeiling = True
+                RD.b_updateFloor = True
+
+        if seg.frontSector.ceilingHeight <= self.player.getEyeZ() and seg.frontSector.ceilingTexture != Textures.SKYFLAT:
+            # below view plane, the sky is seen from anywhere
             RD.b_updateCeiling = False
 
         if seg.frontSector.floorHeight >= self.player.getEyeZ():
             # above view plane
             RD.b_updateFloor = False
 
+    # the whole v1xScreen..v2xScreen range at once, each
+    # column only reads and writes its own clip heights
+    # so the per column loop becomes array operations
     def doomhistory_renderSegment(self, seg, v1xScreen, v2xScreen, RD):
         # store our data we are going to draw instead of drawing it now
         segDrawData = FpsRenderer.doomhistory_FrameSegDrawData()
@@ -1787,99 +2150,118 @@ class FpsRenderer(object):
         segDrawData.b_drawMiddleSection = seg.backSector is None
         segDrawData.b_drawLowerSection = RD.b_drawLowerSection
 
-        iXCurrent = v1xScreen
-        while iXCurrent <= v2xScreen:
-            i_currentCeilingEnd = int(RD.f_ceilingEnd)
-            i_currentFloorStart = int(RD.f_floorStart)
-
-            # DIY code used a validate range method to clip and modify and continue
-            # I cant pass ints by reference in Python so I am performing the function inline
-            # if doomhistory_validateRange(RD, iXCurrent, i_currentCeilingEnd, i_currentFloorStart) is False:
-            #     continue
-            # validateRange start
-            if i_currentCeilingEnd < self.doomhistory_ceilingClipHeight[iXCurrent] + 1:
-                i_currentCeilingEnd = self.doomhistory_ceilingClipHeight[iXCurrent] + 1
-            if i_currentFloorStart >= self.doomhistory_floorClipHeight[iXCurrent]:
-                i_currentFloorStart = self.doomhistory_floorClipHeight[iXCurrent] - 1
-
-            if i_currentCeilingEnd > i_currentFloorStart:
-                RD.f_ceilingEnd += RD.f_ceilingStep
-                RD.f_floorStart += RD.f_floorStep
-                iXCurrent += 1
-                continue
-            # validateRange end
-
-            # is it a portal?
-            if seg.backSector:
-                self.doomhistory_drawUpperSection(RD, iXCurrent, i_currentCeilingEnd, segDrawData)
-                self.doomhistory_drawLowerSection(RD, iXCurrent, i_currentFloorStart, segDrawData)
-            else:
-                # it is solid
-                self.doomhistory_drawMiddleSection(RD, iXCurrent, i_currentCeilingEnd, i_currentFloorStart, segDrawData)
-
-            RD.f_ceilingEnd += RD.f_ceilingStep
-            RD.f_floorStart += RD.f_floorStep
-
-            iXCurrent += 1
-
-        # Save our draw data for this seg to the list
-        if segDrawData.b_drawUpperSection or segDrawData.b_drawMiddleSection or segDrawData.b_drawLowerSection:
+        xs = np.arange(v1xScreen, v2xScreen + 1)
+        ceilingClip = self.doomhistory_ceilingClipHeight[v1xScreen:v2xScreen + 1]
+        floorClip = self.doomhistory_floorClipHeight[v1xScreen:v2xScreen + 1]
+
+        ceilingEnds = self.doomhistory_stepColumns(RD.f_ceilingEnd, RD.f_ceilingStep, len(xs)).astype(np.int64)
+        floorStarts = self.doomhistory_stepColumns(RD.f_floorStart, RD.f_floorStep, len(xs)).astype(np.int64)
+
+        # validateRange, clip to what is still open
+        ceilingEnds = np.maximum(ceilingEnds, ceilingClip + 1)
+        floorStarts = np.where(floorStarts >= floorClip, floorClip - 1, floorStarts)
+        if self.doomhistory_isDrawingPlanes():
+            self.doomhistory_markPlanes(seg, v1xScreen, v2xScreen, RD, ceilingEnds, floorStarts, ceilingClip, floorClip)
+        visible = ceilingEnds <= floorStarts
+        xs = xs[visible]
+        ceilingEnds = ceilingEnds[visible]
+        floorStarts = floorStarts[visible]
+
+        if self.doomhistory_isIndexed():
+            # scales pick the light maps, and the texture rows
+            scales = self.doomhistory_stepColumns(RD.f_v1ScaleFactor, RD.f_steps, len(visible))
+            RD.iscales = 1 / scales[visible]
+            if self.doomhistory_isTextured():
+                RD.us = self.doomhistory_textureColumns(seg, xs)
+
+        # is it a portal?
+        if seg.backSector:
+            self.doomhistory_drawUpperSection(RD, xs, visible, ceilingEnds, ceilingClip, floorClip, segDrawData)
+            self.doomhistory_drawLowerSection(RD, xs, visible, floorStarts, ceilingClip, floorClip, segDrawData)
+        else:
+            # it is solid
+            segDrawData.middleSection = (xs, ceilingEnds, floorStarts, RD.us, RD.iscales)
+            self.stats.i_middleColumns += len(xs)
+            self.doomhistory_countSection(segDrawData.middleSection)
+            ceilingClip[visible] = self.f_height # full clip
+            floorClip[visible] = -1 # full clip
+
+        if self.doomhistory_isDrawingSprites():
+            segDrawData.i_x1 = v1xScreen
+            segDrawData.i_x2 = v2xScreen
+            segDrawData.scales = scales
+            segDrawData.spriteTopClips = ceilingClip.copy()
+            segDrawData.spriteBottomClips = floorClip.copy()
+
+        # Save our draw data for this seg to the list, portals
+        # with nothing to draw still clip the sprites behind
+        if segDrawData.b_drawUpperSection or segDrawData.b_drawMiddleSection or segDrawData.b_drawLowerSection \
+            or segDrawData.scales is not None:
             self.doomhistory_frameSegsDrawData.append(segDrawData)
 
-    def doomhistory_drawUpperSection(self, RD, iXCurrent, i_currentCeilingEnd, segDrawData):
-        if RD.b_drawUpperSection:
-            i_upperHeight = RD.i_upperHeight
-            RD.i_upperHeight += RD.f_upperHeightStep
+    # start, start + step, ... added up one at a time
+    # like the stepping loop so rounding is the same
+    def doomhistory_stepColumns(self, start, step, count):
+        values = np.full(count, step, dtype=np.float64)
+        if count > 0:
+            values[0] = start
+        return np.cumsum(values)
+
+    # pixels in the rows top..bottom of each column
+    # like FrameBuffer.drawColumns fills them
+    def doomhistory_countSection(self, section):
+        xs, tops, bottoms = section[:3]
+        if len(xs) == 0:
+            return
+        self.stats.i_pixelsWritten += int((np.abs(np.trunc(bottoms) - np.trunc(tops)) + 1).sum())
+        self.stats.writeColumnList(xs)
 
-            if i_upperHeight >= self.doomhistory_floorClipHeight[iXCurrent]:
-                i_upperHeight = self.doomhistory_floorClipHeight[iXCurrent] - 1
+    # the drawn columns of a section with their texture
+    # columns and scales when indexed or textured
+    def doomhistory_sectionColumns(self, RD, drawn, xs, tops, bottoms):
+        us = RD.us[drawn] if RD.us is not None else None
+        iscales = RD.iscales[drawn] if RD.iscales is not None else None
+        return (xs[drawn], tops[drawn], bottoms[drawn], us, iscales)
 
-            if i_upperHeight >= i_currentCeilingEnd:
-                # SAVE LINE FOR DRAW
-                self.doomhistory_addLineToSection(segDrawData.upperSection, iXCurrent, i_currentCeilingEnd, i_upperHeight)
-                self.doomhistory_ceilingClipHeight[iXCurrent] = i_upperHeight
-            else:
-                self.doomhistory_ceilingClipHeight[iXCurrent] = i_currentCeilingEnd - 1
+    def doomhistory_drawUpperSection(self, RD, xs, visible, ceilingEnds, ceilingClip, floorClip, segDrawData):
+        if RD.b_drawUpperSection:
+            # only steps on drawn columns
+            upperHeights = self.doomhistory_stepColumns(RD.i_upperHeight, RD.f_upperHeightStep, len(xs))
+            columnFloorClip = floorClip[visible]
+            upperHeights = np.where(upperHeights >= columnFloorClip, columnFloorClip - 1, upperHeights)
+
+            drawn = upperHeights >= ceilingEnds
+            # SAVE LINES FOR DRAW
+            segDrawData.upperSection = self.doomhistory_sectionColumns(RD, drawn, xs, ceilingEnds, upperHeights)
+            self.stats.i_upperColumns += len(segDrawData.upperSection[0])
+            self.doomhistory_countSection(segDrawData.upperSection)
+            ceilingClip[visible] = np.where(drawn, upperHeights, ceilingEnds - 1)
         else:
-            self.doomhistory_ceilingClipHeight[iXCurrent] = i_currentCeilingEnd - 1
+            ceilingClip[visible] = ceilingEnds - 1
 
-    def doomhistory_drawLowerSection(self, RD, iXCurrent, i_currentFloorStart, segDrawData):
+    def doomhistory_drawLowerSection(self, RD, xs, visible, floorStarts, ceilingClip, floorClip, segDrawData):
         if RD.b_drawLowerSection:
-            i_lowerHeight = RD.i_lowerHeight
-            RD.i_lowerHeight += RD.f_lowerHeightStep
-
-            if i_lowerHeight <= self.doomhistory_ceilingClipHeight[iXCurrent]:
-                i_lowerHeight = self.doomhistory_ceilingClipHeight[iXCurrent] + 1
-
-            if i_lowerHeight <= i_currentFloorStart:
-                # SAVE LINE FOR DRAW
-                self.doomhistory_addLineToSection(segDrawData.lowerSection, iXCurrent, i_lowerHeight, i_currentFloorStart)
-                self.doomhistory_floorClipHeight[iXCurrent] = i_lowerHeight
-            else:
-                self.doomhistory_floorClipHeight[iXCurrent] = i_currentFloorStart + 1
+            # only steps on drawn columns
+            lowerHeights = self.doomhistory_stepColumns(RD.i_lowerHeight, RD.f_lowerHeightStep, len(xs))
+            columnCeilingClip = ceilingClip[visible]
+            lowerHeights = np.where(lowerHeights <= columnCeilingClip, columnCeilingClip + 1, lowerHeights)
+
+            drawn = lowerHeights <= floorStarts
+            # SAVE LINES FOR DRAW
+            segDrawData.lowerSection = self.doomhistory_sectionColumns(RD, drawn, xs, lowerHeights, floorStarts)
+            self.stats.i_lowerColumns += len(segDrawData.lowerSection[0])
+            self.doomhistory_countSection(segDrawData.lowerSection)
+            floorClip[visible] = np.where(drawn, lowerHeights, floorStarts + 1)
         else:
-            self.doomhistory_floorClipHeight[iXCurrent] = i_currentFloorStart + 1
-
-    def doomhistory_drawMiddleSection(self, RD, iXCurrent, i_currentCeilingEnd, i_currentFloorStart, segDrawData):
-        # SAVE LINE FOR DRAW
-        self.doomhistory_addLineToSection(segDrawData.middleSection, iXCurrent, i_currentCeilingEnd, i_currentFloorStart)
-        self.doomhistory_ceilingClipHeight[iXCurrent] = self.f_height # full clip
-        self.doomhistory_floorClipHeight[iXCurrent] = -1 # full clip
-
-    def doomhistory_addLineToSection(self, sectionList, iXCurrent, i_currentCeilingEnd, i_currentFloorStart):
-        line = FpsRenderer.doomhistory_SingleDrawLine()
-        line.x1 = iXCurrent
-        line.y1 = i_currentCeilingEnd
-        line.x2 = iXCurrent
-        line.y2 = i_currentFloorStart
-        sectionList.append(line)
+            floorClip[visible] = floorStarts + 1
 
-    # needs to return 4 angles
+    # needs to return 2 angles and 2 screen xs, the
+    # projected vertex x is used unless it was clipped
     def doomhistory_clipVerticesToFov(self, v1, v2):
         a_fov = Angle(self.f_fov)
 
-        v1Angle = self.player.angleToVertex(v1)
-        v2Angle = self.player.angleToVertex(v2)
+        v1Angle = self.vertexProjection.getAngle(v1)
+        v2Angle = self.vertexProjection.getAngle(v2)
 
         a_spanAngle = v1Angle.subA(v2Angle)
         if a_spanAngle.gteF(self.f_fov * 2):
@@ -1905,6 +2287,10 @@ class FpsRenderer(object):
         # if V1 is > 90 its outside
         # if V2 is < 0 its outside
 
+        # fov edge angles of clipped vertices
+        v1ClipAngle = None
+        v2ClipAngle = None
+
         # v1 test:
         a_halfFov = a_fov.divF(2)
         a_v1Moved = v1AngleFromPlayer.addA(a_halfFov)
@@ -1918,156 +2304,85 @@ class FpsRenderer(object):
                 return None
 
             # v2 is valid, clip v1
-            v1AngleFromPlayer = a_halfFov.new()
+            v1ClipAngle = a_halfFov.new()
 
         # v2 test: (we cant have angle < 0 so subtract angle from halffov)
         a_v2Moved = a_halfFov.subA(v2AngleFromPlayer)
         if a_v2Moved.gtA(a_fov):
-            v2AngleFromPlayer = a_halfFov.neg()
+            v2ClipAngle = a_halfFov.neg()
 
-        # rerotate angles
-        v1AngleFromPlayer.iaddA(a_fov)
-        v2AngleFromPlayer.iaddA(a_fov)
-
-        return v1Angle, v2Angle, v1AngleFromPlayer, v2AngleFromPlayer
+        # rerotate clipped angles to project them
+        if v1ClipAngle is None:
+            v1xScreen = self.vertexProjection.getScreenX(v1)
+        else:
+            v1xScreen = self.doomhistory_angleToScreen(v1ClipAngle.iaddA(a_fov))
+        if v2ClipAngle is None:
+            v2xScreen = self.vertexProjection.getScreenX(v2)
+        else:
+            v2xScreen = self.doomhistory_angleToScreen(v2ClipAngle.iaddA(a_fov))
+
+        return v1Angle, v2Angle, v1xScreen, v2xScreen
+
+    # View space version of clipVerticesToFov
+    # The seg is rotated into view space (x forward, y left)
+    # and clipped against the near plane and the two fov
+    # planes, no angles so no wrap around cases, then each
+    # end is projected with one divide
+    # Returns no angles, only the screen xs are used
+    def doomhistory_clipSegToView(self, seg):
+        NEARCLIP = 0.001
+
+        VP = self.vertexProjection
+        f1 = VP.depths[seg.startVertexID]
+        s1 = VP.sides[seg.startVertexID]
+        f2 = VP.depths[seg.endVertexID]
+        s2 = VP.sides[seg.endVertexID]
+
+        # segs must be facing us, v1 on the left
+        if f2 * s1 - s2 * f1 <= 0:
+            return None
 
-    # python DIY linked lists are a nightmare
-    # because of the pass-object-by-reference
-    # nature of variables
-    # when I change next and prev values on a
-    # node it changes it for that copy of the
-    # variable, and not for the underlying reference
-    # TODO take a seg and implement StoreWallRange
-    # so that we can update the segs display range
+        # planes as (forward, left, offset), inside is >= 0
+        t = self.f_tanHalfFov
+        for a, b, c in ((1, 0, -NEARCLIP), (t, -1, 0), (t, 1, 0)):
+            d1 = a * f1 + b * s1 + c
+            d2 = a * f2 + b * s2 + c
+            if d1 < 0:
+                if d2 < 0:
+                    return None
+                k = d1 / (d1 - d2)
+                f1 += (f2 - f1) * k
+                s1 += (s2 - s1) * k
+            elif d2 < 0:
+                k = d2 / (d2 - d1)
+                f2 += (f1 - f2) * k
+                s2 += (s1 - s2) * k
+
+        v1xScreen = int(self.f_distancePlayerToScreen - round(s1 / f1 * self.f_halfWidth))
+        v2xScreen = int(self.f_distancePlayerToScreen - round(s2 / f2 * self.f_halfWidth))
+        return None, None, v1xScreen, v2xScreen
+
+    # StoreWallRange for each part of the wall the
+    # solid seg list still has uncovered, then covers it
     def doomhistory_clipSolidWall(self, seg, segList, v1xScreen, v2xScreen, v1Angle, v2Angle, rangeRenderer):
-        if len(segList) < 2:
-            return
-
-        segId = seg.ID
-        segRange = None
-        segIndex = None
-        # skip all segments that end before this wall starts
-        i=0
-        while (i < len(segList) and segList[i].xEnd < v1xScreen - 1):
-            i += 1
-        segIndex = i
-        segRange = segList[segIndex]
-
-        # should always have a node since we cap our ends with
-        # "infinity"
-        # START to OVERLAP
-        if v1xScreen < segRange.xStart:
-            # found a position in the node list
-            # are they overlapping?
-            if v2xScreen < segRange.xStart - 1:
-                # all of the wall is visible to insert it
-                # STOREWALL
-                # StoreWallRange(seg, CurrentWall.XStart, CurrentWall.XEnd);
-                rangeRenderer(seg, v1xScreen, v2xScreen, v1Angle, v2Angle)
-                segList.insert(segIndex, SolidSegmentRange(v1xScreen, v2xScreen))
-                # go to next wall
-                return
-            # if not overlapping, end is already included
-            # so just update the start
-            # STOREWALL
-            # StoreWallRange(seg, CurrentWall.XStart, FoundClipWall->XStart - 1);
-            rangeRenderer(seg, v1xScreen,  segRange.xStart - 1, v1Angle, v2Angle)
-            segRange.xStart = v1xScreen
-
-        # FULL OVERLAPPED
-        # this part is already occupied
-        if v2xScreen <= segRange.xEnd:
-            return # go to next wall
-
-        # CHOP AND MERGE
-        # start by looking at the next entry in the list
-        # is the next entry within the current wall range?
-        nextSegIndex = segIndex
-        nextSegRange = segRange
-        while v2xScreen >= segList[nextSegIndex + 1].xStart - 1:
-            # STOREWALL
-            # StoreWallRange(seg, NextWall->XEnd + 1, next(NextWall, 1)->XStart - 1);
-            rangeRenderer(seg, nextSegRange.xEnd + 1,  segList[nextSegIndex + 1].xStart - 1, v1Angle, v2Angle)
-
-            nextSegIndex += 1
-            nextSegRange = segList[nextSegIndex]
-            # partially clipped by other walls, store each fragment
-            if v2xScreen <= nextSegRange.xEnd:
-                segRange.xEnd = nextSegRange.xEnd
-                if nextSegIndex != segIndex:
-                    segIndex += 1
-                    nextSegIndex += 1
-                    del segList[segIndex:nextSegIndex]
-                return
-
-        # wall precedes all known segments
-        # STOREWALL
-        # StoreWallRange(seg, NextWall->XEnd + 1, CurrentWall.XEnd);
-        rangeRenderer(seg, nextSegRange.xEnd + 1,  v2xScreen, v1Angle, v2Angle)
-        segRange.xEnd = v2xScreen
-
-        if (nextSegIndex != segIndex):
-            segIndex += 1
-            nextSegIndex += 1
-            del segList[segIndex:nextSegIndex]
-        return
+        self.profiler.start("cliplist")
+        visible = segList.clipSolidWall(v1xScreen, v2xScreen)
+        self.profiler.stop()
+        self.countVisible(visible)
+        self.profiler.start("height")
+        for i in range(0, len(visible), 2):
+            rangeRenderer(seg, visible[i], visible[i + 1], v1Angle, v2Angle)
+        self.profiler.stop()
 
     # Very similar to clipSolidWall but does not
     # modify the segList
     def doomhistory_clipPortalWall(self, seg, segList, v1xScreen, v2xScreen, v1Angle, v2Angle, rangeRenderer):
-        # find clip window
-        segId = seg.ID
-        segRange = None
-        segIndex = None
-        # skip all segments that end before this wall starts
-        i=0
-        while (i < len(segList) and segList[i].xEnd < v1xScreen - 1):
-            i += 1
-        segIndex = i
-        segRange = segList[segIndex]
-
-        # should always have a node since we cap our ends with
-        # "infinity"
-        # START to OVERLAP
-        if v1xScreen < segRange.xStart:
-            # found a position in the node list
-            # are they overlapping?
-            if v2xScreen < segRange.xStart - 1:
-                # all of the wall is visible to insert it
-                # STOREWALL
-                # StoreWallRange(seg, CurrentWall.XStart, CurrentWall.XEnd);
-                rangeRenderer(seg, v1xScreen, v2xScreen, v1Angle, v2Angle)
-                # go to next wall
-                return
-            # if not overlapping, end is already included
-            # so just update the start
-            # STOREWALL
-            # StoreWallRange(seg, CurrentWall.XStart, FoundClipWall->XStart - 1);
-            rangeRenderer(seg, v1xScreen,  segRange.xStart - 1, v1Angle, v2Angle)
-
-        # FULL OVERLAPPED
-        # this part is already occupied
-        if v2xScreen <= segRange.xEnd:
-            return # go to next wall
-
-        # CHOP AND MERGE
-        # start by looking at the next entry in the list
-        # is the next entry within the current wall range?
-        nextSegIndex = segIndex
-        nextSegRange = segRange
-        while v2xScreen >= segList[nextSegIndex + 1].xStart - 1:
-            # STOREWALL
-            # StoreWallRange(seg, NextWall->XEnd + 1, next(NextWall, 1)->XStart - 1);
-            rangeRenderer(seg, nextSegRange.xEnd + 1,  segList[nextSegIndex + 1].xStart - 1, v1Angle, v2Angle)
-
-            nextSegIndex += 1
-            nextSegRange = segList[nextSegIndex]
-            # partially clipped by other walls, store each fragment
-            if v2xScreen <= nextSegRange.xEnd:
-                return
-
-        # wall precedes all known segments
-        # STOREWALL
-        # StoreWallRange(seg, NextWall->XEnd + 1, CurrentWall.XEnd);
-        rangeRenderer(seg, nextSegRange.xEnd + 1,  v2xScreen, v1Angle, v2Angle)
+        self.profiler.start("cliplist")
+        visible = segList.clipPortalWall(v1xScreen, v2xScreen)
+        self.profiler.stop()
+        self.countVisible(visible)
+        self.profiler.start("height")
+        for i in range(0, len(visible), 2):
+            rangeRenderer(seg, visible[i], visible[i + 1], v1Angle, v2Angle)
+        self.profiler.stop()
 
@@ -0,0 +1,202 @@
+import numpy as np
+
+# Pixel buffer the fps renderers draw into
+# a (height, width, 3) uint8 RGB array filled one
+# column span at a time and handed to Game2D once
+# per frame instead of one GL call per column
+# drawLine and drawRectangle take the same screen
+# coordinates as Game2D so renderers can draw into
+# either, xOffset and yOffset place the buffer
+#
+# Indexed draws write palette indices and COLORMAP
+# light maps into two (height, width) uint8 planes
+# instead, a quarter of the bytes of rgb, present turns
+# them into rgb pixels with one lookup into a
+# [light map][index] rgb table
+class FrameBuffer(object):
+    def __init__(self, width, height, xOffset = 0, yOffset = 0):
+        self.width = int(width)
+        self.height = int(height)
+        self.xOffset = xOffset
+        self.yOffset = yOffset
+        self.pixels = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.indices = np.zeros((self.height, self.width), dtype=np.uint8)
+        self.lights = np.zeros((self.height, self.width), dtype=np.uint8)
+        self.colors = {} # rgba float tuple to uint8 rgb
+        self.rows = np.arange(self.height, dtype=np.int32)
+
+    def clear(self, rgb = (0, 0, 0)):
+        self.pixels[:] = rgb
+        self.indices.fill(0)
+        self.lights.fill(0)
+
+    # indices and light maps to rgb pixels, shades is
+    # [light map][index]: rgb, read as one flat table
+    # it is a single take which beats 2d fancy indexing
+    def present(self, shades):
+        codes = (self.lights.astype(np.intp) << 8) | self.indices
+        np.take(shades.reshape(-1, 3), codes, axis=0, out=self.pixels)
+
+    # 0-1 float rgba to 0-255 rgb, alpha is ignored
+    # as walls are always drawn opaque
+    def getColor(self, rgba):
+        color = self.colors.get(rgba)
+        if color is None:
+            color = (int(rgba[0] * 255), int(rgba[1] * 255), int(rgba[2] * 255))
+            self.colors[rgba] = color
+        return color
+
+    # fill rows y1..y2 of column x, clipped to the buffer
+    def drawColumn(self, x, y1, y2, rgb):
+        if x < 0 or x >= self.width:
+            return
+        if y1 > y2:
+            y1, y2 = y2, y1
+        y1 = max(y1, 0)
+        y2 = min(y2, self.height - 1)
+        if y1 <= y2:
+            self.pixels[y1:y2 + 1, x] = rgb
+
+    # fill rows tops[i]..bottoms[i] of column xs[i] for
+    # every i with one masked write, rows are truncated
+    # like drawLine so both draw the same pixels
+    def drawColumns(self, xs, tops, bottoms, rgba):
+        inside = (xs >= 0) & (xs < self.width)
+        if not inside.any():
+            return
+        rgb = self.getColor(tuple(rgba))
+        xs = xs[inside]
+        tops = np.trunc(tops[inside]).astype(np.int32)
+        bottoms = np.trunc(bottoms[inside]).astype(np.int32)
+        # mask the block of columns from the first to the
+        # last x, columns not in xs stay empty
+        x1 = int(xs.min())
+        x2 = int(xs.max())
+        y1s = np.ones(x2 - x1 + 1, dtype=np.int32)
+        y2s = np.zeros(x2 - x1 + 1, dtype=np.int32)
+        y1s[xs - x1] = np.minimum(tops, bottoms)
+        y2s[xs - x1] = np.maximum(tops, bottoms)
+        rows = self.rows[:, None]
+        mask = (rows >= y1s) & (rows <= y2s)
+        # one channel at a time, a 2d mask over the
+        # rgb block is much slower to apply
+        block = self.pixels[:, x1:x2 + 1]
+        for channel in range(3):
+            block[..., channel][mask] = rgb[channel]
+
+    # same rows as drawColumns but sampled from a column
+    # major texture, us is the texture column of each
+    # screen column and row y reads texel v0s + y * vSteps,
+    # every pixel of the section is gathered at once and
+    # lights is the light map of each column
+    def drawTexturedColumns(self, xs, tops, bottoms, texture, us, v0s, vSteps, lights):
+        inside = (xs >= 0) & (xs < self.width)
+        if not inside.any():
+            return
+        xs = xs[inside]
+        columns, ys = self.expandColumns(tops[inside], bottoms[inside])
+        us = np.floor(us[inside]).astype(np.int64) % texture.width
+        vs = np.floor(v0s[inside][columns] + ys * vSteps[inside][columns]).astype(np.int64) % texture.height
+        self.indices[ys, xs[columns]] = texture.columns[us[columns], vs]
+        self.lights[ys, xs[columns]] = lights[inside][columns]
+
+    # columns of a picture with holes at one scale like
+    # a sprite, texels off the picture or not covered by
+    # its posts are skipped, returns the pixels written
+    def drawMaskedColumns(self, xs, tops, bottoms, picture, us, v0, vStep, light):
+        columns, ys = self.expandColumns(tops, bottoms)
+        vs = np.floor(v0 + ys * vStep).astype(np.int64)
+        inside = (vs >= 0) & (vs < picture.height)
+        columns = columns[inside]
+        ys = ys[inside]
+        us = us[columns]
+        vs = vs[inside]
+        solid = picture.mask[us, vs]
+        ys = ys[solid]
+        xs = xs[columns[solid]]
+        self.indices[ys, xs] = picture.columns[us[solid], vs[solid]]
+        self.lights[ys, xs] = light
+        return len(ys)
+
+    # columns of one palette index
+    def drawIndexedColumns(self, xs, tops, bottoms, index, lights):
+        inside = (xs >= 0) & (xs < self.width)
+        if not inside.any():
+            return
+        xs = xs[inside]
+        columns, ys = self.expandColumns(tops[inside], bottoms[inside])
+        self.indices[ys, xs[columns]] = index
+        self.lights[ys, xs[columns]] = lights[inside][columns]
+
+    # one entry per pixel of the columns, the column it
+    # is in and its row, rows are truncated like drawColumns
+    # and clipped to the buffer
+    def expandColumns(self, tops, bottoms):
+        tops = np.trunc(tops).astype(np.int32)
+        bottoms = np.trunc(bottoms).astype(np.int32)
+        y1s = np.maximum(np.minimum(tops, bottoms), 0)
+        y2s = np.minimum(np.maximum(tops, bottoms), self.height - 1)
+        lengths = np.maximum(y2s - y1s + 1, 0)
+        columns = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        ys = np.arange(int(lengths.sum())) - np.repeat(starts - y1s, lengths)
+        return columns, ys
+
+    # HORIZONTAL SPANS
+    # row ys[i] from x1s[i] to x2s[i], spans must be
+    # inside the buffer, every pixel is written at once
+    def drawSpans(self, ys, x1s, x2s, rgba):
+        spans, offsets = FrameBuffer.expandSpans(x1s, x2s)
+        self.pixels[ys[spans], x1s[spans] + offsets] = self.getColor(tuple(rgba))
+
+    # spans sampled from a column major picture, the
+    # texel at x1s[i] + k is (u0s + k * uSteps, v0s + k * vSteps)
+    # and lights is the light map of each span
+    def drawTexturedSpans(self, ys, x1s, x2s, picture, u0s, v0s, uSteps, vSteps, lights):
+        spans, offsets = FrameBuffer.expandSpans(x1s, x2s)
+        us = np.floor(u0s[spans] + offsets * uSteps[spans]).astype(np.int64) % picture.width
+        vs = np.floor(v0s[spans] + offsets * vSteps[spans]).astype(np.int64) % picture.height
+        self.indices[ys[spans], x1s[spans] + offsets] = picture.columns[us, vs]
+        self.lights[ys[spans], x1s[spans] + offsets] = lights[spans]
+
+    # spans of one palette index
+    def drawIndexedSpans(self, ys, x1s, x2s, index, lights):
+        spans, offsets = FrameBuffer.expandSpans(x1s, x2s)
+        self.indices[ys[spans], x1s[spans] + offsets] = index
+        self.lights[ys[spans], x1s[spans] + offsets] = lights[spans]
+
+    # span of every pixel and its offset from the span start
+    def expandSpans(x1s, x2s):
+        lengths = x2s - x1s + 1
+        spans = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        offsets = np.arange(int(lengths.sum())) - np.repeat(starts, lengths)
+        return spans, offsets
+
+    def drawLine(self, start, end, rgba, width):
+        rgb = self.getColor(tuple(rgba))
+        x1 = int(start[0] - self.xOffset)
+        y1 = int(start[1] - self.yOffset)
+        x2 = int(end[0] - self.xOffset)
+        y2 = int(end[1] - self.yOffset)
+        # wall columns are vertical, a wider line
+        # covers the columns to its right
+        if x1 == x2:
+            for x in range(x1, x1 + max(int(width), 1)):
+                self.drawColumn(x, y1, y2, rgb)
+            return
+        # anything else is stepped one pixel at a time
+        steps = max(abs(x2 - x1), abs(y2 - y1)) + 1
+        xs = np.rint(np.linspace(x1, x2, steps)).astype(np.int32)
+        ys = np.rint(np.linspace(y1, y2, steps)).astype(np.int32)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        self.pixels[ys[inside], xs[inside]] = rgb
+
+    def drawRectangle(self, pos, width, height, rgba):
+        rgb = self.getColor(tuple(rgba))
+        x1 = max(int(pos[0] - self.xOffset), 0)
+        y1 = max(int(pos[1] - self.yOffset), 0)
+        x2 = min(int(pos[0] - self.xOffset + width), self.width)
+        y2 = min(int(pos[1] - self.yOffset + height), self.height)
+        if x1 < x2 and y1 < y2:
+            self.pixels[y1:y2, x1:x2] = rgb
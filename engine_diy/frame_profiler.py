@@ -0,0 +1,128 @@
+import time, collections
+
+# Per stage frame timer
+# Stages are timed with perf_counter_ns and nest, a
+# stage started inside another pauses the outer one so
+# every stage gets only its own time, whatever is not
+# in a stage is "other"
+#
+#   bsp        walking the BSP tree
+#   fovclip    clipping seg vertices to the fov
+#   cliplist   solid seg clip list updates
+#   height     wall height and column span calculation
+#   draw       drawing stored segs and the frame blit
+#   planes     building and drawing floor and ceiling spans
+#   sprites    projecting, sorting and drawing thing sprites
+#
+# Switched off every call returns straight away, the
+# last frames are kept for a rolling average and each
+# frame can be streamed to a CSV file
+class FrameProfiler(object):
+    STAGES = ("bsp", "fovclip", "cliplist", "height", "draw", "planes", "sprites")
+    COLORS = {
+        "bsp": (0.2, 0.6, 1, 1),
+        "fovclip": (1, 0.8, 0, 1),
+        "cliplist": (1, 0.3, 0.3, 1),
+        "height": (0.3, 1, 0.3, 1),
+        "draw": (0.8, 0.4, 1, 1),
+        "planes": (0.2, 0.9, 0.9, 1),
+        "sprites": (1, 0.6, 0.2, 1),
+        "other": (0.6, 0.6, 0.6, 1),
+    }
+
+    def __init__(self, history = 60):
+        self.enabled = False
+        self.times = dict.fromkeys(FrameProfiler.STAGES, 0) # ns this frame
+        self.stack = [] # [stage, ns when it last resumed]
+        self.frameStart = None
+        self.frames = collections.deque(maxlen=history) # ms per stage per frame
+        self.frameCount = 0
+        self.csvFile = None
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+        self.stack.clear()
+        self.frameStart = None
+
+    def start(self, stage):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        if self.stack:
+            outer = self.stack[-1]
+            self.times[outer[0]] += now - outer[1]
+        self.stack.append([stage, now])
+
+    def stop(self):
+        if not self.enabled or not self.stack:
+            return
+        now = time.perf_counter_ns()
+        stage, resumed = self.stack.pop()
+        self.times[stage] += now - resumed
+        if self.stack:
+            self.stack[-1][1] = now
+
+    def beginFrame(self):
+        if not self.enabled:
+            return
+        for stage in FrameProfiler.STAGES:
+            self.times[stage] = 0
+        self.stack.clear()
+        self.frameStart = time.perf_counter_ns()
+
+    def endFrame(self):
+        if not self.enabled or self.frameStart is None:
+            return
+        total = time.perf_counter_ns() - self.frameStart
+        frame = {}
+        for stage in FrameProfiler.STAGES:
+            frame[stage] = self.times[stage] / 1e6
+        frame["other"] = max(total - sum(self.times.values()), 0) / 1e6
+        frame["total"] = total / 1e6
+        self.frames.append(frame)
+        self.frameCount += 1
+        if self.csvFile is not None:
+            self.csvFile.write("{},{}\n".format(self.frameCount,
+                ",".join("{:.4f}".format(frame[key]) for key in FrameProfiler.STAGES + ("other", "total"))))
+
+    # rolling average ms of each stage
+    def getAverages(self):
+        averages = dict.fromkeys(FrameProfiler.STAGES + ("other", "total"), 0.0)
+        if len(self.frames) == 0:
+            return averages
+        for frame in self.frames:
+            for key in averages:
+                averages[key] += frame[key]
+        for key in averages:
+            averages[key] /= len(self.frames)
+        return averages
+
+    # CSV STREAMING
+    def openCsv(self, filename):
+        self.closeCsv()
+        self.csvFile = open(filename, 'w')
+        self.frameCount = 0
+        self.csvFile.write("frame,{},other,total\n".format(",".join(FrameProfiler.STAGES)))
+
+    def closeCsv(self):
+        if self.csvFile is not None:
+            self.csvFile.close()
+            self.csvFile = None
+
+    # stacked bar and a line per stage, game is
+    # anything with drawRectangle and drawText
+    def drawOverlay(self, game, pos, msWidth = 20):
+        averages = self.getAverages()
+        x, y = pos
+        game.drawRectangle([x - 4, y - 4], 248, 22 + 16 * (len(FrameProfiler.STAGES) + 2), (0, 0, 0, 0.6))
+        barX = x
+        for key in FrameProfiler.STAGES + ("other",):
+            width = averages[key] * msWidth
+            game.drawRectangle([barX, y], width, 12, FrameProfiler.COLORS[key])
+            barX += width
+        y += 18
+        for key in FrameProfiler.STAGES + ("other",):
+            game.drawRectangle([x, y + 2], 10, 10, FrameProfiler.COLORS[key])
+            game.drawText("{:<9} {:6.2f}ms".format(key, averages[key]), [x + 16, y], (1, 1, 1, 1))
+            y += 16
+        game.drawText("{:<9} {:6.2f}ms".format("total", averages["total"]), [x + 16, y], (1, 1, 1, 1))
@@ -1,8 +1,32 @@
 import pygame, os, math
+import numpy as np
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 
+# triangles of a unit circle, made once and
+# scaled and moved for each drawPoint
+CIRCLE_SEGMENTS = 24
+CIRCLE = []
+for i in range(CIRCLE_SEGMENTS):
+    a1 = 2 * math.pi * i / CIRCLE_SEGMENTS
+    a2 = 2 * math.pi * (i + 1) / CIRCLE_SEGMENTS
+    CIRCLE.append((0, 0))
+    CIRCLE.append((math.cos(a1), math.sin(a1)))
+    CIRCLE.append((math.cos(a2), math.sin(a2)))
+CIRCLE = np.array(CIRCLE, dtype=np.float32)
+
+# Lines, rectangles and points are not drawn straight
+# away but added to a batch of runs, a run is the
+# vertices and colors of primitives of one GL mode (and
+# line width) drawn one after the other, each run is
+# sent with a single glDrawArrays when the batch is
+# flushed, so the order things were drawn in is kept
+# and the automap is one call instead of one per line
+#
+# The batch is flushed at drawEnd and before anything
+# drawn straight away (text and pixels) so that it
+# still ends up on top of what was drawn before it
 class Game2D(object):
 
     def __init__(self):
@@ -13,6 +37,10 @@ class Game2D(object):
         self.keyHoldCallbacks = {}
         self.mouseMoveCallbacks = []
         self.keyHolds = {}
+        self.pixelsTexture = None
+        self.pixelsTextureSize = None
+        self.fonts = {} # size: pygame font
+        self.batch = [] # runs of [mode, line width, vertices, colors]
 
     def setupWindow(self, width, height):
         self.width = width
@@ -89,39 +117,103 @@ class Game2D(object):
         glLoadIdentity()
 
     def drawEnd(self):
+        self.flush()
         glPopMatrix()
         pygame.display.flip() # buffer swap
 
+    # the run to add to, a new one when the mode
+    # or line width differs from the last run
+    def getRun(self, mode, width = None):
+        if self.batch:
+            run = self.batch[-1]
+            if run[0] == mode and run[1] == width:
+                return run
+        run = [mode, width, [], []]
+        self.batch.append(run)
+        return run
+
+    # draw every run in order and empty the batch
+    def flush(self):
+        if not self.batch:
+            return
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        for mode, width, vertices, colors in self.batch:
+            if width is not None:
+                glLineWidth(width)
+            vertexArray = np.array(vertices, dtype=np.float32)
+            colorArray = np.array(colors, dtype=np.float32)
+            glVertexPointer(2, GL_FLOAT, 0, vertexArray)
+            glColorPointer(4, GL_FLOAT, 0, colorArray)
+            glDrawArrays(mode, 0, len(vertices) // 2)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        self.batch.clear()
+
     def drawLine(self, start, end, rgba, width):
-        glLineWidth(width)
-        glColor4f(rgba[0], rgba[1], rgba[2], rgba[3])
-        glBegin(GL_LINES)
-        glVertex2f(start[0], start[1])
-        glVertex2f(end[0], end[1])
-        glEnd()
+        run = self.getRun(GL_LINES, width)
+        run[2].extend((start[0], start[1], end[0], end[1]))
+        run[3].extend((rgba[0], rgba[1], rgba[2], rgba[3]) * 2)
 
     def drawPoint(self, pos, rgba, radius):
-        glColor4f(rgba[0], rgba[1], rgba[2], rgba[3])
-        glBegin(GL_TRIANGLE_FAN)
-        glVertex2f(pos[0], pos[1]);
-        for angle in range(10, 3610, 2):
-            angle = angle / 10 # convert back down to degrees
-            x2 = pos[0] + math.sin(angle) * radius;
-            y2 = pos[1] + math.cos(angle) * radius;
-            glVertex2f(x2, y2);
-        glEnd()
+        run = self.getRun(GL_TRIANGLES)
+        run[2].extend((CIRCLE * radius + (pos[0], pos[1])).ravel().tolist())
+        run[3].extend((rgba[0], rgba[1], rgba[2], rgba[3]) * len(CIRCLE))
 
     def drawRectangle(self, pos, width, height, rgba):
-        glColor4f(rgba[0], rgba[1], rgba[2], rgba[3])
-        glBegin(GL_QUADS)
-        glVertex2f(pos[0], pos[1])
-        glVertex2f(pos[0] + width, pos[1])
-        glVertex2f(pos[0] + width, pos[1] + height)
-        glVertex2f(pos[0], pos[1] + height)
-        glEnd()
+        run = self.getRun(GL_QUADS)
+        x, y = pos[0], pos[1]
+        run[2].extend((x, y, x + width, y, x + width, y + height, x, y + height))
+        run[3].extend((rgba[0], rgba[1], rgba[2], rgba[3]) * 4)
 
     def drawBox(self, tl, tr, br, bl, rgba, width):
         self.drawLine(tl, tr, rgba, width)
         self.drawLine(tr, br, rgba, width)
         self.drawLine(br, bl, rgba, width)
         self.drawLine(bl, tl, rgba, width)
+
+    # text with its top left at pos, rendered by pygame
+    # and copied to the screen with glDrawPixels
+    def drawText(self, text, pos, rgba, size=14):
+        self.flush()
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont("monospace", size)
+        color = (int(rgba[0] * 255), int(rgba[1] * 255), int(rgba[2] * 255))
+        surface = self.fonts[size].render(text, True, color)
+        width, height = surface.get_size()
+        # rows are bottom up so start from the bottom left
+        data = pygame.image.tostring(surface, "RGBA", True)
+        glRasterPos2f(pos[0], pos[1] + height)
+        glDrawPixels(width, height, GL_RGBA, GL_UNSIGNED_BYTE, data)
+
+    # draw a (height, width, 3) uint8 RGB array at pos
+    # as one textured quad, the texture is made once and
+    # each frame only uploads the new pixels into it
+    def drawPixels(self, pixels, pos):
+        self.flush()
+        height, width = pixels.shape[0], pixels.shape[1]
+        if self.pixelsTexture is None:
+            self.pixelsTexture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.pixelsTexture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        if self.pixelsTextureSize != (width, height):
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, pixels)
+            self.pixelsTextureSize = (width, height)
+        else:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height, GL_RGB, GL_UNSIGNED_BYTE, pixels)
+
+        glEnable(GL_TEXTURE_2D)
+        glColor4f(1, 1, 1, 1)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0)
+        glVertex2f(pos[0], pos[1])
+        glTexCoord2f(1, 0)
+        glVertex2f(pos[0] + width, pos[1])
+        glTexCoord2f(1, 1)
+        glVertex2f(pos[0] + width, pos[1] + height)
+        glTexCoord2f(0, 1)
+        glVertex2f(pos[0], pos[1] + height)
+        glEnd()
+        glDisable(GL_TEXTURE_2D)
@@ -0,0 +1,59 @@
+import numpy as np
+
+# DOOM light diminishing
+# COLORMAP has 32 light maps from full bright (0) to
+# black (31), a pixel is shaded by reading its palette
+# index through one of them, which one depends on the
+# sector light and how far away the pixel is
+#
+#   scalelight  [light level][wall scale * 16]
+#               walls, scale is 1 / distance so
+#               near walls are brighter
+#   zlight      [light level][distance / 16]
+#               floors and ceilings, distance is
+#               the depth of the row
+#
+# Sprites use the scalelight row of their sector
+#
+# Light levels are the sector light >> 4, built like
+# R_InitLightTables and R_ExecuteSetViewSize
+class LightTables(object):
+    LIGHTLEVELS = 16
+    LIGHTSEGSHIFT = 4
+    MAXLIGHTSCALE = 48
+    MAXLIGHTZ = 128
+    NUMCOLORMAPS = 32
+    DISTMAP = 2
+
+    def __init__(self, width):
+        levels = np.arange(LightTables.LIGHTLEVELS)[:, None]
+        startMaps = ((LightTables.LIGHTLEVELS - 1 - levels) * 2) * LightTables.NUMCOLORMAPS // LightTables.LIGHTLEVELS
+
+        # the wall scale a plane (z + 1) * 16 units away
+        # would have at 320 wide, dimmed like a wall
+        z = np.arange(LightTables.MAXLIGHTZ)
+        scales = (160 * 4096 // (z + 1)) >> 12
+        self.zlight = np.clip(startMaps - scales // LightTables.DISTMAP, 0, LightTables.NUMCOLORMAPS - 1).astype(np.uint8)
+
+        j = np.arange(LightTables.MAXLIGHTSCALE)
+        self.scalelight = np.clip(startMaps - j * 320 // int(width) // LightTables.DISTMAP,
+            0, LightTables.NUMCOLORMAPS - 1).astype(np.uint8)
+
+    def getLightNum(lightLevel, contrast = 0):
+        return min(max((lightLevel >> LightTables.LIGHTSEGSHIFT) + contrast, 0), LightTables.LIGHTLEVELS - 1)
+
+    # light map of each wall column from its scale
+    def getWallLights(self, lightLevel, scales, contrast = 0):
+        lights = self.scalelight[LightTables.getLightNum(lightLevel, contrast)]
+        return lights[np.minimum((scales * 16).astype(np.int64), LightTables.MAXLIGHTSCALE - 1)]
+
+    # light map of a sprite, dimmed like a wall
+    # column of the same scale without fake contrast
+    def getSpriteLight(self, lightLevel, scale):
+        lights = self.scalelight[LightTables.getLightNum(lightLevel)]
+        return int(lights[min(int(scale * 16), LightTables.MAXLIGHTSCALE - 1)])
+
+    # light map of each plane span from its depth
+    def getPlaneLights(self, lightLevel, depths):
+        lights = self.zlight[LightTables.getLightNum(lightLevel)]
+        return lights[np.minimum((depths / 16).astype(np.int64), LightTables.MAXLIGHTZ - 1)]
@@ -0,0 +1,56 @@
+from collections import OrderedDict
+
+# Least recently used cache bounded by memory
+# sizeof measures an entry in bytes, entries are
+# measured again whenever they are used since a
+# lazily decoded entry grows as it is read
+class LRUCache(object):
+    def __init__(self, maxBytes, sizeof):
+        self.maxBytes = maxBytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        value = self.entries[key]
+        self.measure(key, value)
+        self.evict()
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        self.entries[key] = value
+        self.measure(key, value)
+        self.evict()
+
+    def measure(self, key, value):
+        size = self.sizeof(value)
+        self.totalBytes += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+
+    # drop least recently used entries until we fit
+    # the most recent entry is always kept
+    def evict(self):
+        while self.totalBytes > self.maxBytes and len(self.entries) > 1:
+            key, value = self.entries.popitem(last=False)
+            self.totalBytes -= self.sizes.pop(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.sizes.clear()
+        self.totalBytes = 0
@@ -1,4 +1,7 @@
+import math
+import numpy as np
 from enum import Enum
+from engine_diy.blockmap import Blockmap
 
 class Map(object):
     # used to identify if a node id has the sector bit on the end
@@ -29,6 +32,13 @@ class Map(object):
         self.segs = []
         self.sectors = []
         self.sidedefs = []
+        self.reject = None # packed bit per sector pair, bytes like
+        self.blockmap = None # Blockmap grid of linedefs and things
+        self.vertexArrays = None # vertex xs and ys for vectorized passes
+        self.subsectorThings = None # subsector ID: [thing], built on first use
+        # BSP walk counters
+        self.nodesVisited = 0
+        self.subsectorsVisited = 0
         # Meta Data
         self.playerThing = None # a thing
         self.solidLinedefs = []
@@ -42,6 +52,25 @@ class Map(object):
     def createData(self):
         self.assignPointerData()
         self.createMetaData()
+        self.createBlockmapData()
+
+    # vertex positions as float arrays, index is vertex id
+    def getVertexArrays(self):
+        if self.vertexArrays is None:
+            self.vertexArrays = (
+                np.array([v.x for v in self.vertices], dtype=np.float64),
+                np.array([v.y for v in self.vertices], dtype=np.float64))
+        return self.vertexArrays
+
+    # give the blockmap the linedef end points and
+    # thing positions its queries test against
+    def createBlockmapData(self):
+        if self.blockmap is None:
+            return
+        self.blockmap.setLines(
+            [l.startVertex.x for l in self.linedefs], [l.startVertex.y for l in self.linedefs],
+            [l.endVertex.x for l in self.linedefs], [l.endVertex.y for l in self.linedefs])
+        self.blockmap.setThings([t.x for t in self.things], [t.y for t in self.things])
 
     # helper method to get min and
     # max values of the maps coords
@@ -141,6 +170,10 @@ class Map(object):
                     s.backSector = s.linedef.frontSidedef.sector
                 if s.linedef.backSidedef != None:
                     s.frontSector = s.linedef.backSidedef.sector
+        # SUBSECTORS sector, needs seg sectors
+        for i,s in enumerate(self.subsectors):
+            if s.firstSeg.frontSector != None:
+                s.sectorID = s.firstSeg.frontSector.ID
 
     def getRootNode(self):
         return self.nodes[len(self.nodes) - 1]
@@ -157,6 +190,19 @@ class Map(object):
         nodeId = len(self.nodes) - 1
         return self.subsectors[self.recurseFindSubsector(x, y, nodeId)]
 
+    # things linked to the subsector they stand in like
+    # P_SetThingPosition, found once with a BSP descent
+    # each so a renderer only looks at the things of
+    # the subsectors it walks
+    def getSubsectorThings(self):
+        if self.subsectorThings is None:
+            self.subsectorThings = {}
+            nodeId = len(self.nodes) - 1
+            for thing in self.things:
+                subsectorID = self.recurseFindSubsector(thing.x, thing.y, nodeId)
+                self.subsectorThings.setdefault(subsectorID, []).append(thing)
+        return self.subsectorThings
+
     def getSectorAtPosition(self, x, y):
         subsector = self.getSubsectorAtPosition(x, y)
         seg = subsector.firstSeg
@@ -189,9 +235,121 @@ class Map(object):
         else:
             return self.recurseFindSubsector(x, y, node.frontChildID)
 
-    def renderBspNodes(self, x, y, renderSubsector):
-        rootNode = self.nodes[len(self.nodes) - 1]
-        return self.recurseRenderBspNodes2(x, y, rootNode, renderSubsector)
+    # REJECT is a bit matrix of sector pairs, row is the
+    # sector looking and column the sector looked at, a
+    # set bit means nothing in b can be seen from a
+    def canSectorsSee(self, a, b):
+        if self.reject is None:
+            return True
+        bit = a * len(self.sectors) + b
+        byte = bit >> 3
+        # short or empty tables reject nothing
+        if byte >= len(self.reject):
+            return True
+        return (self.reject[byte] >> (bit & 7)) & 1 == 0
+
+    # viewSector lets whole subsectors be skipped when
+    # REJECT says they can not be seen from that sector
+    # viewCone (angle, fov) in degrees lets whole subtrees
+    # be skipped when their box is outside the view
+    def renderBspNodes(self, x, y, renderSubsector, viewSector = None, viewCone = None):
+        if viewSector is not None and self.reject is not None:
+            renderSubsector = self.rejectSubsectors(viewSector.ID, renderSubsector)
+        return self.iterateRenderBspNodes(x, y, renderSubsector, viewCone)
+
+    def rejectSubsectors(self, viewSectorID, renderSubsector):
+        def renderVisibleSubsector(subsector):
+            if subsector.sectorID < 0 or self.canSectorsSee(viewSectorID, subsector.sectorID):
+                return renderSubsector(subsector)
+        return renderVisibleSubsector
+
+    # front to back walk with an explicit stack, the
+    # near child is always walked and the far child
+    # only once its box is found to be in the view cone
+    # like R_RenderBSPNode, nodesVisited and
+    # subsectorsVisited count the work of the last walk
+    # renderSubsector returns True when nothing more can
+    # be seen (the screen is full) to end the walk early
+    def iterateRenderBspNodes(self, x, y, renderSubsector, viewCone = None):
+        self.nodesVisited = 0
+        self.subsectorsVisited = 0
+        if viewCone is not None:
+            viewAngle = viewCone[0]
+            clipAngle = viewCone[1] / 2
+        # entries are node id and the box to test first or None
+        stack = [(len(self.nodes) - 1, None)]
+        while stack:
+            nodeId, box = stack.pop()
+            if box is not None and not self.isBoxInView(x, y, viewAngle, clipAngle, box):
+                continue
+            if self.isNodeIDSubsector(nodeId):
+                self.subsectorsVisited += 1
+                if renderSubsector(self.subsectors[self.getNodeSubsector(nodeId)]) is True:
+                    break
+                continue
+
+            self.nodesVisited += 1
+            node = self.nodes[nodeId]
+            if self.isOnBackSide(x, y, node):
+                nearId = node.backChildID
+                farId = node.frontChildID
+                farBox = (node.frontBoxTop, node.frontBoxBottom, node.frontBoxLeft, node.frontBoxRight) if viewCone is not None else None
+            else:
+                nearId = node.frontChildID
+                farId = node.backChildID
+                farBox = (node.backBoxTop, node.backBoxBottom, node.backBoxLeft, node.backBoxRight) if viewCone is not None else None
+            # popped in reverse so the near side goes first
+            stack.append((farId, farBox))
+            stack.append((nearId, None))
+
+    # for each side of the box the viewer is on, the two
+    # corners (box indices) that make its silhouette
+    # box is (top, bottom, left, right)
+    BOXCORNERS = (
+        (3, 0, 2, 1), (3, 0, 2, 0), (3, 1, 2, 0), None,
+        (2, 0, 2, 1), None,         (3, 1, 3, 0), None,
+        (2, 0, 3, 1), (2, 1, 3, 1), (2, 1, 3, 0),
+    )
+
+    # R_CheckBBox without the clip list, True when any
+    # of the box can be inside the view cone, angles are
+    # worked mod 360 like Dooms unsigned BAM angles
+    def isBoxInView(self, x, y, viewAngle, clipAngle, box):
+        top, bottom, left, right = box
+        if x <= left:
+            boxX = 0
+        elif x < right:
+            boxX = 1
+        else:
+            boxX = 2
+        if y >= top:
+            boxY = 0
+        elif y > bottom:
+            boxY = 1
+        else:
+            boxY = 2
+        corners = Map.BOXCORNERS[(boxY << 2) + boxX]
+        # viewer is inside the box
+        if corners is None:
+            return True
+
+        x1, y1, x2, y2 = box[corners[0]], box[corners[1]], box[corners[2]], box[corners[3]]
+        angle1 = (math.degrees(math.atan2(y1 - y, x1 - x)) - viewAngle) % 360
+        angle2 = (math.degrees(math.atan2(y2 - y, x2 - x)) - viewAngle) % 360
+        span = (angle1 - angle2) % 360
+        # viewer is on one of the box lines
+        if span >= 180:
+            return True
+
+        # both corners off the left side
+        tspan = (angle1 + clipAngle) % 360
+        if tspan > 2 * clipAngle and tspan - 2 * clipAngle >= span:
+            return False
+        # both corners off the right side
+        tspan = (clipAngle - angle2) % 360
+        if tspan > 2 * clipAngle and tspan - 2 * clipAngle >= span:
+            return False
+        return True
 
     def recurseRenderBspNodes2(self, x, y, node, renderSubsector):
         if self.isOnBackSide(x, y, node):
@@ -253,6 +411,9 @@ class Linedef(object):
         DONTDRAW      = 64,
         DRAW          = 128
     nullSideDefID = 0xFFFF
+    # flag masks tested when pegging wall textures
+    ML_DONTPEGTOP = 8
+    ML_DONTPEGBOTTOM = 16
     def __init__(self):
         # WAD DATA
         # all 2 bytes (14 bytes)
@@ -470,6 +631,7 @@ class Subsector(object):
         # POINTER DATA
         self.ID = 0
         self.firstSeg = None
+        self.sectorID = -1 # sector of the first seg
     def sizeof():
         return 4
     def __str__(self):
@@ -501,6 +663,11 @@ class Seg(object):
     def getAngle(self):
         d = float(self.angle << 16)
         return d * 8.38190317e-8
+    # sidedef of the side of the linedef the seg is on
+    def getSidedef(self):
+        if self.direction == 0:
+            return self.linedef.frontSidedef
+        return self.linedef.backSidedef
 
 class Sector(object):
     def __init__(self):
@@ -0,0 +1,173 @@
+import os, struct, mmap, hashlib
+import numpy as np
+from engine_diy.columnar_map import ColumnarMap, LUMP_DTYPES
+
+################# MAP CACHE CONTENTS ####################
+#
+#   Header
+#     char[4]   magic "DMPC"
+#     uint32    format version
+#     char[20]  sha1 of the WAD file contents
+#     char[8]   map name
+#     uint32    entry count
+#   Entries (entry count of)
+#     char[16]  group: lump, index, derived or meta
+#     char[32]  name: lump name, LUMP.column or key
+#     char[8]   numpy dtype string ('' for lumps)
+#     uint64    offset of the array data
+#     uint64    size of the array data in bytes
+#   Array data, each aligned to 16 bytes
+#
+# LITTLE-ENDIAN format
+#
+# A cached map is only used when its header matches
+# the current format version, the WAD hash and the
+# map name, anything else is rebuilt from the WAD
+
+class MapCache(object):
+    MAGIC = b'DMPC'
+    # bump when the layout or the derived data changes
+    VERSION = 3
+    HEADER = '<4sI20s8sI'
+    ENTRY = '<16s32s8sQQ'
+    ALIGN = 16
+
+    def __init__(self, cacheDir):
+        self.cacheDir = cacheDir
+        self.wadHashes = {} # wad path to sha1 digest
+
+    # sha1 of the whole WAD, read through the
+    # WADs own mapping
+    def getWadHash(self, wad):
+        if wad.wadpath not in self.wadHashes:
+            self.wadHashes[wad.wadpath] = hashlib.sha1(wad.data).digest()
+        return self.wadHashes[wad.wadpath]
+
+    # cache file name holds the WAD name and hash
+    # so older versions of the same WAD can be found
+    def getCachePath(self, wad, mapName):
+        return os.path.join(self.cacheDir, "{}.{}.{}.v{}.dmc".format(
+            os.path.basename(wad.wadpath), self.getWadHash(wad).hex()[:16], mapName, MapCache.VERSION))
+
+    # load a map from the cache, decoding and
+    # storing it first if it is missing or stale
+    def loadMap(self, wad, mapName):
+        map = self.load(wad, mapName)
+        if map is None:
+            map = wad.loadColumnarMap(mapName)
+            if map is None:
+                return None
+            self.save(wad, map)
+        return map
+
+    def load(self, wad, mapName):
+        path = self.getCachePath(wad, mapName)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        entries = self.readHeader(mm, wad, mapName)
+        if entries is None:
+            mm.close()
+            return None
+
+        data = memoryview(mm)
+        map = ColumnarMap()
+        map.name = mapName
+        for group, name, dtype, offset, size in entries:
+            buffer = data[offset:offset + size]
+            if group == 'lump':
+                map.lumps[name] = np.frombuffer(buffer, dtype=LUMP_DTYPES[name])
+            elif group == 'index':
+                lumpName, column = name.split('.')
+                map.indexColumns.setdefault(lumpName, {})[column] = np.frombuffer(buffer, dtype=dtype)
+            elif group == 'derived':
+                map.derived[name] = np.frombuffer(buffer, dtype=dtype)
+            elif group == 'meta':
+                map.meta[name] = int(np.frombuffer(buffer, dtype=dtype)[0])
+
+        # skip straight to the accessors
+        map.setupColumns()
+        map.applyMetaData()
+        return map
+
+    # returns the entry table or None when stale
+    def readHeader(self, mm, wad, mapName):
+        headerSize = struct.calcsize(MapCache.HEADER)
+        if len(mm) < headerSize:
+            return None
+        magic, version, wadHash, name, count = struct.unpack_from(MapCache.HEADER, mm, 0)
+        if magic != MapCache.MAGIC or version != MapCache.VERSION:
+            return None
+        if wadHash != self.getWadHash(wad) or name.rstrip(b'\x00').decode('ascii') != mapName:
+            return None
+
+        entries = []
+        entrySize = struct.calcsize(MapCache.ENTRY)
+        for i in range(count):
+            group, name, dtype, offset, size = struct.unpack_from(MapCache.ENTRY, mm, headerSize + i * entrySize)
+            if offset + size > len(mm):
+                return None
+            entries.append((
+                group.rstrip(b'\x00').decode('ascii'),
+                name.rstrip(b'\x00').decode('ascii'),
+                dtype.rstrip(b'\x00').decode('ascii'),
+                offset, size))
+        return entries
+
+    def save(self, wad, map):
+        # lazily loaded maps have to be complete first
+        map.decodeAll()
+
+        arrays = []
+        for lumpName, array in map.lumps.items():
+            arrays.append(('lump', lumpName, '', array))
+        for lumpName, columns in map.indexColumns.items():
+            for column, array in columns.items():
+                arrays.append(('index', lumpName + '.' + column, array.dtype.str, array))
+        for name, array in map.derived.items():
+            arrays.append(('derived', name, array.dtype.str, array))
+        for name, value in map.meta.items():
+            arrays.append(('meta', name, '<i8', np.array([value], dtype='<i8')))
+
+        # lay out the array data after the header and entries
+        offset = struct.calcsize(MapCache.HEADER) + len(arrays) * struct.calcsize(MapCache.ENTRY)
+        entries = b''
+        offsets = []
+        for group, name, dtype, array in arrays:
+            offset = MapCache.align(offset)
+            offsets.append(offset)
+            entries += struct.pack(MapCache.ENTRY, group.encode('ascii'), name.encode('ascii'), dtype.encode('ascii'), offset, array.nbytes)
+            offset += array.nbytes
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+        path = self.getCachePath(wad, map.name)
+        tmpPath = path + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            f.write(struct.pack(MapCache.HEADER, MapCache.MAGIC, MapCache.VERSION, self.getWadHash(wad), map.name.encode('ascii'), len(arrays)))
+            f.write(entries)
+            for (group, name, dtype, array), offset in zip(arrays, offsets):
+                f.write(b'\x00' * (offset - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmpPath, path)
+
+        self.removeStale(wad, map.name, path)
+
+    # drop entries for this WAD and map made from
+    # different WAD contents or another format version
+    def removeStale(self, wad, mapName, currentPath):
+        prefix = os.path.basename(wad.wadpath) + '.'
+        suffix = '.' + mapName
+        for fileName in os.listdir(self.cacheDir):
+            if not fileName.startswith(prefix) or not fileName.endswith('.dmc'):
+                continue
+            if os.path.join(self.cacheDir, fileName) == currentPath:
+                continue
+            # name is wad.hash.map.vN.dmc
+            parts = fileName[len(prefix):].split('.')
+            if len(parts) == 4 and '.' + parts[1] == suffix:
+                os.remove(os.path.join(self.cacheDir, fileName))
+
+    def align(offset):
+        return (offset + MapCache.ALIGN - 1) // MapCache.ALIGN * MapCache.ALIGN
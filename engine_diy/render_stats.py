@@ -0,0 +1,104 @@
+import time
+import numpy as np
+
+# Work done by the renderer for one frame
+# Timings are noisy but these counts are exact for a
+# view, so a change in them (lost culling, segs that no
+# longer reach the clip list) shows up straight away
+#
+#   nodes, subsectors   BSP nodes and subsectors walked
+#   segsTested          segs looked at in walked subsectors
+#   segsRejected        segs outside the fov or facing away
+#   segsClipped         segs that reached the clip list
+#   segsVisible         segs the clip list left columns for
+#   columnsVisible      screen columns left by the clip list
+#   upper/middle/lower  columns drawn per wall section
+#   visplanes, spans    floor and ceiling planes and their spans
+#   sprites             thing sprites projected into the view
+#   pixelsWritten       pixels drawn into the view
+#
+# Every *_render method returns a new one each frame,
+# variants without a step leave its counters at 0
+#
+# With detail on it also keeps, for the heatmap view,
+#
+#   columnWrites   times each screen column was drawn
+#   columnSegs     segs the clip list gave each column to
+#   segCosts       seg ID: ns spent on the seg this frame
+class RenderStats(object):
+    COUNTERS = ("nodes", "subsectors", "segsTested", "segsRejected", "segsClipped",
+        "segsVisible", "columnsVisible", "upperColumns", "middleColumns", "lowerColumns",
+        "visplanes", "spans", "sprites", "pixelsWritten")
+
+    def __init__(self, width, height, detail = False):
+        self.i_screenArea = width * height
+        self.i_nodes = 0
+        self.i_subsectors = 0
+        self.i_segsTested = 0
+        self.i_segsRejected = 0
+        self.i_segsClipped = 0
+        self.i_segsVisible = 0
+        self.i_columnsVisible = 0
+        self.i_upperColumns = 0
+        self.i_middleColumns = 0
+        self.i_lowerColumns = 0
+        self.i_visplanes = 0
+        self.i_spans = 0
+        self.i_sprites = 0
+        self.i_pixelsWritten = 0
+
+        self.columnWrites = np.zeros(width, dtype=np.int32) if detail else None
+        self.columnSegs = np.zeros(width, dtype=np.int32) if detail else None
+        self.segCosts = {}
+        self.currentSeg = None
+        self.segStart = 0
+
+    # DETAIL, every call returns straight away without it
+    def writeColumns(self, x1, x2):
+        if self.columnWrites is not None:
+            self.columnWrites[max(x1, 0):x2 + 1] += 1
+
+    # xs of one wall section, never the same x twice
+    def writeColumnList(self, xs):
+        if self.columnWrites is not None:
+            self.columnWrites[xs] += 1
+
+    def touchColumns(self, x1, x2):
+        if self.columnSegs is not None:
+            self.columnSegs[max(x1, 0):x2 + 1] += 1
+
+    # a seg costs the time until the next seg starts
+    # or its subsector is done, so the render loops
+    # only need to mark where each seg begins
+    def startSeg(self, seg):
+        if self.columnWrites is None:
+            return
+        self.endSeg()
+        self.currentSeg = seg.ID
+        self.segStart = time.perf_counter_ns()
+
+    def endSeg(self):
+        if self.currentSeg is None:
+            return
+        cost = time.perf_counter_ns() - self.segStart
+        self.segCosts[self.currentSeg] = self.segCosts.get(self.currentSeg, 0) + cost
+        self.currentSeg = None
+
+    # pixels written per pixel of the view, walls and
+    # planes never overlap in DOOM so this stays at or
+    # below 1 unless something draws twice, sprites
+    # draw over them and push it above 1
+    def getOverdraw(self):
+        return self.i_pixelsWritten / self.i_screenArea
+
+    # counter name: value, for printing and JSON
+    def toDict(self):
+        counts = {}
+        for name in RenderStats.COUNTERS:
+            counts[name] = getattr(self, "i_" + name)
+        counts["overdraw"] = self.getOverdraw()
+        return counts
+
+    def __str__(self):
+        return " ".join("{} {}".format(name, getattr(self, "i_" + name)) for name in RenderStats.COUNTERS) \
+            + " overdraw {:.2f}".format(self.getOverdraw())
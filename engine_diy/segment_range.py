@@ -1,3 +1,5 @@
+from bisect import bisect_left
+
 
 class SegmentNode(object):
     def __init__(self):
@@ -34,3 +36,126 @@ class SolidSegmentRange(object):
         return "{},{}".format(self.xStart, self.xEnd)
 
 
+
+# Solid seg clip list, the screen column ranges already
+# covered by solid walls, sorted and never overlapping
+# kept as parallel start and end lists so the range
+# a wall starts in is a bisect and merging is done
+# in place without building a range per wall
+# capped at both ends with "infinity" ranges like
+# Doom's solidsegs
+class SolidSegmentList(object):
+    def __init__(self, width):
+        self.width = width
+        self.starts = []
+        self.ends = []
+        # visible parts of the last clipped wall as
+        # start, end, start, end ... reused per wall
+        self.visible = []
+        self.reset()
+
+    def reset(self):
+        self.starts[:] = (-100000, self.width)
+        self.ends[:] = (-1, 100000)
+
+    # every column is covered once it merges to one range
+    def isFull(self):
+        return len(self.starts) < 2
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        return SolidSegmentRange(self.starts[i], self.ends[i])
+
+    def __iter__(self):
+        for i in range(len(self.starts)):
+            yield self[i]
+
+    # clip a solid wall covering x1..x2, returns the
+    # parts not yet covered and adds the wall to the list
+    def clipSolidWall(self, x1, x2):
+        starts = self.starts
+        ends = self.ends
+        visible = self.visible
+        del visible[:]
+        if len(starts) < 2:
+            return visible
+
+        # first range that ends at or after this wall starts
+        i = bisect_left(ends, x1 - 1)
+        # START to OVERLAP
+        if x1 < starts[i]:
+            if x2 < starts[i] - 1:
+                # all of the wall is visible, insert it
+                visible.append(x1)
+                visible.append(x2)
+                starts.insert(i, x1)
+                ends.insert(i, x2)
+                return visible
+            # end is already covered, extend the start
+            visible.append(x1)
+            visible.append(starts[i] - 1)
+            starts[i] = x1
+
+        # FULL OVERLAPPED
+        if x2 <= ends[i]:
+            return visible
+
+        # CHOP AND MERGE
+        # store each gap up to the range the wall ends in
+        j = i
+        while x2 >= starts[j + 1] - 1:
+            visible.append(ends[j] + 1)
+            visible.append(starts[j + 1] - 1)
+            j += 1
+            if x2 <= ends[j]:
+                ends[i] = ends[j]
+                del starts[i + 1:j + 1]
+                del ends[i + 1:j + 1]
+                return visible
+
+        # wall runs past the last range it touched
+        visible.append(ends[j] + 1)
+        visible.append(x2)
+        ends[i] = x2
+        del starts[i + 1:j + 1]
+        del ends[i + 1:j + 1]
+        return visible
+
+    # same as clipSolidWall but the list is left as is,
+    # used for portal walls that do not block the view
+    def clipPortalWall(self, x1, x2):
+        starts = self.starts
+        ends = self.ends
+        visible = self.visible
+        del visible[:]
+        if len(starts) < 2:
+            return visible
+
+        i = bisect_left(ends, x1 - 1)
+        if x1 < starts[i]:
+            if x2 < starts[i] - 1:
+                visible.append(x1)
+                visible.append(x2)
+                return visible
+            visible.append(x1)
+            visible.append(starts[i] - 1)
+
+        if x2 <= ends[i]:
+            return visible
+
+        j = i
+        while x2 >= starts[j + 1] - 1:
+            visible.append(ends[j] + 1)
+            visible.append(starts[j + 1] - 1)
+            j += 1
+            if x2 <= ends[j]:
+                return visible
+
+        visible.append(ends[j] + 1)
+        visible.append(x2)
+        return visible
+
+    def __str__(self):
+        return " > ".join("{},{}".format(s, e) for s, e in zip(self.starts, self.ends))
@@ -0,0 +1,203 @@
+from engine_diy.lru import LRUCache
+from engine_diy.textures import Picture
+
+# Thing sprites of a WAD
+#
+#   S_START    sprite patches in the picture format,
+#   S_END      named SSSSFR or SSSSFRFR
+#
+#       SSSS   sprite name, TROO for the imp
+#       F      frame letter, A is the first frame
+#       R      rotation 1-8 the thing is seen from,
+#              1 is its front and they go round
+#              anticlockwise, 0 for every rotation
+#
+# A second frame and rotation is the same patch
+# mirrored, TROOA2A8 is rotation 2 and flipped 8
+#
+# Lump names are indexed up front, a patch is only
+# decoded the first time a thing uses it and kept in
+# an LRU keyed by lump name
+class Sprites(object):
+    # thing flags of the spawn state and mobj info
+    FULLBRIGHT = 1 # drawn with light map 0
+    SPAWNCEILING = 2 # hangs from the ceiling
+
+    # thing type: (sprite, frame, flags) of its spawn
+    # state in info.c, types without a sprite (player
+    # starts, teleport landings) are not drawn
+    THINGS = {
+        # Monsters
+        7: ("SPID", "A", 0), # spiderdemon
+        9: ("SPOS", "A", 0), # shotgun guy
+        16: ("CYBR", "A", 0), # cyberdemon
+        58: ("SARG", "A", 0), # spectre
+        64: ("VILE", "A", 0), # arch-vile
+        65: ("CPOS", "A", 0), # heavy weapon dude
+        66: ("SKEL", "A", 0), # revenant
+        67: ("FATT", "A", 0), # mancubus
+        68: ("BSPI", "A", 0), # arachnotron
+        69: ("BOS2", "A", 0), # hell knight
+        71: ("PAIN", "A", 0), # pain elemental
+        72: ("KEEN", "A", SPAWNCEILING), # commander keen
+        84: ("SSWV", "A", 0), # wolfenstein ss
+        3001: ("TROO", "A", 0), # imp
+        3002: ("SARG", "A", 0), # demon
+        3003: ("BOSS", "A", 0), # baron of hell
+        3004: ("POSS", "A", 0), # zombieman
+        3005: ("HEAD", "A", 0), # cacodemon
+        3006: ("SKUL", "A", FULLBRIGHT), # lost soul
+        # Keys
+        5: ("BKEY", "A", 0),
+        6: ("YKEY", "A", 0),
+        13: ("RKEY", "A", 0),
+        38: ("RSKU", "A", 0),
+        39: ("YSKU", "A", 0),
+        40: ("BSKU", "A", 0),
+        # Weapons
+        82: ("SGN2", "A", 0),
+        2001: ("SHOT", "A", 0),
+        2002: ("MGUN", "A", 0),
+        2003: ("LAUN", "A", 0),
+        2004: ("PLAS", "A", 0),
+        2005: ("CSAW", "A", 0),
+        2006: ("BFUG", "A", 0),
+        # Ammo
+        8: ("BPAK", "A", 0),
+        17: ("CELP", "A", 0),
+        2007: ("CLIP", "A", 0),
+        2008: ("SHEL", "A", 0),
+        2010: ("ROCK", "A", 0),
+        2046: ("BROK", "A", 0),
+        2047: ("CELL", "A", 0),
+        2048: ("AMMO", "A", 0),
+        2049: ("SBOX", "A", 0),
+        # Artifacts and powerups
+        83: ("MEGA", "A", FULLBRIGHT),
+        2011: ("STIM", "A", 0),
+        2012: ("MEDI", "A", 0),
+        2013: ("SOUL", "A", FULLBRIGHT),
+        2014: ("BON1", "A", 0),
+        2015: ("BON2", "A", 0),
+        2018: ("ARM1", "A", 0),
+        2019: ("ARM2", "A", 0),
+        2022: ("PINV", "A", FULLBRIGHT),
+        2023: ("PSTR", "A", FULLBRIGHT),
+        2024: ("PINS", "A", FULLBRIGHT),
+        2025: ("SUIT", "A", FULLBRIGHT),
+        2026: ("PMAP", "A", FULLBRIGHT),
+        2045: ("PVIS", "A", FULLBRIGHT),
+        # Obstacles
+        25: ("POL1", "A", 0),
+        26: ("POL6", "A", 0),
+        27: ("POL4", "A", 0),
+        28: ("POL2", "A", 0),
+        29: ("POL3", "A", 0),
+        30: ("COL1", "A", 0),
+        31: ("COL2", "A", 0),
+        32: ("COL3", "A", 0),
+        33: ("COL4", "A", 0),
+        35: ("CBRA", "A", FULLBRIGHT),
+        36: ("COL5", "A", 0),
+        37: ("COL6", "A", 0),
+        41: ("CEYE", "A", FULLBRIGHT),
+        42: ("FSKU", "A", FULLBRIGHT),
+        43: ("TRE1", "A", 0),
+        44: ("TBLU", "A", FULLBRIGHT),
+        45: ("TGRN", "A", FULLBRIGHT),
+        46: ("TRED", "A", FULLBRIGHT),
+        47: ("SMIT", "A", 0),
+        48: ("ELEC", "A", 0),
+        49: ("GOR1", "A", SPAWNCEILING),
+        50: ("GOR2", "A", SPAWNCEILING),
+        51: ("GOR3", "A", SPAWNCEILING),
+        52: ("GOR4", "A", SPAWNCEILING),
+        53: ("GOR5", "A", SPAWNCEILING),
+        54: ("TRE2", "A", 0),
+        55: ("SMBT", "A", FULLBRIGHT),
+        56: ("SMGT", "A", FULLBRIGHT),
+        57: ("SMRT", "A", FULLBRIGHT),
+        70: ("FCAN", "A", FULLBRIGHT),
+        73: ("HDB1", "A", SPAWNCEILING),
+        74: ("HDB2", "A", SPAWNCEILING),
+        75: ("HDB3", "A", SPAWNCEILING),
+        76: ("HDB4", "A", SPAWNCEILING),
+        77: ("HDB5", "A", SPAWNCEILING),
+        78: ("HDB6", "A", SPAWNCEILING),
+        85: ("TLMP", "A", FULLBRIGHT),
+        86: ("TLP2", "A", FULLBRIGHT),
+        2028: ("COLU", "A", FULLBRIGHT),
+        2035: ("BAR1", "A", 0),
+        # Decorations
+        10: ("PLAY", "W", 0),
+        12: ("PLAY", "W", 0),
+        15: ("PLAY", "N", 0),
+        18: ("POSS", "L", 0),
+        19: ("SPOS", "L", 0),
+        20: ("TROO", "M", 0),
+        21: ("SARG", "N", 0),
+        22: ("HEAD", "L", 0),
+        24: ("POL5", "A", 0),
+        34: ("CAND", "A", FULLBRIGHT),
+        59: ("GOR2", "A", SPAWNCEILING),
+        60: ("GOR4", "A", SPAWNCEILING),
+        61: ("GOR3", "A", SPAWNCEILING),
+        62: ("GOR5", "A", SPAWNCEILING),
+        63: ("GOR1", "A", SPAWNCEILING),
+        79: ("POB1", "A", 0),
+        80: ("POB2", "A", 0),
+        81: ("BRS1", "A", 0),
+    }
+
+    def __init__(self, wad, maxBytes = 8 * 1024 * 1024):
+        self.wad = wad
+        self.frames = {} # (sprite, frame): 8 rotations of (lump name, flipped) or None
+        self.cache = LRUCache(maxBytes, Picture.nbytes)
+
+    def fromWad(wad, maxBytes = 8 * 1024 * 1024):
+        for lumpName in ("S_START", "S_END"):
+            if wad.findLump(lumpName) is None:
+                print("ERROR: Failed to load sprites, no {} lump".format(lumpName))
+                return None
+        sprites = Sprites(wad, maxBytes)
+        sprites.loadFrames()
+        return sprites
+
+    # sprite lumps are every lump between the markers,
+    # a later lump of a rotation replaces an earlier one
+    def loadFrames(self):
+        start = self.wad.dirMap["S_START"]
+        end = self.wad.dirMap["S_END"]
+        for i in range(start + 1, end):
+            lumpName = self.wad.dirs[i].lumpName
+            name = lumpName.upper()
+            if len(name) >= 6:
+                self.addFrame(lumpName, name[:4], name[4], name[5], False)
+            if len(name) >= 8:
+                self.addFrame(lumpName, name[:4], name[6], name[7], True)
+
+    def addFrame(self, lumpName, sprite, frame, rotation, flipped):
+        if not "0" <= rotation <= "8":
+            return
+        rotations = self.frames.setdefault((sprite, frame), [None] * 8)
+        if rotation == "0":
+            rotations[:] = [(lumpName, flipped)] * 8
+        else:
+            rotations[int(rotation) - 1] = (lumpName, flipped)
+
+    # (sprite, frame, flags) of a thing type or None
+    def getThingSprite(thingType):
+        return Sprites.THINGS.get(thingType)
+
+    # (Picture, flipped) of a frame seen from rotation
+    # 0-7 or None when the WAD has no patch for it
+    def getFrame(self, sprite, frame, rotation):
+        rotations = self.frames.get((sprite, frame))
+        if rotations is None or rotations[rotation] is None:
+            return None
+        lumpName, flipped = rotations[rotation]
+        picture = self.cache.get(lumpName)
+        if picture is None:
+            picture = Picture.decode(self.wad.getLumpData(self.wad.findLump(lumpName)))
+            self.cache.put(lumpName, picture)
+        return picture, flipped
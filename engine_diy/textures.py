@@ -0,0 +1,225 @@
+import struct
+import numpy as np
+from engine_diy.lru import LRUCache
+from engine_diy.wad import decodeName
+
+# PICTURE (patch) FORMAT
+#
+#   header    width, height, leftOffset, topOffset   (4 int16)
+#   columns   width uint32 offsets from the lump start
+#   posts     per column until a topDelta of 0xFF
+#
+#       topDelta  uint8   first row of the post
+#       length    uint8   rows in the post
+#       pad       uint8
+#       data      length palette indices
+#       pad       uint8
+#
+# Decoded column major, columns[x] is column x from the
+# top down so a wall column is one contiguous row of the
+# array, mask is False where no post covers a pixel
+class Picture(object):
+    def __init__(self, width, height, leftOffset = 0, topOffset = 0):
+        self.width = width
+        self.height = height
+        self.leftOffset = leftOffset
+        self.topOffset = topOffset
+        self.columns = np.zeros((width, height), dtype=np.uint8)
+        self.mask = np.zeros((width, height), dtype=bool)
+
+    def decode(data):
+        width, height, leftOffset, topOffset = struct.unpack_from('<HHhh', data, 0)
+        picture = Picture(width, height, leftOffset, topOffset)
+        offsets = struct.unpack_from('<{}I'.format(width), data, 8)
+        raw = np.frombuffer(data, dtype=np.uint8)
+        for x, offset in enumerate(offsets):
+            while offset < len(raw) and raw[offset] != 0xFF:
+                topDelta = int(raw[offset])
+                length = int(raw[offset + 1])
+                # posts running off the bottom are cut
+                end = min(topDelta + length, height)
+                if end > topDelta:
+                    picture.columns[x, topDelta:end] = raw[offset + 3:offset + 3 + end - topDelta]
+                    picture.mask[x, topDelta:end] = True
+                offset += length + 4
+        return picture
+
+    # paste another picture with its top left at x, y
+    # clipped to this one, only its posts are copied
+    def paste(self, picture, x, y):
+        x1 = max(x, 0)
+        y1 = max(y, 0)
+        x2 = min(x + picture.width, self.width)
+        y2 = min(y + picture.height, self.height)
+        if x1 >= x2 or y1 >= y2:
+            return
+        mask = picture.mask[x1 - x:x2 - x, y1 - y:y2 - y]
+        self.columns[x1:x2, y1:y2][mask] = picture.columns[x1 - x:x2 - x, y1 - y:y2 - y][mask]
+        self.mask[x1:x2, y1:y2] |= mask
+
+    def nbytes(picture):
+        return picture.columns.nbytes + picture.mask.nbytes
+
+# Wall textures of a WAD
+#
+#   PLAYPAL    14 palettes of 256 rgb triplets
+#   COLORMAP   34 maps of 256 palette indices, 0-31 are
+#              light levels, 32 invulnerability
+#   PNAMES     int32 count then char[8] patch lump names
+#   TEXTURE1   int32 count, count int32 offsets to
+#   TEXTURE2   (registered and DOOM 2 only) texture
+#              definitions
+#
+#       name        char[8]
+#       masked      int32
+#       width       int16
+#       height      int16
+#       obsolete    int32
+#       patchCount  int16
+#       patches     patchCount times
+#                       originX, originY  int16
+#                       patch             int16 PNAMES index
+#                       stepDir, colormap int16 unused
+#
+# Definitions are read up front, a texture is only
+# composited from its patches the first time a wall
+# uses it and kept in an LRU keyed by texture name
+#
+# Flats are 64x64 row major palette indices between
+# F_START and F_END, read as Pictures into the same
+# LRU under ("F", name)
+class Textures(object):
+    SKYFLAT = "F_SKY1"
+
+    def __init__(self, wad, maxBytes = 16 * 1024 * 1024):
+        self.wad = wad
+        self.palettes = None
+        self.palette = None
+        self.colormaps = None
+        self.shades = {} # (palette, fixed colormap): [colormap][palette index]: rgb
+        self.patchNames = []
+        self.definitions = {} # name: (width, height, [(originX, originY, patch)])
+        self.patches = {} # PNAMES index: Picture, never evicted as textures share them
+        self.cache = LRUCache(maxBytes, Picture.nbytes)
+
+    def fromWad(wad, maxBytes = 16 * 1024 * 1024):
+        textures = Textures(wad, maxBytes)
+        for lumpName in ("PLAYPAL", "COLORMAP", "PNAMES", "TEXTURE1"):
+            if wad.findLump(lumpName) is None:
+                print("ERROR: Failed to load textures, no {} lump".format(lumpName))
+                return None
+        textures.loadPalettes()
+        textures.loadColormaps()
+        textures.loadPatchNames()
+        for lumpName in ("TEXTURE1", "TEXTURE2"):
+            if wad.findLump(lumpName) is not None:
+                textures.loadDefinitions(lumpName)
+        return textures
+
+    def loadPalettes(self):
+        data = self.wad.getLumpData(self.wad.findLump("PLAYPAL"))
+        count = len(data) // (256 * 3)
+        self.palettes = np.frombuffer(data, dtype=np.uint8, count=count * 256 * 3).reshape(count, 256, 3).copy()
+        self.palette = self.palettes[0]
+
+    def loadColormaps(self):
+        data = self.wad.getLumpData(self.wad.findLump("COLORMAP"))
+        count = len(data) // 256
+        self.colormaps = np.frombuffer(data, dtype=np.uint8, count=count * 256).reshape(count, 256).copy()
+
+    # every shade of every index as rgb in a PLAYPAL palette
+    # so a frame of indices and light maps becomes rgb in
+    # one lookup, palette 0 is normal, 1-8 pain, 9-12 item
+    # pickup and 13 the radiation suit, with a fixed
+    # colormap every light map reads that one map like
+    # DOOM's invulnerability (32)
+    def getShades(self, palette = 0, fixedColormap = None):
+        key = (palette, fixedColormap)
+        shades = self.shades.get(key)
+        if shades is None:
+            colormaps = self.colormaps
+            if fixedColormap is not None:
+                colormaps = np.broadcast_to(colormaps[fixedColormap], colormaps.shape)
+            shades = np.ascontiguousarray(self.palettes[palette][colormaps])
+            self.shades[key] = shades
+        return shades
+
+    def loadPatchNames(self):
+        data = self.wad.getLumpData(self.wad.findLump("PNAMES"))
+        count = struct.unpack_from('<i', data, 0)[0]
+        self.patchNames = [decodeName(data[4 + i * 8:12 + i * 8]).upper() for i in range(count)]
+
+    def loadDefinitions(self, lumpName):
+        data = self.wad.getLumpData(self.wad.findLump(lumpName))
+        count = struct.unpack_from('<i', data, 0)[0]
+        for offset in struct.unpack_from('<{}i'.format(count), data, 4):
+            name = decodeName(data[offset:offset + 8]).upper()
+            masked, width, height, obsolete, patchCount = struct.unpack_from('<ihhih', data, offset + 8)
+            patches = []
+            for i in range(patchCount):
+                originX, originY, patch, stepDir, colormap = struct.unpack_from('<hhhhh', data, offset + 22 + i * 10)
+                patches.append((originX, originY, patch))
+            self.definitions[name] = (width, height, patches)
+
+    # patch lumps by PNAMES index, None if missing
+    def getPatch(self, index):
+        if index in self.patches:
+            return self.patches[index]
+        patch = None
+        if 0 <= index < len(self.patchNames):
+            directory = self.wad.findLump(self.patchNames[index])
+            if directory is not None:
+                patch = Picture.decode(self.wad.getLumpData(directory))
+        self.patches[index] = patch
+        return patch
+
+    # composited texture or None for "-" and
+    # names the WAD does not define
+    def getTexture(self, name):
+        name = name.upper()
+        texture = self.cache.get(name)
+        if texture is not None:
+            return texture
+        definition = self.definitions.get(name)
+        if definition is None:
+            return None
+        width, height, patches = definition
+        texture = Picture(width, height)
+        for originX, originY, index in patches:
+            patch = self.getPatch(index)
+            if patch is None:
+                print("ERROR: Missing patch {} in texture {}".format(index, name))
+                continue
+            texture.paste(patch, originX, originY)
+        self.cache.put(name, texture)
+        return texture
+
+    # flat as a 64x64 Picture or None if missing
+    def getFlat(self, name):
+        name = name.upper()
+        flat = self.cache.get(("F", name))
+        if flat is not None:
+            return flat
+        directory = self.wad.findLump(name)
+        if directory is None or directory.lumpSize < 64 * 64:
+            return None
+        flat = Picture(64, 64)
+        data = np.frombuffer(self.wad.getLumpData(directory), dtype=np.uint8, count=64 * 64)
+        flat.columns[:] = data.reshape(64, 64).T
+        flat.mask[:] = True
+        self.cache.put(("F", name), flat)
+        return flat
+
+    # sky texture DOOM uses for a map, SKY1 to SKY3
+    # by episode or by map number in DOOM 2
+    def getSkyName(mapName):
+        if mapName.startswith("MAP") and mapName[3:].isdigit():
+            number = int(mapName[3:])
+            if number < 12:
+                return "SKY1"
+            if number < 21:
+                return "SKY2"
+            return "SKY3"
+        if len(mapName) == 4 and mapName[0] == "E" and mapName[1].isdigit():
+            return "SKY{}".format(mapName[1])
+        return "SKY1"
@@ -0,0 +1,89 @@
+import math
+import numpy as np
+from engine_diy.angle import Angle
+from engine_diy.bam import finetangent, ANG90, ANGMASK, ANGLETOFINESHIFT, FRACUNIT
+
+# Per frame view of every map vertex
+# Vertices are shared by several segs so instead of
+# projecting each seg end on its own every vertex is
+# projected once per frame in one NumPy pass and the
+# seg clipping code reads the results by vertex ID
+#
+#   angles      degrees from the player to the vertex
+#   distances   distance from the player to the vertex
+#   screenXs    screen column of the vertex when it
+#               is inside the fov, DOOM style projection
+#   depths      view space distance in front of the player
+#   sides       view space distance to the left of the player
+#
+# Results are plain lists as they are read one
+# value at a time from python loops
+class VertexProjection(object):
+    FINETANGENT = np.array(finetangent, dtype=np.float64)
+
+    def __init__(self, map):
+        self.map = map
+        self.xs, self.ys = map.getVertexArrays()
+        self.angleArray = None
+        self.angles = []
+        self.distances = []
+        self.screenXs = []
+        self.depths = []
+        self.sides = []
+        # position and view the cache was built for,
+        # turning on the spot only redoes the screen xs
+        self.position = None
+        self.view = None
+
+    # project all vertices for a view, skipped when
+    # the view has not changed since the last call
+    def project(self, x, y, viewAngle, fov, halfWidth, distanceToScreen):
+        position = (x, y)
+        if position != self.position:
+            self.position = position
+            self.view = None
+            dx = self.xs - x
+            dy = self.ys - y
+            self.angleArray = VertexProjection.wrap360(np.arctan2(dy, dx) * 180 / math.pi)
+            self.angles = self.angleArray.tolist()
+            self.distances = np.sqrt(dx * dx + dy * dy).tolist()
+
+        view = (viewAngle, fov, halfWidth, distanceToScreen)
+        if view == self.view:
+            return
+        self.view = view
+
+        # rotate into view space, x forward and y left
+        cos = math.cos(math.radians(viewAngle))
+        sin = math.sin(math.radians(viewAngle))
+        dx = self.xs - x
+        dy = self.ys - y
+        self.depths = (dx * cos + dy * sin).tolist()
+        self.sides = (dy * cos - dx * sin).tolist()
+
+        # angle from the player rotated so the fov
+        # runs from 0 (right) to 2 * fov (left)
+        fromPlayer = VertexProjection.wrap360(VertexProjection.wrap360(self.angleArray - viewAngle) + fov)
+        bams = (fromPlayer * 4294967296.0 / 360).astype(np.int64) & ANGMASK
+        left = bams > ANG90
+        # tangent of the angle from the screen centre, vertices
+        # outside the fov are clamped to the table and never read
+        offsets = np.where(left, bams - ANG90, ANG90 - bams)
+        fines = ((offsets + ANG90) & ANGMASK) >> ANGLETOFINESHIFT
+        tangents = VertexProjection.FINETANGENT[np.minimum(fines, len(finetangent) - 1)]
+        columns = np.round(tangents * halfWidth / FRACUNIT)
+        self.screenXs = np.where(left, distanceToScreen - columns, columns + distanceToScreen).astype(np.int64).tolist()
+
+    # same as % 360 for angles in -360 to 720 but
+    # much faster than the float modulo on arrays
+    def wrap360(angles):
+        return np.where(angles < 0, angles + 360, np.where(angles >= 360, angles - 360, angles))
+
+    def getAngle(self, vertex):
+        return Angle(self.angles[vertex.ID])
+
+    def getDistance(self, vertex):
+        return self.distances[vertex.ID]
+
+    def getScreenX(self, vertex):
+        return self.screenXs[vertex.ID]
@@ -28,8 +28,12 @@
 #
 # BIG-ENDIAN format
 
-import struct
+import struct, mmap
+import numpy as np
 from engine_diy.map import *
+from engine_diy.columnar_map import ColumnarMap, LUMP_DTYPES
+from engine_diy.lru import LRUCache
+from engine_diy.blockmap import Blockmap
 
 class WAD(object):
 
@@ -157,6 +161,18 @@ class WAD(object):
             return self.dirMap[map.name] # get index
         return -1
 
+    # directory of a lump by name or None, the last
+    # lump of a name wins like a PWAD over the IWAD
+    def findLump(self, lumpName):
+        if lumpName in self.dirMap:
+            return self.dirs[self.dirMap[lumpName]]
+        return None
+
+    # raw bytes of a lump
+    def getLumpData(self, directory):
+        self.f.seek(directory.lumpOffset)
+        return self.f.read(directory.lumpSize)
+
     # LIST LOADER
     # Takes a pointer to a list location in
     # the WAD and loads the data into the
@@ -203,12 +219,38 @@ class WAD(object):
         if self.readMapDataList(map, mapIndex + Map.Indices.SIDEDEFS, "SIDEDEFS", Sidedef.sizeof(), self.readSidedefData, map.sidedefs) is False:
             print("ERROR: Failed to load map sidedefs " + map.name)
             return False
+        if self.readRejectData(map, mapIndex + Map.Indices.REJECT) is False:
+            print("ERROR: Failed to load map reject " + map.name)
+            return False
+        if self.readBlockmapData(map, mapIndex + Map.Indices.BLOCKMAP) is False:
+            print("ERROR: Failed to load map blockmap " + map.name)
+            return False
 
         # run some helpers to define the map
         map.createData()
 
         return True
 
+    # REJECT is kept packed as it is in the WAD
+    def readRejectData(self, map, indexOffset):
+        directory = self.dirs[indexOffset]
+        if directory.lumpName != "REJECT":
+            return False
+        self.f.seek(directory.lumpOffset)
+        map.reject = self.f.read(directory.lumpSize)
+        return True
+
+    # BLOCKMAP is decoded into its grid index
+    def readBlockmapData(self, map, indexOffset):
+        if indexOffset >= len(self.dirs):
+            return False
+        directory = self.dirs[indexOffset]
+        if directory.lumpName != "BLOCKMAP":
+            return False
+        self.f.seek(directory.lumpOffset)
+        map.blockmap = Blockmap.fromLump(self.f.read(directory.lumpSize))
+        return True
+
     def loadMap(self, mapName):
         map = Map()
         map.name = mapName
@@ -260,6 +302,321 @@ WAD\n\
                 wad += str(d) + "\n"
         return wad
 
+# WAD backend that maps the file into memory once
+# and decodes each lump in bulk with struct.iter_unpack
+# instead of a seek + read + unpack for every field
+# of every record, produces the same map objects as WAD
+class MappedWAD(WAD):
+
+    # struct format of a single record of each lump
+    # and the method used to turn its unpacked fields
+    # into a map object
+    lumpFormats = {
+        "VERTEXES": ('<hh', 'unpackVertexData'),
+        "LINEDEFS": ('<HHHHHHH', 'unpackLinedefData'),
+        "THINGS":   ('<hhHHH', 'unpackThingData'),
+        "NODES":    ('<hhhhhhhhhhhhHH', 'unpackNodeData'),
+        "SSECTORS": ('<HH', 'unpackSubsectorData'),
+        "SEGS":     ('<HHHHHH', 'unpackSegData'),
+        "SECTORS":  ('<hh8s8sHHH', 'unpackSectorData'),
+        "SIDEDEFS": ('<hh8s8s8sH', 'unpackSidedefData'),
+    }
+
+    def __init__(self, wadpath):
+        self.wadpath = wadpath
+        self.f = open(self.wadpath, 'rb') # read-binary
+        # map whole file once, every lump is a slice of this
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self.mm)
+
+        self.loadHeader()
+        self.loadDirs()
+
+    def close(self):
+        self.data.release()
+        self.mm.close()
+        self.f.close()
+
+    def loadDirs(self):
+        self.dirs = []
+        self.dirMap = {}
+        # directory is one contiguous block of 16 byte entries
+        start = self.diroffset
+        end = start + 16 * self.dircount
+        for lumpOffset, lumpSize, lumpName in struct.iter_unpack('<II8s', self.data[start:end]):
+            directory = Directory()
+            directory.lumpOffset = lumpOffset
+            directory.lumpSize = lumpSize
+            directory.lumpName = decodeName(lumpName)
+            self.dirs.append(directory)
+            # keep hashmap of directory name to its index
+            self.dirMap[directory.lumpName] = len(self.dirs) - 1
+
+    # get raw bytes of a lump as a zero copy slice
+    def getLumpData(self, directory):
+        return self.data[directory.lumpOffset:directory.lumpOffset + directory.lumpSize]
+
+    def readRejectData(self, map, indexOffset):
+        directory = self.dirs[indexOffset]
+        if directory.lumpName != "REJECT":
+            return False
+        map.reject = self.getLumpData(directory)
+        return True
+
+    def readBlockmapData(self, map, indexOffset):
+        if indexOffset >= len(self.dirs):
+            return False
+        directory = self.dirs[indexOffset]
+        if directory.lumpName != "BLOCKMAP":
+            return False
+        map.blockmap = Blockmap.fromLump(self.getLumpData(directory))
+        return True
+
+    # LIST LOADER
+    # Decodes a whole lump in one pass, the reader
+    # argument is ignored in favor of the lumps
+    # bulk format
+    def readMapDataList(self, map, indexOffset, lumpName, byteSize, reader, mapList):
+        directory = self.dirs[indexOffset]
+        if directory.lumpName != lumpName:
+            return False
+
+        fmt, unpacker = MappedWAD.lumpFormats[lumpName]
+        unpacker = getattr(self, unpacker)
+        # trim any trailing partial record like the seek reader does
+        count = int(directory.lumpSize / byteSize)
+        data = self.data[directory.lumpOffset:directory.lumpOffset + count * byteSize]
+        mapList.extend(unpacker(*fields) for fields in struct.iter_unpack(fmt, data))
+
+        return True
+
+    # COLUMNAR LOADER
+    # Wraps each map lump as a NumPy array over
+    # the mapped file instead of building objects
+    def loadColumnarMapData(self, map):
+        mapIndex = self.findMapIndex(map)
+        if mapIndex == -1:
+            return False
+
+        for index, lumpName in (
+            (Map.Indices.VERTEXES, "VERTEXES"),
+            (Map.Indices.LINEDEFS, "LINEDEFS"),
+            (Map.Indices.THINGS, "THINGS"),
+            (Map.Indices.NODES, "NODES"),
+            (Map.Indices.SSECTORS, "SSECTORS"),
+            (Map.Indices.SEGS, "SEGS"),
+            (Map.Indices.SECTORS, "SECTORS"),
+            (Map.Indices.SIDEDEFS, "SIDEDEFS"),
+            (Map.Indices.REJECT, "REJECT"),
+            (Map.Indices.BLOCKMAP, "BLOCKMAP"),
+        ):
+            directory = self.dirs[mapIndex + index] if mapIndex + index < len(self.dirs) else None
+            if directory is None or directory.lumpName != lumpName:
+                print("ERROR: Failed to load map {} {}".format(lumpName.lower(), map.name))
+                return False
+            map.setLumpData(lumpName, self.getLumpData(directory))
+
+        # resolve index columns and meta data
+        map.createData()
+
+        return True
+
+    def loadColumnarMap(self, mapName):
+        map = ColumnarMap()
+        map.name = mapName
+        if self.loadColumnarMapData(map):
+            return map
+        return None
+
+    # OBJECT UNPACKERS
+    # build our map objects from a records
+    # already unpacked fields
+    def unpackVertexData(self, x, y):
+        v = Vertex()
+        v.x = x
+        v.y = y
+        return v
+
+    def unpackLinedefData(self, startVertexID, endVertexID, flags, lineType, sectorTag, frontSidedefID, backSidedefID):
+        l = Linedef()
+        l.startVertexID = startVertexID
+        l.endVertexID = endVertexID
+        l.flags = flags
+        l.lineType = lineType
+        l.sectorTag = sectorTag
+        l.frontSidedefID = frontSidedefID
+        l.backSidedefID = backSidedefID
+        return l
+
+    def unpackThingData(self, x, y, angle, type, flags):
+        t = Thing()
+        t.x = x
+        t.y = y
+        t.angle = angle
+        t.type = type
+        t.flags = flags
+        return t
+
+    def unpackNodeData(self, xp, yp, xcp, ycp, fTop, fBottom, fLeft, fRight, bTop, bBottom, bLeft, bRight, frontChildID, backChildID):
+        n = Node()
+        n.xPartition = xp
+        n.yPartition = yp
+        n.xChangePartition = xcp
+        n.yChangePartition = ycp
+
+        n.frontBoxTop = fTop
+        n.frontBoxBottom = fBottom
+        n.frontBoxLeft = fLeft
+        n.frontBoxRight = fRight
+
+        n.backBoxTop = bTop
+        n.backBoxBottom = bBottom
+        n.backBoxLeft = bLeft
+        n.backBoxRight = bRight
+
+        n.frontChildID = frontChildID
+        n.backChildID = backChildID
+        return n
+
+    def unpackSubsectorData(self, segCount, firstSegID):
+        ss = Subsector()
+        ss.segCount = segCount
+        ss.firstSegID = firstSegID
+        return ss
+
+    def unpackSegData(self, startVertexID, endVertexID, angle, linedefID, direction, offset):
+        s = Seg()
+        s.startVertexID = startVertexID
+        s.endVertexID = endVertexID
+        s.angle = angle
+        s.linedefID = linedefID
+        s.direction = direction
+        s.offset = offset
+        return s
+
+    def unpackSectorData(self, floorHeight, ceilingHeight, floorTexture, ceilingTexture, lightLevel, type, tag):
+        s = Sector()
+        s.floorHeight = floorHeight
+        s.ceilingHeight = ceilingHeight
+        s.floorTexture = decodeName(floorTexture)
+        s.ceilingTexture = decodeName(ceilingTexture)
+        s.lightLevel = lightLevel
+        s.type = type
+        s.tag = tag
+        return s
+
+    def unpackSidedefData(self, xOffset, yOffset, upperTexture, lowerTexture, middleTexture, sectorID):
+        s = Sidedef()
+        s.xOffset = xOffset
+        s.yOffset = yOffset
+        s.upperTexture = decodeName(upperTexture)
+        s.lowerTexture = decodeName(lowerTexture)
+        s.middleTexture = decodeName(middleTexture)
+        s.sectorID = sectorID
+        return s
+
+    # DATA TYPE LOADERS
+    # same api as WAD but read straight
+    # out of the mapped file
+    def load_string(self, offset, length, preserveNull = False):
+        return decodeName(self.mm[offset:offset + length])
+
+    def load_sshort(self, offset):
+        return struct.unpack_from('<h', self.mm, offset)[0]
+
+    def load_ushort(self, offset):
+        return struct.unpack_from('<H', self.mm, offset)[0]
+
+    def load_uint32(self, offset):
+        return struct.unpack_from('<I', self.mm, offset)[0]
+
+# WAD that does no work up front, the directory is
+# a zero copy array that is only decoded into entries
+# when they are looked at, maps are ColumnarMaps whose
+# lumps are decoded on first access and decoded maps
+# are kept in a memory bounded LRU so switching
+# between maps reuses the ones already warm
+class LazyWAD(MappedWAD):
+
+    DIRECTORY_DTYPE = np.dtype([('lumpOffset', '<u4'), ('lumpSize', '<u4'), ('lumpName', 'S8')])
+
+    def __init__(self, wadpath, maxMapBytes = 64 * 1024 * 1024):
+        super().__init__(wadpath)
+        self.maps = LRUCache(maxMapBytes, ColumnarMap.nbytes)
+
+    def loadDirs(self):
+        start = self.diroffset
+        end = start + 16 * self.dircount
+        self.dirArray = np.frombuffer(self.data[start:end], dtype=LazyWAD.DIRECTORY_DTYPE)
+        self.dirs = DirectoryList(self.dirArray)
+        self.lazyDirMap = None
+
+    # hashmap of directory name to its index
+    # built the first time a name is looked up
+    @property
+    def dirMap(self):
+        if self.lazyDirMap is None:
+            self.lazyDirMap = {}
+            for i, lumpName in enumerate(self.dirArray['lumpName'].tolist()):
+                self.lazyDirMap[decodeName(lumpName)] = i
+        return self.lazyDirMap
+
+    # maps come out of the LRU when warm, otherwise
+    # only the lump names are checked and the map is
+    # left to decode itself as it is used
+    def loadMap(self, mapName):
+        map = self.maps.get(mapName)
+        if map is not None:
+            return map
+
+        map = ColumnarMap()
+        map.name = mapName
+        mapIndex = self.findMapIndex(map)
+        if mapIndex == -1:
+            return None
+
+        for lumpName in LUMP_DTYPES:
+            index = mapIndex + getattr(Map.Indices, lumpName)
+            if index >= len(self.dirs) or self.dirs[index].lumpName != lumpName:
+                print("ERROR: Failed to load map {} {}".format(lumpName.lower(), mapName))
+                return None
+
+        map.lumpSource = self.getMapLumpSource(mapIndex)
+        map.createLazyData()
+        self.maps.put(mapName, map)
+        return map
+
+    def getMapLumpSource(self, mapIndex):
+        def lumpSource(lumpName):
+            return self.getLumpData(self.dirs[mapIndex + getattr(Map.Indices, lumpName)])
+        return lumpSource
+
+# list like access to a directory array that
+# builds Directory entries as they are read
+class DirectoryList(object):
+    def __init__(self, dirArray):
+        self.dirArray = dirArray
+
+    def __len__(self):
+        return len(self.dirArray)
+
+    def __getitem__(self, i):
+        lumpOffset, lumpSize, lumpName = self.dirArray[i].tolist()
+        directory = Directory()
+        directory.lumpOffset = lumpOffset
+        directory.lumpSize = lumpSize
+        directory.lumpName = decodeName(lumpName)
+        return directory
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+# char[8] names are padded with nulls which
+# the WAD string loader skips over
+def decodeName(raw):
+    return bytes(raw).replace(b'\x00', b'').decode('ascii')
+
 class Directory(object):
     def __init__(self):
         self.lumpOffset = 0 # uint32
@@ -1,11 +1,15 @@
-import sys, engine_diy, pygame, random, math
-from engine_diy.wad import WAD
+import sys, os, engine_diy, pygame, random, math
+from engine_diy.wad import MappedWAD
+from engine_diy.map_cache import MapCache
 from engine_diy.game2d import Game2D
 from engine_diy.map import *
 from engine_diy.player import Player
 from engine_diy.angle import Angle
 from engine_diy.segment_range import *
 from engine_diy.fps_renderer import FpsRenderer
+from engine_diy.camera_path import CameraPath
+from engine_diy.textures import Textures
+from engine_diy.sprites import Sprites
 
 
 #############
@@ -74,6 +78,38 @@ def drawPlayer(game, pl, player, rgba=(0,1,0,1)):
     # player dot
     game.drawRectangle([px-2,py-2], 4, 4, rgba)
 
+# blue, green, yellow then red as value goes to maxValue
+def heatColor(value, maxValue):
+    t = min(value / maxValue, 1) if maxValue > 0 else 0
+    if t < 1/3:
+        return (0, t * 3, 1 - t * 3, 1)
+    if t < 2/3:
+        return ((t - 1/3) * 3, 1, 0, 1)
+    return (1, 1 - (t - 2/3) * 3, 0, 1)
+
+# one bar per screen column, as tall and as hot
+# as its value against the largest in the strip
+def drawHeatStrip(game, values, pos, height, label):
+    maxValue = max(int(values.max()), 1)
+    x, y = pos
+    game.drawRectangle([x, y], len(values), height, (0, 0, 0, 1))
+    for i, value in enumerate(values.tolist()):
+        if value > 0:
+            barHeight = height * value / maxValue
+            game.drawRectangle([x + i, y + height - barHeight], 1, barHeight, heatColor(value, maxValue))
+    game.drawText("{} max {}".format(label, maxValue), [x + 4, y + 2], (1, 1, 1, 1))
+
+# segs looked at this frame colored by the time spent on them
+def drawSegCosts(game, stats):
+    if not stats.segCosts:
+        return
+    maxCost = max(stats.segCosts.values())
+    for segId, cost in stats.segCosts.items():
+        seg = map.segs[segId]
+        sx, sy = pl.ot(seg.startVertex.x, seg.startVertex.y)
+        ex, ey = pl.ot(seg.endVertex.x, seg.endVertex.y)
+        game.drawLine([sx, sy], [ex, ey], heatColor(cost, maxCost), 3)
+
 
 #############
 ##  START  ##
@@ -92,10 +128,11 @@ else:
     mapname = "E1M1"
 
 # load WAD
-wad = WAD(path)
+wad = MappedWAD(path)
 
-# choose a map
-map = wad.loadMap(mapname)
+# choose a map, preprocessed maps are cached next to the WAD
+mapCache = MapCache(os.path.join(os.path.dirname(path), "cache"))
+map = mapCache.loadMap(wad, mapname)
 if map == None:
     print("ERROR: invalid map {}".format(mapname))
     quit()
@@ -121,10 +158,14 @@ fpsWinHeight = 200
 fpsWinOffX = 20
 fpsWinOffY = 20
 fpsRenderer = FpsRenderer(map, player, game, fov, fpsWinWidth, fpsWinHeight, fpsWinOffX, fpsWinOffY)
+# wall textures, walls stay flat colors without them
+fpsRenderer.textures = Textures.fromWad(wad)
+# thing sprites, drawn with the wall textures
+fpsRenderer.sprites = Sprites.fromWad(wad)
 
 # render helpers
 mode = 0
-max_modes = 15
+max_modes = 16
 def mode_up():
     global mode
     mode = (mode + 1) % max_modes
@@ -174,6 +215,89 @@ def on_space():
     player.x = 1291
     player.y = -3011
 game.onKeyUp(pygame.K_SPACE, on_space)
+def on_c():
+    global fpsRenderer
+    # toggle BSP box culling and report the last walk
+    print("BSP culling {} nodes {} subsectors {}".format(
+        fpsRenderer.b_bspCulling, map.nodesVisited, map.subsectorsVisited))
+    fpsRenderer.b_bspCulling = not fpsRenderer.b_bspCulling
+game.onKeyUp(pygame.K_c, on_c)
+def on_f():
+    global fpsRenderer
+    # toggle the pixel buffer and the GL line debug renderer
+    fpsRenderer.b_frameBuffer = not fpsRenderer.b_frameBuffer
+game.onKeyUp(pygame.K_f, on_f)
+def on_v():
+    global fpsRenderer
+    # toggle view space and angle based seg clipping
+    fpsRenderer.b_viewSpaceClip = not fpsRenderer.b_viewSpaceClip
+    print("View space clipping {}".format(fpsRenderer.b_viewSpaceClip))
+game.onKeyUp(pygame.K_v, on_v)
+def on_g():
+    # toggle textured and flat colored walls
+    fpsRenderer.b_textured = not fpsRenderer.b_textured
+    print("Textured walls {}".format(fpsRenderer.b_textured))
+game.onKeyUp(pygame.K_g, on_g)
+def on_l():
+    # toggle floor and ceiling visplanes
+    fpsRenderer.b_drawPlanes = not fpsRenderer.b_drawPlanes
+    print("Floors and ceilings {}".format(fpsRenderer.b_drawPlanes))
+game.onKeyUp(pygame.K_l, on_l)
+def on_m():
+    # toggle thing sprites
+    fpsRenderer.b_drawSprites = not fpsRenderer.b_drawSprites
+    print("Thing sprites {}".format(fpsRenderer.b_drawSprites))
+game.onKeyUp(pygame.K_m, on_m)
+def on_n():
+    # toggle palette indexed and rgb frames
+    fpsRenderer.b_indexed = not fpsRenderer.b_indexed
+    print("Indexed frames {}".format(fpsRenderer.b_indexed))
+game.onKeyUp(pygame.K_n, on_n)
+def on_k():
+    # cycle the PLAYPAL palettes, pain, pickup and radiation
+    # suit tints only swap the table indexed frames present with
+    fpsRenderer.i_palette = (fpsRenderer.i_palette + 1) % 14
+    print("Palette {}".format(fpsRenderer.i_palette))
+game.onKeyUp(pygame.K_k, on_k)
+def on_i():
+    # toggle the invulnerability colormap
+    fpsRenderer.i_fixedColormap = 32 if fpsRenderer.i_fixedColormap is None else None
+    print("Fixed colormap {}".format(fpsRenderer.i_fixedColormap))
+game.onKeyUp(pygame.K_i, on_i)
+def on_t():
+    # work counters of the last rendered frame
+    print(fpsRenderer.stats)
+game.onKeyUp(pygame.K_t, on_t)
+# record the camera for benchmark_diy.py frames --path
+cameraPath = None
+cameraPathFile = "camera_path.txt"
+def on_r():
+    global cameraPath
+    if cameraPath is None:
+        cameraPath = CameraPath()
+        print("Recording camera path")
+    else:
+        cameraPath.save(cameraPathFile)
+        print("Saved {} views to {}".format(len(cameraPath), cameraPathFile))
+        cameraPath = None
+game.onKeyUp(pygame.K_r, on_r)
+# per stage frame profiler overlay
+def on_p():
+    fpsRenderer.profiler.setEnabled(not fpsRenderer.profiler.enabled)
+    print("Frame profiler {}".format(fpsRenderer.profiler.enabled))
+game.onKeyUp(pygame.K_p, on_p)
+# stream profiler frames for spreadsheets and plots
+profileFile = "frame_profile.csv"
+def on_o():
+    profiler = fpsRenderer.profiler
+    if profiler.csvFile is None:
+        profiler.setEnabled(True)
+        profiler.openCsv(profileFile)
+        print("Writing frame profile to {}".format(profileFile))
+    else:
+        profiler.closeCsv()
+        print("Saved {} frames to {}".format(profiler.frameCount, profileFile))
+game.onKeyUp(pygame.K_o, on_o)
 
 
 ###############
@@ -190,6 +314,8 @@ while True:
         break;
 
     # update
+    if cameraPath is not None:
+        cameraPath.add(player.x, player.y, player.angle.deg)
 
     # draw
     game.drawStart()
@@ -341,6 +467,28 @@ while True:
         lineMode = mode == 14
         fpsRenderer.doomhistory_render(lineMode)
 
+    # RENDER FPS WITH COLUMN AND SEG COST HEATMAPS
+    if mode == 15:
+        playerSector = map.getSectorAtPosition(player.x, player.y)
+        player.setSector(playerSector)
+
+        fpsRenderer.b_statsDetail = True
+        stats = fpsRenderer.doomhistory_render()
+        fpsRenderer.b_statsDetail = False
+
+        # segs colored by cost on the automap, hot is slow
+        drawSegCosts(game, stats)
+        drawPlayer(game, pl, player)
+
+        # writes and segs per column right of the view
+        stripX = fpsWinOffX + fpsWinWidth + 10
+        stripHeight = (fpsWinHeight - 10) / 2
+        drawHeatStrip(game, stats.columnWrites, [stripX, fpsWinOffY], stripHeight, "writes")
+        drawHeatStrip(game, stats.columnSegs, [stripX, fpsWinOffY + stripHeight + 10], stripHeight, "segs")
+
+    if fpsRenderer.profiler.enabled:
+        fpsRenderer.profiler.drawOverlay(game, [20, 240])
+
     game.drawEnd()
 
 